@@ -0,0 +1,402 @@
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+
+from metricas import registro
+
+
+def texto_do_chunk(chunk):
+    """Extrai o texto de um pedaço da resposta (vazio se bloqueado ou sem texto)"""
+    if isinstance(chunk, str):
+        return chunk
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+class RespostaStream:
+    """Consome uma resposta em streaming pedaço a pedaço, medindo a latência
+
+    `ao_finalizar` é chamado uma única vez com o próprio objeto quando a
+    resposta termina, é cancelada ou falha, desde que algum texto tenha chegado.
+    """
+
+    def __init__(self, chunks, ao_finalizar=None):
+        self._chunks = chunks
+        self._ao_finalizar = ao_finalizar
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+        self.partes = []
+        self.inicio = time.perf_counter()
+        self.tempo_primeiro_token = None
+        self.tempo_total = None
+        self.cancelado = False
+        self.finalizado = False
+
+    @property
+    def texto(self):
+        return "".join(self.partes)
+
+    def cancelar(self):
+        """Pede a interrupção do streaming no próximo pedaço recebido"""
+        self._cancelar.set()
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                if self._cancelar.is_set():
+                    self.cancelado = True
+                    break
+
+                texto = texto_do_chunk(chunk)
+                if not texto:
+                    continue
+
+                if self.tempo_primeiro_token is None:
+                    self.tempo_primeiro_token = time.perf_counter() - self.inicio
+                self.partes.append(texto)
+                yield texto
+        finally:
+            self.fechar()
+
+    def fechar(self):
+        """Finaliza o streaming (idempotente); chamado também se a execução for interrompida"""
+        with self._lock:
+            if self.finalizado:
+                return
+            self.finalizado = True
+
+        if self._cancelar.is_set():
+            self.cancelado = True
+        self.tempo_total = time.perf_counter() - self.inicio
+
+        # Encerra o gerador do cliente, liberando a vaga de concorrência
+        fechar_chunks = getattr(self._chunks, "close", None)
+        if fechar_chunks:
+            fechar_chunks()
+
+        if self._ao_finalizar and self.partes:
+            self._ao_finalizar(self)
+
+    def metricas(self):
+        """Resumo de latência da resposta"""
+        return {
+            'tempo_primeiro_token': self.tempo_primeiro_token,
+            'tempo_total': self.tempo_total,
+            'caracteres': sum(len(p) for p in self.partes),
+            'cancelado': self.cancelado,
+        }
+
+
+def normalizar_texto(texto):
+    """Normaliza o texto para comparação (minúsculas, espaços colapsados)"""
+    return " ".join(texto.lower().split())
+
+
+def chave_cache(usuario_id, pergunta, modelo, tarefas=(), ideias=(), hoje="", resumo=""):
+    """Gera a chave do cache a partir da pergunta normalizada, do modelo, do
+    usuário e do que a resposta leva em conta: as tarefas e ideias incluídas
+    no prompt, o dia e o resumo da conversa
+
+    O histórico recente fica de fora: cada resposta entra nele, e com ele na
+    chave a mesma pergunta feita de novo nunca seria encontrada.
+    """
+    itens = [
+        f"t{t.get('id')}:{t.get('prioridade', '')}:{int(bool(t.get('concluida')))}:{normalizar_texto(t['texto'])}"
+        for t in tarefas
+    ]
+    itens += [f"i{i.get('id')}:{normalizar_texto(i['texto'])}" for i in ideias]
+    partes = [str(usuario_id), modelo, normalizar_texto(pergunta), hoje, normalizar_texto(resumo or "")] + itens
+    return hashlib.sha256("\x1f".join(partes).encode()).hexdigest()
+
+
+class CacheRespostas:
+    """Cache persistente (tabela cache_respostas do repositório) de respostas do assistente,
+    com expiração por TTL e descarte LRU acima de `max_itens`"""
+
+    def __init__(self, db, ttl=6 * 3600, max_itens=1000):
+        self.db = db
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _contar(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def obter(self, chave):
+        """Retorna a resposta em cache ou None (expirada conta como miss)"""
+        resposta = self.db.obter_resposta_cache(chave, self.ttl)
+        self._contar(resposta is not None)
+        return resposta
+
+    def salvar(self, chave, modelo, resposta):
+        """Armazena a resposta e descarta as entradas menos usadas recentemente"""
+        self.db.salvar_resposta_cache(chave, modelo, resposta, self.max_itens)
+
+    def limpar_expiradas(self):
+        """Remove as entradas com TTL vencido; retorna quantas foram removidas"""
+        return self.db.limpar_respostas_expiradas(self.ttl)
+
+    def estatisticas(self):
+        """Contadores de hits/misses deste processo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': self.hits / total if total else 0.0,
+            }
+
+
+# Caches compartilhados por banco (os contadores sobrevivem aos reruns do Streamlit)
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obter_cache_respostas(db, **opcoes):
+    """Retorna o cache de respostas do processo para o banco do `db`"""
+    with _caches_lock:
+        cache = _caches.get(db)
+        if cache is None:
+            cache = CacheRespostas(db, **opcoes)
+            _caches[db] = cache
+            registro.registrar_coletor("cache_respostas", cache.estatisticas)
+        return cache
+
+
+# Montagem do contexto do assistente com orçamento de tokens
+PESO_PRIORIDADE = {"🔴 Alta": 3, "🟡 Média": 2, "🟢 Baixa": 1}
+
+INSTRUCOES_ASSISTENTE = (
+    "Você é um assistente especializado em organização, produtividade e gestão de tarefas. "
+    "Responda de forma útil e motivacional, focando em ajudar com organização pessoal."
+)
+
+
+def estimar_tokens(texto):
+    """Estimativa rápida de tokens (~4 caracteres por token, como nos modelos Gemini)"""
+    return max(1, (len(texto) + 3) // 4) if texto else 0
+
+
+def palavras(texto):
+    """Conjunto de palavras relevantes (sem acentos, 3+ letras) do texto"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return {p for p in re.findall(r"\w+", texto) if len(p) >= 3}
+
+
+def truncar(texto, max_tokens):
+    """Corta o texto para caber em `max_tokens`, indicando o corte com reticências"""
+    if estimar_tokens(texto) <= max_tokens:
+        return texto
+    return texto[:max(0, max_tokens * 4 - 1)].rstrip() + "…"
+
+
+TITULO_TAREFAS = "Tarefas pendentes do usuário:"
+TITULO_IDEIAS = "Ideias do usuário:"
+TITULO_HISTORICO = "Histórico recente da conversa:"
+
+
+def linha_restantes(quantidade):
+    return f"- (... e mais {quantidade} itens não listados)"
+
+
+class ConstrutorContexto:
+    """Monta o prompt do assistente respeitando um orçamento de tokens
+
+    As tarefas pendentes são ordenadas por relevância à pergunta, prioridade
+    e recência; as ideias por relevância e recência; o histórico do mais novo
+    para o mais antigo. O que não cabe é resumido em uma linha de contagem.
+    """
+
+    def __init__(self, orcamento_tokens=2000, max_tokens_item=80, max_mensagens=10, divisao=(0.4, 0.3, 0.3)):
+        self.orcamento_tokens = orcamento_tokens
+        self.max_mensagens = max_mensagens
+        self.max_tokens_item = max_tokens_item
+        self.divisao = divisao
+
+    def _ordenar_tarefas(self, tarefas, termos):
+        def pontuacao(par):
+            posicao, tarefa = par
+            return (
+                len(termos & palavras(tarefa['texto'])),
+                PESO_PRIORIDADE.get(tarefa.get('prioridade'), 0),
+                tarefa.get('id') or 0,
+                -posicao,
+            )
+        pendentes = [t for t in tarefas if not t.get('concluida')]
+        return [t for _, t in sorted(enumerate(pendentes), key=pontuacao, reverse=True)]
+
+    def _ordenar_ideias(self, ideias, termos):
+        def pontuacao(par):
+            posicao, ideia = par
+            return (len(termos & palavras(ideia['texto'])), ideia.get('id') or 0, -posicao)
+        return [i for _, i in sorted(enumerate(ideias), key=pontuacao, reverse=True)]
+
+    def _preencher(self, itens, formatar, orcamento, resumir_restantes=True):
+        """Inclui itens em ordem até esgotar o orçamento; retorna (linhas, incluídos, tokens)
+
+        Se sobrarem itens, a linha de contagem entra na conta: tira do fim os
+        itens necessários para que ela caiba (ou é omitida se nem ela couber).
+        """
+        linhas = []
+        incluidos = []
+        custos = []
+        usados = 0
+        for item in itens:
+            linha = formatar(item)
+            custo = estimar_tokens(linha + "\n")
+            if usados + custo > orcamento:
+                break
+            linhas.append(linha)
+            incluidos.append(item)
+            custos.append(custo)
+            usados += custo
+
+        if len(incluidos) < len(itens) and resumir_restantes:
+            reserva = estimar_tokens(linha_restantes(len(itens)) + "\n")
+            if reserva <= orcamento:
+                while incluidos and usados + reserva > orcamento:
+                    linhas.pop()
+                    incluidos.pop()
+                    usados -= custos.pop()
+                linhas.append(linha_restantes(len(itens) - len(incluidos)))
+                usados += estimar_tokens(linhas[-1] + "\n")
+        return linhas, incluidos, usados
+
+    def montar(self, pergunta, tarefas=(), ideias=(), mensagens=(), hoje="", resumo=""):
+        """Retorna um dict com o prompt, os itens incluídos e a estimativa de tokens"""
+        termos = palavras(pergunta)
+        limite_item = self.max_tokens_item
+
+        cabecalho = f"Hoje é {hoje}." if hoje else ""
+        pergunta_fmt = f"Usuário pergunta: {truncar(pergunta, self.orcamento_tokens // 4)}"
+        resumo_fmt = f"Resumo da conversa até aqui: {truncar(resumo, self.orcamento_tokens // 5)}" if resumo else ""
+
+        # Partes fixas, títulos das seções e separadores também contam no orçamento
+        fixas = [cabecalho, resumo_fmt, pergunta_fmt, INSTRUCOES_ASSISTENTE,
+                 TITULO_TAREFAS + "\n- (nenhuma)", TITULO_IDEIAS + "\n- (nenhuma)", TITULO_HISTORICO]
+        fixo = sum(estimar_tokens(parte + "\n\n") for parte in fixas if parte)
+        disponivel = max(0, self.orcamento_tokens - fixo)
+
+        # Cada seção recebe sua fatia; o que uma não usa passa para a seguinte
+        cota_tarefas, cota_ideias, _ = (int(disponivel * p) for p in self.divisao)
+
+        linhas_tarefas, tarefas_incluidas, usados = self._preencher(
+            self._ordenar_tarefas(tarefas, termos),
+            lambda t: f"- [{t.get('prioridade', '')}] {truncar(t['texto'], limite_item)}",
+            cota_tarefas
+        )
+        sobra = cota_tarefas - usados
+
+        linhas_ideias, ideias_incluidas, usados_ideias = self._preencher(
+            self._ordenar_ideias(list(ideias), termos),
+            lambda i: f"- {truncar(i['texto'], limite_item)}",
+            cota_ideias + sobra
+        )
+        usados += usados_ideias
+
+        # Histórico do mais recente para o mais antigo, depois de volta à ordem cronológica
+        recentes = list(mensagens)[::-1][:self.max_mensagens]
+        linhas_historico, mensagens_incluidas, _ = self._preencher(
+            recentes,
+            lambda m: f"- {m['role']}: {truncar(m['content'], limite_item * 2)}",
+            disponivel - usados,
+            resumir_restantes=False
+        )
+        linhas_historico.reverse()
+
+        partes = [cabecalho, resumo_fmt]
+        partes.append(TITULO_TAREFAS + "\n" + ("\n".join(linhas_tarefas) or "- (nenhuma)"))
+        partes.append(TITULO_IDEIAS + "\n" + ("\n".join(linhas_ideias) or "- (nenhuma)"))
+        if linhas_historico:
+            partes.append(TITULO_HISTORICO + "\n" + "\n".join(linhas_historico))
+        partes.append(pergunta_fmt)
+        partes.append(INSTRUCOES_ASSISTENTE)
+
+        prompt = "\n\n".join(p for p in partes if p)
+        return {
+            'prompt': prompt,
+            'tokens': estimar_tokens(prompt),
+            'tarefas': tarefas_incluidas,
+            'ideias': ideias_incluidas,
+            'mensagens': mensagens_incluidas[::-1],
+        }
+
+
+# Resumo incremental da conversa
+def resumo_extrativo(resumo_anterior, mensagens, max_tokens=400):
+    """Resumo local (sem IA): mantém o resumo anterior e o início de cada mensagem"""
+    linhas = [resumo_anterior] if resumo_anterior else []
+    for msg in mensagens:
+        autor = "Usuário" if msg['role'] == "user" else "Assistente"
+        linhas.append(f"{autor}: {truncar(' '.join(msg['content'].split()), 30)}")
+
+    # Se passar do limite, descarta o conteúdo mais antigo
+    texto = "\n".join(linhas)
+    if estimar_tokens(texto) > max_tokens:
+        texto = "…" + texto[-(max_tokens * 4 - 1):]
+    return texto
+
+
+class ResumidorConversa:
+    """Condensa periodicamente as mensagens antigas em um resumo por usuário
+
+    As `manter_recentes` mensagens mais novas ficam fora do resumo; quando há
+    pelo menos `lote` mensagens anteriores a elas ainda não resumidas, essas
+    mensagens são incorporadas ao resumo. Só vão para o arquivo as que já
+    saíram das `manter_visiveis` mais novas, que o chat mostra.
+    `resumir(resumo_anterior, mensagens)` produz o novo resumo.
+    """
+
+    def __init__(self, db, resumir=resumo_extrativo, manter_recentes=10, lote=20, manter_visiveis=50):
+        self.db = db
+        self.resumir = resumir
+        self.manter_recentes = manter_recentes
+        self.lote = lote
+        self.manter_visiveis = manter_visiveis
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+
+    def resumo(self, usuario_id):
+        """Texto do resumo atual do usuário (vazio se ainda não houver)"""
+        salvo = self.db.carregar_resumo(usuario_id)
+        return salvo['resumo'] if salvo else ""
+
+    def atualizar(self, usuario_id):
+        """Resume o próximo lote, se houver; retorna True se o resumo mudou"""
+        with self._lock:
+            if usuario_id in self._em_andamento:
+                return False
+            self._em_andamento.add(usuario_id)
+
+        try:
+            pendentes = self.db.carregar_mensagens_nao_resumidas(
+                usuario_id, manter_recentes=self.manter_recentes, limite=self.lote * 5
+            )
+            if len(pendentes) < self.lote:
+                return False
+
+            novo_resumo = self.resumir(self.resumo(usuario_id), pendentes)
+            self.db.salvar_resumo(
+                usuario_id, novo_resumo, pendentes[-1]['id'], manter_visiveis=self.manter_visiveis
+            )
+            return True
+        finally:
+            with self._lock:
+                self._em_andamento.discard(usuario_id)
+
+    def atualizar_em_segundo_plano(self, usuario_id):
+        """Dispara atualizar() em uma thread, sem bloquear a renderização"""
+        thread = threading.Thread(target=self.atualizar, args=(usuario_id,), daemon=True)
+        thread.start()
+        return thread
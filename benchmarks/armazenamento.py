@@ -0,0 +1,282 @@
+"""Benchmark da camada de armazenamento e do caminho de um rerun
+
+Uso:
+    python -m benchmarks.armazenamento --tamanhos 100 1000 10000 --sessoes 16 --saida bench.json
+    python -m benchmarks.armazenamento --comparar bench.json --tolerancia 0.25
+
+Para cada tamanho, cria um banco temporário (no `--armazenamento` escolhido)
+com usuários sintéticos de N tarefas, N ideias e N mensagens, mede cada
+operação do repositório e depois simula `--sessoes` sessões concorrentes
+executando reruns (leitura das páginas + uma escrita) contra o mesmo banco.
+As leituras que o cache de leitura atende são medidas com o cache do
+usuário invalidado antes de cada repetição; com o cache ligado, o tempo das
+mesmas leituras servidas pelo cache sai em separado, com o sufixo `_em_cache`.
+O resultado é JSON; com `--comparar`, sai com código 1 se alguma mediana
+piorar além da tolerância.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+import threading
+
+from database import DatabaseManager, ConnectionPool
+from repositorio import criar_repositorio
+
+PRIORIDADES = ["🟢 Baixa", "🟡 Média", "🔴 Alta"]
+PALAVRAS = (
+    "reunião relatório cliente projeto vendas estudo leitura exercício compras "
+    "orçamento apresentação equipe planejamento revisão contrato viagem curso"
+).split()
+
+
+def texto_aleatorio(rng, palavras=8):
+    return " ".join(rng.choice(PALAVRAS) for _ in range(palavras))
+
+
+def nova_tarefa(rng):
+    return {
+        'texto': texto_aleatorio(rng),
+        'prioridade': rng.choice(PRIORIDADES),
+        'concluida': rng.random() < 0.3,
+        'timestamp': "09:00",
+    }
+
+
+def semear(db, usuario_id, n, rng):
+    """Popula o usuário com n tarefas, n ideias e n mensagens (em lotes)"""
+    db.salvar_tarefas(usuario_id, [nova_tarefa(rng) for _ in range(n)])
+    for _ in range(n):
+        db.salvar_ideia(usuario_id, {'texto': texto_aleatorio(rng), 'categoria': 'Geral', 'timestamp': "09:00"})
+    db.salvar_mensagens([
+        (usuario_id, "user" if i % 2 == 0 else "assistant", texto_aleatorio(rng, 30))
+        for i in range(n)
+    ])
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """Mediana e p90 (ms) de `repeticoes` chamadas de `funcao(i)`; `preparar()`
+    roda antes de cada chamada, fora da medição"""
+    tempos = []
+    for i in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'mediana_ms': round(statistics.median(tempos), 3),
+        'p90_ms': round(tempos[min(len(tempos) - 1, int(0.9 * len(tempos)))], 3),
+        'repeticoes': repeticoes,
+    }
+
+
+def simular_rerun(db, usuario_id, rng):
+    """As operações de banco de um rerun típico com a aba de tarefas em uso"""
+    db.carregar_tarefas_pagina(usuario_id, limite=20)
+    db.carregar_ideias_pagina(usuario_id, limite=20)
+    db.carregar_mensagens(usuario_id, 50)
+    tarefa_id = db.salvar_tarefa(usuario_id, nova_tarefa(rng))
+    db.atualizar_tarefa(usuario_id, tarefa_id, 'concluida', True)
+
+
+def cache_do_usuario(db, usuario_id):
+    """Cache de leitura que atende o usuário (no fragmento dele, se fragmentado), ou None"""
+    alvo = db.fragmento(usuario_id) if hasattr(db, "fragmento") else db
+    return getattr(alvo, "cache", None)
+
+
+# Leituras que passam pelo cache de leitura (ver o docstring do módulo)
+LEITURAS_EM_CACHE = (
+    'carregar_tarefas', 'carregar_ideias', 'carregar_mensagens_50',
+    'pagina_tarefas_1', 'pagina_tarefas_2', 'pagina_pendentes_alta', 'buscar',
+)
+
+
+def bench_operacoes(db, usuario_id, n, repeticoes, rng):
+    tarefas = db.carregar_tarefas(usuario_id)
+    ids = [t['id'] for t in tarefas]
+    _, cursor_pagina = db.carregar_tarefas_pagina(usuario_id, limite=20)
+
+    operacoes = {
+        'salvar_tarefa': lambda i: db.salvar_tarefa(usuario_id, nova_tarefa(rng)),
+        'salvar_tarefas_lote_100': lambda i: db.salvar_tarefas(usuario_id, [nova_tarefa(rng) for _ in range(100)]),
+        'carregar_tarefas': lambda i: db.carregar_tarefas(usuario_id),
+        'carregar_ideias': lambda i: db.carregar_ideias(usuario_id),
+        'carregar_mensagens_50': lambda i: db.carregar_mensagens(usuario_id, 50),
+        'pagina_tarefas_1': lambda i: db.carregar_tarefas_pagina(usuario_id, limite=20),
+        'pagina_tarefas_2': lambda i: db.carregar_tarefas_pagina(usuario_id, limite=20, cursor=cursor_pagina),
+        'pagina_pendentes_alta': lambda i: db.carregar_tarefas_pagina(
+            usuario_id, limite=20, apenas_pendentes=True, prioridade="🔴 Alta"),
+        'atualizar_tarefa': lambda i: db.atualizar_tarefa(usuario_id, ids[i % len(ids)], 'concluida', True),
+        'buscar': lambda i: db.buscar(usuario_id, rng.choice(PALAVRAS)),
+        'recuperar_relevantes': lambda i: db.recuperar_relevantes(usuario_id, texto_aleatorio(rng, 5)),
+        'excluir_tarefa': lambda i: db.excluir_tarefa(usuario_id, ids.pop()),
+    }
+
+    cache = cache_do_usuario(db, usuario_id)
+    invalidar = (lambda: cache.invalidar(usuario_id)) if cache is not None else None
+
+    resultados = {}
+    for nome, funcao in operacoes.items():
+        if nome in LEITURAS_EM_CACHE:
+            resultados[nome] = medir(funcao, repeticoes, preparar=invalidar)
+            if cache is not None:
+                resultados[f"{nome}_em_cache"] = medir(funcao, repeticoes)
+        else:
+            resultados[nome] = medir(funcao, min(repeticoes, len(ids)) if nome == 'excluir_tarefa' else repeticoes)
+    return resultados
+
+
+def bench_concorrencia(db, usuarios, sessoes, reruns_por_sessao, semente):
+    """Sessões simultâneas, cada uma executando reruns para um usuário"""
+    latencias = []
+    erros = []
+    lock = threading.Lock()
+
+    def sessao(indice):
+        rng = random.Random(semente + indice)
+        usuario_id = usuarios[indice % len(usuarios)]
+        for _ in range(reruns_por_sessao):
+            inicio = time.perf_counter()
+            try:
+                simular_rerun(db, usuario_id, rng)
+            except Exception as e:
+                with lock:
+                    erros.append(repr(e))
+                continue
+            with lock:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(sessoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'sessoes': sessoes,
+        'reruns': len(latencias),
+        'erros': len(erros),
+        'reruns_por_segundo': round(len(latencias) / duracao, 1) if duracao else 0.0,
+        'mediana_ms': round(statistics.median(latencias), 3) if latencias else None,
+        'p90_ms': round(latencias[int(0.9 * len(latencias))], 3) if latencias else None,
+        'p99_ms': round(latencias[min(len(latencias) - 1, int(0.99 * len(latencias)))], 3) if latencias else None,
+    }
+
+
+def executar(tamanhos, repeticoes, sessoes, reruns_por_sessao, usar_cache, semente, armazenamento="sqlite"):
+    resultado = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'cache_leitura': usar_cache,
+            'armazenamento': armazenamento,
+        },
+        'tamanhos': {},
+    }
+
+    for n in tamanhos:
+        diretorio = tempfile.mkdtemp(prefix="focusflow-bench-")
+        try:
+            caminho = os.path.join(diretorio, "bench.db")
+            pool = None
+            if armazenamento == "sqlite":
+                pool = ConnectionPool(caminho, tamanho=max(8, sessoes))
+                db = DatabaseManager(caminho, pool=pool, usar_cache=usar_cache)
+            elif armazenamento == "sqlite_fragmentado":
+                db = criar_repositorio(armazenamento, diretorio=os.path.join(diretorio, "fragmentos"))
+            else:
+                db = criar_repositorio(armazenamento, dsn=caminho, tamanho_pool=max(8, sessoes), usar_cache=usar_cache)
+            rng = random.Random(semente)
+
+            usuarios = []
+            inicio = time.perf_counter()
+            for i in range(4):
+                db.criar_usuario(f"bench{i}", f"bench{i}@exemplo.com", "senha")
+                usuario_id = db.verificar_login(f"bench{i}", "senha")['id']
+                semear(db, usuario_id, n, rng)
+                usuarios.append(usuario_id)
+            semeadura = time.perf_counter() - inicio
+
+            resultado['tamanhos'][str(n)] = {
+                'semeadura_s': round(semeadura, 3),
+                'operacoes': bench_operacoes(db, usuarios[0], n, repeticoes, rng),
+                'concorrencia': bench_concorrencia(db, usuarios, sessoes, reruns_por_sessao, semente),
+                'tamanho_banco_bytes': sum(
+                    os.path.getsize(os.path.join(diretorio, f)) for f in os.listdir(diretorio)
+                ),
+            }
+            if pool is not None:
+                pool.fechar()
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    return resultado
+
+
+def comparar(atual, base, tolerancia):
+    """Lista as operações cuja mediana piorou mais que `tolerancia` (fração)"""
+    regressoes = []
+    for tamanho, dados in atual['tamanhos'].items():
+        dados_base = base.get('tamanhos', {}).get(tamanho)
+        if not dados_base:
+            continue
+        for nome, medida in dados['operacoes'].items():
+            anterior = dados_base['operacoes'].get(nome)
+            if anterior and medida['mediana_ms'] > anterior['mediana_ms'] * (1 + tolerancia):
+                regressoes.append(
+                    f"N={tamanho} {nome}: {anterior['mediana_ms']} ms -> {medida['mediana_ms']} ms"
+                )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--sessoes", type=int, default=16)
+    parser.add_argument("--reruns", type=int, default=20, help="reruns por sessão concorrente")
+    parser.add_argument("--sem-cache", action="store_true", help="desliga o cache de leitura")
+    parser.add_argument("--armazenamento", default="sqlite",
+                        choices=["sqlite", "sqlite_fragmentado", "servidor_sqlite"])
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    resultado = executar(
+        args.tamanhos, args.repeticoes, args.sessoes, args.reruns,
+        not args.sem_cache, args.semente, args.armazenamento
+    )
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}", file=sys.stderr)
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
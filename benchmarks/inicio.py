@@ -0,0 +1,100 @@
+"""Relatório do tempo de partida a frio do app
+
+Uso:
+    python -m benchmarks.inicio --repeticoes 5 --json
+
+Mede, em processos Python novos, o tempo de importar cada módulo usado pelo
+prop34.py (inclusive streamlit e o SDK do Gemini, se instalados) e o tempo de
+criar o DatabaseManager com um banco novo (todas as migrações) e com um banco
+já migrado (o custo que o st.cache_resource evita a cada rerun).
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+MODULOS = ["metricas", "senhas", "recuperacao", "database", "llm", "assistente",
+           "streamlit", "google.generativeai"]
+
+SCRIPT_IMPORTACAO = """
+import time
+inicio = time.perf_counter()
+try:
+    import {modulo}
+except ImportError:
+    print("null")
+else:
+    print(time.perf_counter() - inicio)
+"""
+
+SCRIPT_BANCO = """
+import time
+from database import DatabaseManager
+inicio = time.perf_counter()
+DatabaseManager({caminho!r})
+print(time.perf_counter() - inicio)
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def executar_isolado(script):
+    """Roda o script em um interpretador novo e devolve o número impresso (ou None)"""
+    saida = subprocess.run(
+        [sys.executable, "-c", script], cwd=RAIZ,
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return None if saida == "null" else float(saida)
+
+
+def mediana_ms(script, repeticoes):
+    tempos = [executar_isolado(script) for _ in range(repeticoes)]
+    if None in tempos:
+        return None
+    return round(statistics.median(tempos) * 1000, 2)
+
+
+def medir(repeticoes):
+    resultado = {'importacoes_ms': {}, 'banco_ms': {}}
+    for modulo in MODULOS:
+        resultado['importacoes_ms'][modulo] = mediana_ms(SCRIPT_IMPORTACAO.format(modulo=modulo), repeticoes)
+
+    diretorio = tempfile.mkdtemp(prefix="focusflow-inicio-")
+    try:
+        tempos_novo = []
+        for i in range(repeticoes):
+            caminho = os.path.join(diretorio, f"novo{i}.db")
+            tempos_novo.append(executar_isolado(SCRIPT_BANCO.format(caminho=caminho)))
+        resultado['banco_ms']['banco_novo'] = round(statistics.median(tempos_novo) * 1000, 2)
+        resultado['banco_ms']['banco_migrado'] = mediana_ms(
+            SCRIPT_BANCO.format(caminho=os.path.join(diretorio, "novo0.db")), repeticoes
+        )
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    resultado = medir(args.repeticoes)
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+        return
+
+    for secao, valores in resultado.items():
+        print(secao)
+        for nome, ms in valores.items():
+            print(f"  {nome:<22} {'não instalado' if ms is None else f'{ms:8.2f} ms'}")
+
+
+if __name__ == "__main__":
+    main()
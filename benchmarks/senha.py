@@ -0,0 +1,75 @@
+"""Escolhe os parâmetros do scrypt para uma latência de login alvo
+
+Uso:
+    python -m benchmarks.senha --alvo-ms 250 --concorrencia 4
+
+Mede o tempo de uma verificação para valores crescentes de N (r e p fixos),
+isoladamente e com `concorrencia` logins simultâneos, e sugere o maior N
+que fica dentro do alvo. Exporte o resultado em FOCUSFLOW_SCRYPT_N.
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from senhas import gerar_hash, verificar_hash
+
+
+def medir(n, r, p, repeticoes, concorrencia):
+    """Retorna a mediana (ms) de uma verificação, isolada e sob concorrência"""
+    hash_senha = gerar_hash("senha-de-teste", n=n, r=r, p=p)
+
+    def uma_verificacao(_):
+        inicio = time.perf_counter()
+        verificar_hash("senha-de-teste", hash_senha)
+        return (time.perf_counter() - inicio) * 1000
+
+    isolado = [uma_verificacao(i) for i in range(repeticoes)]
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        concorrente = list(executor.map(uma_verificacao, range(repeticoes * concorrencia)))
+
+    return statistics.median(isolado), statistics.median(concorrente)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alvo-ms", type=float, default=250.0)
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--p", type=int, default=1)
+    parser.add_argument("--concorrencia", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--log-n-min", type=int, default=12)
+    parser.add_argument("--log-n-max", type=int, default=18)
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    escolhido = None
+    for log_n in range(args.log_n_min, args.log_n_max + 1):
+        n = 2 ** log_n
+        isolado, concorrente = medir(n, args.r, args.p, args.repeticoes, args.concorrencia)
+        resultados.append({
+            'n': n, 'r': args.r, 'p': args.p,
+            'isolado_ms': round(isolado, 2),
+            'concorrente_ms': round(concorrente, 2),
+            'memoria_mb': round(128 * n * args.r / 1024 / 1024, 1),
+        })
+        if concorrente <= args.alvo_ms:
+            escolhido = n
+        if not args.json:
+            print(f"N=2^{log_n:<2} isolado={isolado:8.1f} ms  "
+                  f"concorrente({args.concorrencia})={concorrente:8.1f} ms  "
+                  f"memória={resultados[-1]['memoria_mb']} MB")
+
+    if args.json:
+        print(json.dumps({'alvo_ms': args.alvo_ms, 'sugerido_n': escolhido, 'resultados': resultados}))
+    elif escolhido:
+        print(f"\nSugestão: FOCUSFLOW_SCRYPT_N={escolhido} FOCUSFLOW_SCRYPT_R={args.r} FOCUSFLOW_SCRYPT_P={args.p}")
+    else:
+        print("\nNenhum N testado ficou dentro do alvo; reduza --log-n-min ou aumente --alvo-ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Vazão da importação e exportação em fluxo (CSV/JSONL)
+
+Uso:
+    python -m benchmarks.transferencia --linhas 100000 --lote 1000 --memoria
+
+Gera arquivos sintéticos de tarefas e ideias com `--linhas` linhas, importa
+cada um em um banco temporário e exporta de volta, informando linhas por
+segundo. Com `--memoria`, repete as medidas sob tracemalloc e informa o pico
+de memória alocada (que deve ficar estável com o tamanho do arquivo).
+"""
+import os
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from database import DatabaseManager, ConnectionPool
+from transferencia import importar, exportar, COLUNAS
+from benchmarks.armazenamento import nova_tarefa, texto_aleatorio
+
+
+def gerar_arquivo(caminho, tipo, formato, linhas, rng):
+    colunas = [c for c in COLUNAS[tipo] if c != 'id']
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas) if formato == "csv" else None
+        if escritor:
+            escritor.writeheader()
+        for _ in range(linhas):
+            if tipo == 'tarefas':
+                registro = nova_tarefa(rng)
+            else:
+                registro = {'texto': texto_aleatorio(rng, 12), 'categoria': "Geral", 'timestamp': "09:00"}
+            if escritor:
+                escritor.writerow(registro)
+            else:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def medir(funcao, memoria):
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+def executar(linhas, lote, memoria, semente):
+    rng = random.Random(semente)
+    resultados = []
+    diretorio = tempfile.mkdtemp(prefix="focusflow-transferencia-")
+    try:
+        caminho_db = os.path.join(diretorio, "bench.db")
+        pool = ConnectionPool(caminho_db)
+        db = DatabaseManager(caminho_db, pool=pool)
+        db.criar_usuario("bench", "bench@exemplo.com", "senha")
+        usuario_id = db.verificar_login("bench", "senha")['id']
+
+        for tipo in ('tarefas', 'ideias'):
+            for formato in ("csv", "jsonl"):
+                origem = os.path.join(diretorio, f"{tipo}.{formato}")
+                gerar_arquivo(origem, tipo, formato, linhas, rng)
+                if tipo == 'tarefas':
+                    db.limpar_tarefas(usuario_id)
+                else:
+                    with pool.transacao() as cursor:
+                        cursor.execute('DELETE FROM ideias WHERE usuario_id = ?', (usuario_id,))
+
+                def importar_arquivo():
+                    with open(origem, "rb") as arquivo:
+                        return importar(db, usuario_id, tipo, arquivo, formato, lote=lote)
+
+                relatorio, duracao, pico = medir(importar_arquivo, memoria)
+                resultados.append({
+                    'operacao': "importar", 'tipo': tipo, 'formato': formato,
+                    'linhas': relatorio['importados'], 'segundos': round(duracao, 3),
+                    'linhas_por_segundo': round(relatorio['importados'] / duracao),
+                    'pico_memoria_kb': pico // 1024 if pico is not None else None,
+                })
+
+                destino = os.path.join(diretorio, f"saida.{formato}")
+
+                def exportar_arquivo():
+                    with open(destino, "w", encoding="utf-8", newline="") as arquivo:
+                        return exportar(db, usuario_id, tipo, arquivo, formato)
+
+                total, duracao, pico = medir(exportar_arquivo, memoria)
+                resultados.append({
+                    'operacao': "exportar", 'tipo': tipo, 'formato': formato,
+                    'linhas': total, 'segundos': round(duracao, 3),
+                    'linhas_por_segundo': round(total / duracao),
+                    'pico_memoria_kb': pico // 1024 if pico is not None else None,
+                })
+
+        pool.fechar()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100000)
+    parser.add_argument("--lote", type=int, default=1000, help="itens por transação na importação")
+    parser.add_argument("--memoria", action="store_true", help="mede o pico de memória (mais lento)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    resultados = executar(args.linhas, args.lote, args.memoria, args.semente)
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'operação':<10}{'tipo':<9}{'formato':<9}{'linhas':>9}{'s':>9}{'linhas/s':>11}{'pico KB':>10}")
+    for r in resultados:
+        pico = "-" if r['pico_memoria_kb'] is None else r['pico_memoria_kb']
+        print(f"{r['operacao']:<10}{r['tipo']:<9}{r['formato']:<9}{r['linhas']:>9}"
+              f"{r['segundos']:>9}{r['linhas_por_segundo']:>11}{pico:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1502 @@
+import os
+import re
+import time
+import queue
+import atexit
+import logging
+import sqlite3
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from senhas import gerar_hash, obter_verificador
+from repositorio import Repositorio
+from recuperacao import vetorizar, serializar, mais_similares
+from metricas import registro, instrumentar_classe, contar_consulta
+
+logger = logging.getLogger(__name__)
+
+# Caminho padrão do banco (pode ser sobrescrito pela variável FOCUSFLOW_DB)
+DB_PATH = os.getenv("FOCUSFLOW_DB", "focusflow.db")
+
+# Pragmas aplicados a cada conexão nova do pool
+PRAGMAS_PADRAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,      # ~16 MB de cache de páginas por conexão
+    "mmap_size": 134217728,    # 128 MB mapeados em memória
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+}
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite de longa duração, compartilhado entre sessões"""
+
+    def __init__(self, db_path=DB_PATH, tamanho=8, pragmas=None, cached_statements=256):
+        self.db_path = db_path
+        self.tamanho = tamanho
+        self.pragmas = dict(PRAGMAS_PADRAO if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+        self._criadas = 0
+        self._lock = threading.Lock()
+        self._todas = []
+
+    def _nova_conexao(self):
+        """Abre uma conexão e aplica os pragmas configurados"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for nome, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nome} = {valor}")
+        return conn
+
+    def _adquirir(self, timeout=30):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._criadas < self.tamanho:
+                self._criadas += 1
+                criar = True
+            else:
+                criar = False
+
+        if criar:
+            try:
+                conn = self._nova_conexao()
+            except Exception:
+                with self._lock:
+                    self._criadas -= 1
+                raise
+            with self._lock:
+                self._todas.append(conn)
+            return conn
+
+        return self._livres.get(timeout=timeout)
+
+    def _devolver(self, conn):
+        self._livres.put_nowait(conn)
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão do pool (devolvida ao sair do bloco)"""
+        contar_consulta()
+        conn = self._adquirir()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._devolver(conn)
+
+    @contextmanager
+    def transacao(self):
+        """Executa o bloco em uma transação, com commit ou rollback automático"""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def fechar(self):
+        """Fecha todas as conexões abertas pelo pool"""
+        with self._lock:
+            conexoes, self._todas = self._todas, []
+            self._criadas = 0
+        while True:
+            try:
+                self._livres.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conexoes:
+            conn.close()
+
+
+# Pools compartilhados por caminho de banco (sobrevivem aos reruns do Streamlit)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(db_path=DB_PATH, **opcoes):
+    """Retorna o pool do processo para o banco informado, criando-o se preciso"""
+    caminho = os.path.abspath(db_path) if db_path != ":memory:" else db_path
+    with _pools_lock:
+        pool = _pools.get(caminho)
+        if pool is None:
+            pool = ConnectionPool(db_path, **opcoes)
+            _pools[caminho] = pool
+        return pool
+
+
+class CacheLeitura:
+    """Cache LRU de leituras por usuário, compartilhado por todas as sessões do processo
+
+    Cada usuário tem uma versão que é incrementada a cada escrita. A versão faz
+    parte da chave, então as entradas antigas deixam de ser usadas na hora e
+    acabam descartadas pelo LRU.
+    """
+
+    def __init__(self, max_itens=2048):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def versao(self, usuario_id):
+        with self._lock:
+            return self._versoes.get(usuario_id, 0)
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor)"""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return True, self._itens[chave]
+            self.misses += 1
+            return False, None
+
+    def salvar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, usuario_id):
+        """Invalida todas as leituras em cache do usuário"""
+        with self._lock:
+            self._versoes[usuario_id] = self._versoes.get(usuario_id, 0) + 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self._itens),
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': self.hits / total if total else 0.0,
+            }
+
+
+# Caches de leitura compartilhados, um por pool (ou seja, por banco)
+_caches_leitura = {}
+
+
+def obter_cache_leitura(pool, **opcoes):
+    """Retorna o cache de leitura do processo associado ao pool"""
+    with _pools_lock:
+        cache = _caches_leitura.get(pool)
+        if cache is None:
+            cache = CacheLeitura(**opcoes)
+            _caches_leitura[pool] = cache
+            registro.registrar_coletor("cache_leitura", cache.estatisticas)
+        return cache
+
+
+def _copiar(valor):
+    """Cópia rasa de listas/dicts, para que quem lê não altere o valor em cache"""
+    if isinstance(valor, list):
+        return [_copiar(item) for item in valor]
+    if isinstance(valor, tuple):
+        return tuple(_copiar(item) for item in valor)
+    if isinstance(valor, dict):
+        return dict(valor)
+    return valor
+
+
+def leitura_em_cache(metodo):
+    """Decora uma leitura `metodo(self, usuario_id, ...)` com o cache do DatabaseManager"""
+    @functools.wraps(metodo)
+    def wrapper(self, usuario_id, *args, **kwargs):
+        if self.cache is None:
+            return metodo(self, usuario_id, *args, **kwargs)
+
+        chave = (
+            metodo.__name__, usuario_id, self.cache.versao(usuario_id),
+            args, tuple(sorted(kwargs.items()))
+        )
+        encontrado, valor = self.cache.obter(chave)
+        if not encontrado:
+            valor = metodo(self, usuario_id, *args, **kwargs)
+            self.cache.salvar(chave, valor)
+        return _copiar(valor)
+    return wrapper
+
+
+def invalida_cache(metodo):
+    """Decora uma escrita `metodo(self, usuario_id, ...)`, invalidando o cache do usuário"""
+    @functools.wraps(metodo)
+    def wrapper(self, usuario_id, *args, **kwargs):
+        try:
+            return metodo(self, usuario_id, *args, **kwargs)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidar(usuario_id)
+    return wrapper
+
+
+def indexar_vetores(cursor, tipo, linhas):
+    """Grava (ou substitui) os vetores de recuperação de itens (item_id, usuario_id, texto)"""
+    cursor.executemany(
+        'INSERT INTO vetores_itens (tipo, item_id, usuario_id, vetor) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (tipo, item_id) DO UPDATE SET usuario_id = excluded.usuario_id, vetor = excluded.vetor',
+        [(tipo, item_id, usuario_id, serializar(vetorizar(texto))) for item_id, usuario_id, texto in linhas]
+    )
+
+
+def compactar_sqlite(conn, vacuum_completo=False, limite_livres=0.25):
+    """VACUUM (ou incremental_vacuum) e ANALYZE em uma conexão SQLite; retorna a operação feita"""
+    paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+    livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    incremental = conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+    if vacuum_completo or not incremental or (paginas and livres / paginas > limite_livres):
+        # O modo de auto_vacuum só muda de fato com um VACUUM completo
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        operacao = "vacuum"
+    else:
+        # Cada passo do PRAGMA libera uma página: é preciso consumir o resultado
+        conn.execute('PRAGMA incremental_vacuum').fetchall()
+        operacao = "incremental_vacuum"
+    conn.execute('ANALYZE')
+    conn.commit()
+    return operacao
+
+
+def bytes_sqlite(conn):
+    """Bytes em disco do banco (arquivo principal e WAL), após um checkpoint"""
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    caminho = conn.execute('PRAGMA database_list').fetchone()[2]
+    if not caminho:
+        return 0
+    return sum(os.path.getsize(c) for c in (caminho, caminho + "-wal") if os.path.exists(c))
+
+
+# Migrações do schema: (versão, descrição, passos). Cada passo é um comando
+# SQL ou uma função que recebe o cursor; todos devem ser idempotentes.
+MIGRACOES = [
+    (1, "Tabelas iniciais", [
+        # Tabela de usuários
+        '''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Tabela de tarefas
+        '''
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            texto TEXT NOT NULL,
+            prioridade TEXT NOT NULL,
+            concluida BOOLEAN DEFAULT FALSE,
+            timestamp TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        # Tabela de ideias
+        '''
+        CREATE TABLE IF NOT EXISTS ideias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            texto TEXT NOT NULL,
+            categoria TEXT DEFAULT 'Geral',
+            timestamp TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        # Tabela de mensagens do chat
+        '''
+        CREATE TABLE IF NOT EXISTS mensagens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+    ]),
+    (2, "Índices compostos por usuário e data", [
+        'CREATE INDEX IF NOT EXISTS idx_tarefas_usuario_data ON tarefas (usuario_id, data_criacao)',
+        'CREATE INDEX IF NOT EXISTS idx_ideias_usuario_data ON ideias (usuario_id, data_criacao)',
+        'CREATE INDEX IF NOT EXISTS idx_mensagens_usuario_timestamp ON mensagens (usuario_id, timestamp)',
+        'ANALYZE',
+    ]),
+    (3, "Cache de respostas do assistente", [
+        '''
+        CREATE TABLE IF NOT EXISTS cache_respostas (
+            chave TEXT PRIMARY KEY,
+            modelo TEXT NOT NULL,
+            resposta TEXT NOT NULL,
+            criado_em REAL NOT NULL,
+            acessado_em REAL NOT NULL,
+            acessos INTEGER DEFAULT 0
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_cache_respostas_acesso ON cache_respostas (acessado_em)',
+    ]),
+    (4, "Resumo incremental da conversa e arquivo de mensagens", [
+        '''
+        CREATE TABLE IF NOT EXISTS resumos_conversa (
+            usuario_id INTEGER PRIMARY KEY,
+            resumo TEXT NOT NULL,
+            ate_mensagem_id INTEGER NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS mensagens_arquivadas (
+            id INTEGER PRIMARY KEY,
+            usuario_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP,
+            arquivada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_mensagens_arquivadas_usuario ON mensagens_arquivadas (usuario_id, id)',
+    ]),
+    (5, "Busca textual (FTS5) em tarefas, ideias e mensagens", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tarefas_fts USING fts5(
+            texto, content='tarefas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tarefas_fts_ai AFTER INSERT ON tarefas BEGIN
+            INSERT INTO tarefas_fts (rowid, texto) VALUES (new.id, new.texto);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tarefas_fts_ad AFTER DELETE ON tarefas BEGIN
+            INSERT INTO tarefas_fts (tarefas_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tarefas_fts_au AFTER UPDATE OF texto ON tarefas BEGIN
+            INSERT INTO tarefas_fts (tarefas_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+            INSERT INTO tarefas_fts (rowid, texto) VALUES (new.id, new.texto);
+        END
+        ''',
+        "INSERT INTO tarefas_fts (tarefas_fts) VALUES ('rebuild')",
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ideias_fts USING fts5(
+            texto, categoria, content='ideias', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ideias_fts_ai AFTER INSERT ON ideias BEGIN
+            INSERT INTO ideias_fts (rowid, texto, categoria) VALUES (new.id, new.texto, new.categoria);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ideias_fts_ad AFTER DELETE ON ideias BEGIN
+            INSERT INTO ideias_fts (ideias_fts, rowid, texto, categoria) VALUES ('delete', old.id, old.texto, old.categoria);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ideias_fts_au AFTER UPDATE OF texto, categoria ON ideias BEGIN
+            INSERT INTO ideias_fts (ideias_fts, rowid, texto, categoria) VALUES ('delete', old.id, old.texto, old.categoria);
+            INSERT INTO ideias_fts (rowid, texto, categoria) VALUES (new.id, new.texto, new.categoria);
+        END
+        ''',
+        "INSERT INTO ideias_fts (ideias_fts) VALUES ('rebuild')",
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS mensagens_fts USING fts5(
+            content, content='mensagens', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_ai AFTER INSERT ON mensagens BEGIN
+            INSERT INTO mensagens_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_ad AFTER DELETE ON mensagens BEGIN
+            INSERT INTO mensagens_fts (mensagens_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_au AFTER UPDATE OF content ON mensagens BEGIN
+            INSERT INTO mensagens_fts (mensagens_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO mensagens_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        "INSERT INTO mensagens_fts (mensagens_fts) VALUES ('rebuild')",
+    ]),
+    (6, "Índice vetorial local para recuperação de tarefas e ideias", [
+        '''
+        CREATE TABLE IF NOT EXISTS vetores_itens (
+            tipo TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            vetor BLOB NOT NULL,
+            PRIMARY KEY (tipo, item_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_vetores_itens_usuario ON vetores_itens (usuario_id, tipo)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS vetores_tarefas_ad AFTER DELETE ON tarefas BEGIN
+            DELETE FROM vetores_itens WHERE tipo = 'tarefa' AND item_id = old.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS vetores_ideias_ad AFTER DELETE ON ideias BEGIN
+            DELETE FROM vetores_itens WHERE tipo = 'ideia' AND item_id = old.id;
+        END
+        ''',
+        lambda cursor: indexar_vetores(
+            cursor, 'tarefa', cursor.execute('SELECT id, usuario_id, texto FROM tarefas').fetchall()
+        ),
+        lambda cursor: indexar_vetores(
+            cursor, 'ideia', cursor.execute('SELECT id, usuario_id, texto FROM ideias').fetchall()
+        ),
+    ]),
+    (7, "Retenção do histórico do chat por usuário", [
+        '''
+        CREATE TABLE IF NOT EXISTS retencao_mensagens (
+            usuario_id INTEGER PRIMARY KEY,
+            dias INTEGER NOT NULL,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_mensagens_arquivadas_timestamp ON mensagens_arquivadas (usuario_id, timestamp)',
+    ]),
+    (8, "Planos diários pré-gerados", [
+        '''
+        CREATE TABLE IF NOT EXISTS planos_diarios (
+            usuario_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            plano TEXT NOT NULL,
+            gerado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (usuario_id, dia),
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_planos_diarios_dia ON planos_diarios (dia)',
+    ]),
+    (9, "Busca textual (FTS5) nas mensagens arquivadas", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS mensagens_arquivadas_fts USING fts5(
+            content, content='mensagens_arquivadas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_arquivadas_fts_ai AFTER INSERT ON mensagens_arquivadas BEGIN
+            INSERT INTO mensagens_arquivadas_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_arquivadas_fts_ad AFTER DELETE ON mensagens_arquivadas BEGIN
+            INSERT INTO mensagens_arquivadas_fts (mensagens_arquivadas_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS mensagens_arquivadas_fts_au AFTER UPDATE OF content ON mensagens_arquivadas BEGIN
+            INSERT INTO mensagens_arquivadas_fts (mensagens_arquivadas_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO mensagens_arquivadas_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        "INSERT INTO mensagens_arquivadas_fts (mensagens_arquivadas_fts) VALUES ('rebuild')",
+    ]),
+    (10, "Índice dos vetores pelos itens mais recentes do usuário", [
+        'CREATE INDEX IF NOT EXISTS idx_vetores_itens_recentes ON vetores_itens (usuario_id, tipo, item_id)',
+        'DROP INDEX IF EXISTS idx_vetores_itens_usuario',
+    ]),
+]
+
+
+# Sistema de Banco de Dados
+@instrumentar_classe("db")
+class DatabaseManager(Repositorio):
+    """Armazenamento padrão: um arquivo SQLite acessado por um pool de conexões"""
+
+    ErroBanco = sqlite3.Error
+    ErroIntegridade = sqlite3.IntegrityError
+    MIGRACOES = MIGRACOES
+
+    def __init__(self, db_path=DB_PATH, pool=None, usar_cache=True):
+        self.db_path = db_path
+        self.pool = pool or obter_pool(db_path)
+        self.cache = obter_cache_leitura(self.pool) if usar_cache else None
+        self.init_db()
+
+    def init_db(self):
+        """Inicializa o banco de dados e aplica as migrações pendentes"""
+        self.migrar()
+
+    def versao_schema(self):
+        """Retorna a versão atual do schema (0 se nenhuma migração foi aplicada)"""
+        with self.pool.conexao() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS schema_version ('
+                'versao INTEGER PRIMARY KEY, descricao TEXT NOT NULL, '
+                'aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'
+            )
+            versao = conn.execute('SELECT MAX(versao) FROM schema_version').fetchone()[0]
+        return versao or 0
+
+    def migrar(self, ate=None):
+        """Aplica, em ordem, as migrações ainda não registradas em schema_version"""
+        aplicadas = []
+        atual = self.versao_schema()
+
+        for versao, descricao, passos in self.MIGRACOES:
+            if versao <= atual or (ate is not None and versao > ate):
+                continue
+
+            with self.pool.conexao() as conn:
+                self._iniciar_migracao(conn)
+                try:
+                    registrada = conn.execute(
+                        'SELECT 1 FROM schema_version WHERE versao = ?', (versao,)
+                    ).fetchone()
+                    if not registrada:
+                        cursor = conn.cursor()
+                        for passo in passos:
+                            if callable(passo):
+                                passo(cursor)
+                            else:
+                                cursor.execute(passo)
+                        cursor.execute(
+                            'INSERT INTO schema_version (versao, descricao) VALUES (?, ?)',
+                            (versao, descricao)
+                        )
+                        aplicadas.append(versao)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+        return aplicadas
+
+    def _iniciar_migracao(self, conn):
+        # BEGIN IMMEDIATE serializa migrações concorrentes entre processos
+        conn.execute('BEGIN IMMEDIATE')
+
+    def hash_password(self, password):
+        """Gera hash salgado da senha (scrypt, ver senhas.py)"""
+        return gerar_hash(password)
+
+    def criar_usuario(self, username, email, password):
+        """Cria um novo usuário"""
+        try:
+            password_hash = obter_verificador().gerar(password)
+            with self.pool.transacao() as cursor:
+                cursor.execute(
+                    'INSERT INTO usuarios (username, email, password_hash) VALUES (?, ?, ?)',
+                    (username, email, password_hash)
+                )
+            return True
+        except self.ErroIntegridade:
+            return False
+
+    def verificar_login(self, username, password):
+        """Verifica credenciais de login (pode levantar LoginIndisponivel sob carga)"""
+        with self.pool.conexao() as conn:
+            usuario = conn.execute(
+                'SELECT id, username, password_hash FROM usuarios WHERE username = ?',
+                (username,)
+            ).fetchone()
+
+        valida, novo_hash = obter_verificador().verificar(password, usuario[2] if usuario else None)
+        if not valida:
+            return None
+
+        # Migra hashes legados/fracos para os parâmetros atuais de forma transparente
+        if novo_hash:
+            with self.pool.transacao() as cursor:
+                cursor.execute(
+                    'UPDATE usuarios SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                    (novo_hash, usuario[0], usuario[2])
+                )
+
+        return {'id': usuario[0], 'username': usuario[1]}
+
+    # Operações para Tarefas
+    # Colunas que podem ser alteradas por atualizar_tarefa(s)
+    CAMPOS_TAREFA = ('texto', 'prioridade', 'concluida', 'timestamp')
+
+    @invalida_cache
+    def salvar_tarefa(self, usuario_id, tarefa):
+        """Insere a tarefa e retorna o id gerado"""
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'INSERT INTO tarefas (usuario_id, texto, prioridade, concluida, timestamp) VALUES (?, ?, ?, ?, ?)',
+                (usuario_id, tarefa['texto'], tarefa['prioridade'], tarefa['concluida'], tarefa['timestamp'])
+            )
+            tarefa_id = cursor.lastrowid
+            indexar_vetores(cursor, 'tarefa', [(tarefa_id, usuario_id, tarefa['texto'])])
+            return tarefa_id
+
+    @invalida_cache
+    def salvar_tarefas(self, usuario_id, tarefas):
+        """Insere várias tarefas em uma única transação"""
+        with self.pool.transacao() as cursor:
+            ultimo_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tarefas').fetchone()[0]
+            cursor.executemany(
+                'INSERT INTO tarefas (usuario_id, texto, prioridade, concluida, timestamp) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (usuario_id, t['texto'], t['prioridade'], t['concluida'], t['timestamp'])
+                    for t in tarefas
+                ]
+            )
+            indexar_vetores(cursor, 'tarefa', cursor.execute(
+                'SELECT id, usuario_id, texto FROM tarefas WHERE id > ? AND usuario_id = ?',
+                (ultimo_id, usuario_id)
+            ).fetchall())
+
+    @leitura_em_cache
+    def carregar_tarefas(self, usuario_id):
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                'SELECT id, texto, prioridade, concluida, timestamp FROM tarefas WHERE usuario_id = ? ORDER BY data_criacao DESC, id DESC',
+                (usuario_id,)
+            ).fetchall()
+
+        return [self._tarefa_de_row(row) for row in rows]
+
+    def iterar_tarefas(self, usuario_id, lote=1000):
+        """Percorre todas as tarefas do usuário sem montar a lista inteira em memória"""
+        yield from self._iterar(
+            'SELECT id, texto, prioridade, concluida, timestamp FROM tarefas WHERE usuario_id = ? ORDER BY id',
+            (usuario_id,), lote, self._tarefa_de_row
+        )
+
+    def _tarefa_de_row(self, row):
+        return {
+            'id': row[0],
+            'texto': row[1],
+            'prioridade': row[2],
+            'concluida': bool(row[3]),
+            'timestamp': row[4]
+        }
+
+    @leitura_em_cache
+    def carregar_tarefas_pagina(self, usuario_id, limite=20, cursor=None, apenas_pendentes=False, prioridade=None):
+        """Carrega uma página de tarefas; retorna (tarefas, cursor da próxima página ou None)"""
+        filtros = []
+        params = []
+        if apenas_pendentes:
+            filtros.append('NOT concluida')
+        if prioridade:
+            filtros.append('prioridade = ?')
+            params.append(prioridade)
+
+        return self._carregar_pagina(
+            'SELECT id, texto, prioridade, concluida, timestamp, data_criacao FROM tarefas',
+            usuario_id, filtros, params, limite, cursor, self._tarefa_de_row
+        )
+
+    @invalida_cache
+    def atualizar_tarefa(self, usuario_id, tarefa_id, campo, valor):
+        """Atualiza um campo de uma tarefa pelo id"""
+        if campo not in self.CAMPOS_TAREFA:
+            raise ValueError(f"Campo inválido para tarefa: {campo}")
+
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                f'UPDATE tarefas SET {campo} = ? WHERE id = ? AND usuario_id = ?',
+                (valor, tarefa_id, usuario_id)
+            )
+            alterada = cursor.rowcount > 0
+            if alterada and campo == 'texto':
+                indexar_vetores(cursor, 'tarefa', [(tarefa_id, usuario_id, valor)])
+            return alterada
+
+    @invalida_cache
+    def atualizar_tarefas(self, usuario_id, campo, alteracoes):
+        """Atualiza um campo de várias tarefas; alteracoes é uma lista de (tarefa_id, valor)"""
+        if campo not in self.CAMPOS_TAREFA:
+            raise ValueError(f"Campo inválido para tarefa: {campo}")
+
+        with self.pool.transacao() as cursor:
+            cursor.executemany(
+                f'UPDATE tarefas SET {campo} = ? WHERE id = ? AND usuario_id = ?',
+                [(valor, tarefa_id, usuario_id) for tarefa_id, valor in alteracoes]
+            )
+            if campo == 'texto':
+                ids = [tarefa_id for tarefa_id, _ in alteracoes]
+                indexar_vetores(cursor, 'tarefa', cursor.execute(
+                    f'SELECT id, usuario_id, texto FROM tarefas WHERE usuario_id = ? AND id IN ({",".join("?" * len(ids))})',
+                    [usuario_id] + ids
+                ).fetchall())
+
+    @invalida_cache
+    def excluir_tarefa(self, usuario_id, tarefa_id):
+        """Exclui uma tarefa pelo id"""
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'DELETE FROM tarefas WHERE id = ? AND usuario_id = ?',
+                (tarefa_id, usuario_id)
+            )
+            return cursor.rowcount > 0
+
+    @invalida_cache
+    def excluir_tarefas(self, usuario_id, tarefa_ids):
+        """Exclui várias tarefas em uma única transação"""
+        with self.pool.transacao() as cursor:
+            cursor.executemany(
+                'DELETE FROM tarefas WHERE id = ? AND usuario_id = ?',
+                [(tarefa_id, usuario_id) for tarefa_id in tarefa_ids]
+            )
+
+    @invalida_cache
+    def limpar_tarefas(self, usuario_id):
+        with self.pool.transacao() as cursor:
+            cursor.execute('DELETE FROM tarefas WHERE usuario_id = ?', (usuario_id,))
+
+    # Operações para Ideias
+    @invalida_cache
+    def salvar_ideia(self, usuario_id, ideia):
+        """Insere a ideia e retorna o id gerado"""
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'INSERT INTO ideias (usuario_id, texto, categoria, timestamp) VALUES (?, ?, ?, ?)',
+                (usuario_id, ideia['texto'], ideia['categoria'], ideia['timestamp'])
+            )
+            ideia_id = cursor.lastrowid
+            indexar_vetores(cursor, 'ideia', [(ideia_id, usuario_id, ideia['texto'])])
+            return ideia_id
+
+    @invalida_cache
+    def salvar_ideias(self, usuario_id, ideias):
+        """Insere várias ideias em uma única transação"""
+        with self.pool.transacao() as cursor:
+            ultimo_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM ideias').fetchone()[0]
+            cursor.executemany(
+                'INSERT INTO ideias (usuario_id, texto, categoria, timestamp) VALUES (?, ?, ?, ?)',
+                [(usuario_id, i['texto'], i['categoria'], i['timestamp']) for i in ideias]
+            )
+            indexar_vetores(cursor, 'ideia', cursor.execute(
+                'SELECT id, usuario_id, texto FROM ideias WHERE id > ? AND usuario_id = ?',
+                (ultimo_id, usuario_id)
+            ).fetchall())
+
+    @leitura_em_cache
+    def carregar_ideias(self, usuario_id):
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                'SELECT id, texto, categoria, timestamp FROM ideias WHERE usuario_id = ? ORDER BY data_criacao DESC, id DESC',
+                (usuario_id,)
+            ).fetchall()
+
+        return [self._ideia_de_row(row) for row in rows]
+
+    def iterar_ideias(self, usuario_id, lote=1000):
+        """Percorre todas as ideias do usuário sem montar a lista inteira em memória"""
+        yield from self._iterar(
+            'SELECT id, texto, categoria, timestamp FROM ideias WHERE usuario_id = ? ORDER BY id',
+            (usuario_id,), lote, self._ideia_de_row
+        )
+
+    def _ideia_de_row(self, row):
+        return {
+            'id': row[0],
+            'texto': row[1],
+            'categoria': row[2],
+            'timestamp': row[3]
+        }
+
+    @leitura_em_cache
+    def carregar_ideias_pagina(self, usuario_id, limite=20, cursor=None, categoria=None):
+        """Carrega uma página de ideias; retorna (ideias, cursor da próxima página ou None)"""
+        filtros = []
+        params = []
+        if categoria:
+            filtros.append('categoria = ?')
+            params.append(categoria)
+
+        return self._carregar_pagina(
+            'SELECT id, texto, categoria, timestamp, data_criacao FROM ideias',
+            usuario_id, filtros, params, limite, cursor, self._ideia_de_row
+        )
+
+    @invalida_cache
+    def excluir_ideia(self, usuario_id, ideia_id):
+        """Exclui uma ideia pelo id"""
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'DELETE FROM ideias WHERE id = ? AND usuario_id = ?',
+                (ideia_id, usuario_id)
+            )
+            return cursor.rowcount > 0
+
+    # Paginação por cursor (keyset): a página seguinte começa depois do
+    # último (data_criacao, id) visto, sem OFFSET, usando o índice composto
+    def _carregar_pagina(self, select, usuario_id, filtros, params, limite, cursor, converter):
+        condicoes = ['usuario_id = ?'] + filtros
+        valores = [usuario_id] + params
+        if cursor is not None:
+            condicoes.append('(data_criacao, id) < (?, ?)')
+            valores.extend(cursor)
+
+        sql = f"{select} WHERE {' AND '.join(condicoes)} ORDER BY data_criacao DESC, id DESC LIMIT ?"
+        with self.pool.conexao() as conn:
+            rows = conn.execute(sql, valores + [limite + 1]).fetchall()
+
+        proximo = None
+        if len(rows) > limite:
+            rows = rows[:limite]
+            ultimo = rows[-1]
+            proximo = (ultimo[-1], ultimo[0])
+
+        return [converter(row) for row in rows], proximo
+
+    # Leitura em fluxo: o cursor é consumido em blocos de `lote` linhas e a
+    # conexão volta ao pool quando o gerador termina (ou é fechado)
+    def _iterar(self, sql, params, lote, converter):
+        with self.pool.conexao() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(lote)
+                if not rows:
+                    break
+                for row in rows:
+                    yield converter(row)
+
+    # Operações para Mensagens
+    @invalida_cache
+    def salvar_mensagem(self, usuario_id, role, content):
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'INSERT INTO mensagens (usuario_id, role, content) VALUES (?, ?, ?)',
+                (usuario_id, role, content)
+            )
+
+    def salvar_mensagens(self, mensagens):
+        """Insere várias mensagens (usuario_id, role, content), de um ou mais usuários, em uma transação"""
+        with self.pool.transacao() as cursor:
+            cursor.executemany(
+                'INSERT INTO mensagens (usuario_id, role, content) VALUES (?, ?, ?)',
+                mensagens
+            )
+
+        if self.cache is not None:
+            for usuario_id in {m[0] for m in mensagens}:
+                self.cache.invalidar(usuario_id)
+
+    @leitura_em_cache
+    def carregar_mensagens(self, usuario_id, limite=50):
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                'SELECT role, content FROM mensagens WHERE usuario_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?',
+                (usuario_id, limite)
+            ).fetchall()
+
+        mensagens = []
+        for row in rows:
+            mensagens.append({
+                'role': row[0],
+                'content': row[1]
+            })
+
+        return mensagens[::-1]  # Reverter para ordem cronológica
+
+    # Recuperação das tarefas e ideias mais relevantes para o assistente
+    @leitura_em_cache
+    def recuperar_relevantes(self, usuario_id, consulta, k=15, max_candidatos=2000):
+        """Retorna {'tarefas', 'ideias'} com até k itens de cada, os mais similares à consulta
+        primeiro; se faltarem itens similares, completa com as tarefas pendentes e ideias mais recentes
+
+        Só são comparados os vetores das `max_candidatos` tarefas pendentes e
+        ideias mais recentes, para que o custo de cada pergunta não cresça com
+        o tamanho da conta; itens mais antigos que isso ficam de fora.
+        """
+        vetor = vetorizar(consulta)
+        resultado = {}
+        for chave, candidatos_sql, select, converter, recentes in (
+            ('tarefas',
+             '''
+             SELECT v.item_id, v.vetor FROM vetores_itens v
+             JOIN tarefas t ON t.id = v.item_id
+             WHERE v.usuario_id = ? AND v.tipo = 'tarefa' AND NOT t.concluida
+             ORDER BY v.item_id DESC LIMIT ?
+             ''',
+             'SELECT id, texto, prioridade, concluida, timestamp FROM tarefas',
+             self._tarefa_de_row,
+             lambda: self.carregar_tarefas_pagina(usuario_id, limite=k, apenas_pendentes=True)[0]),
+            ('ideias',
+             '''
+             SELECT item_id, vetor FROM vetores_itens
+             WHERE usuario_id = ? AND tipo = 'ideia'
+             ORDER BY item_id DESC LIMIT ?
+             ''',
+             'SELECT id, texto, categoria, timestamp FROM ideias',
+             self._ideia_de_row,
+             lambda: self.carregar_ideias_pagina(usuario_id, limite=k)[0]),
+        ):
+            with self.pool.conexao() as conn:
+                candidatos = conn.execute(candidatos_sql, (usuario_id, max_candidatos)).fetchall()
+            similares = mais_similares(vetor, candidatos, k)
+            ids = [item_id for item_id, _ in similares]
+            itens = []
+            if ids:
+                with self.pool.conexao() as conn:
+                    rows = conn.execute(
+                        f'{select} WHERE usuario_id = ? AND id IN ({",".join("?" * len(ids))})',
+                        [usuario_id] + ids
+                    ).fetchall()
+                por_id = {row[0]: converter(row) for row in rows}
+                itens = [por_id[i] for i in ids if i in por_id]
+
+            if len(itens) < k:
+                vistos = set(ids)
+                itens.extend(item for item in recentes() if item['id'] not in vistos)
+            resultado[chave] = itens[:k]
+
+        return resultado
+
+    # Busca textual
+    # (tipo, tabela FTS, tabela base, coluna de texto; o trecho vem da 1ª coluna da FTS)
+    FONTES_BUSCA = (
+        ('tarefa', 'tarefas_fts', 'tarefas', 'texto'),
+        ('ideia', 'ideias_fts', 'ideias', 'texto'),
+        ('mensagem', 'mensagens_fts', 'mensagens', 'content'),
+        ('mensagem', 'mensagens_arquivadas_fts', 'mensagens_arquivadas', 'content'),
+    )
+
+    @staticmethod
+    def _consulta_fts(termo):
+        """Converte o texto digitado em uma consulta FTS5 segura (todas as palavras, por prefixo)"""
+        palavras = re.findall(r"\w+", termo)
+        return " ".join(f'"{p}"*' for p in palavras)
+
+    @leitura_em_cache
+    def buscar(self, usuario_id, termo, tipos=None, limite=20, pagina=0):
+        """Busca em tarefas, ideias e mensagens do usuário, ordenando por relevância (bm25)
+
+        Retorna (resultados, há_mais), onde cada resultado tem tipo, id, texto e
+        um trecho com os termos encontrados marcados em negrito.
+        """
+        consulta = self._consulta_fts(termo)
+        if not consulta:
+            return [], False
+
+        partes = []
+        params = []
+        for tipo, fts, base, coluna in self.FONTES_BUSCA:
+            if tipos and tipo not in tipos:
+                continue
+            partes.append(f'''
+                SELECT '{tipo}', b.id, b.{coluna},
+                       snippet({fts}, 0, '**', '**', '…', 12), bm25({fts})
+                FROM {fts} JOIN {base} b ON b.id = {fts}.rowid
+                WHERE {fts} MATCH ? AND b.usuario_id = ?
+            ''')
+            params.extend([consulta, usuario_id])
+
+        if not partes:
+            return [], False
+
+        sql = " UNION ALL ".join(partes) + " ORDER BY 5 LIMIT ? OFFSET ?"
+        with self.pool.conexao() as conn:
+            rows = conn.execute(sql, params + [limite + 1, pagina * limite]).fetchall()
+
+        resultados = [
+            {'tipo': row[0], 'id': row[1], 'texto': row[2], 'trecho': row[3], 'relevancia': -row[4]}
+            for row in rows[:limite]
+        ]
+        return resultados, len(rows) > limite
+
+    # Resumo da conversa e compactação do histórico
+    @leitura_em_cache
+    def carregar_resumo(self, usuario_id):
+        """Retorna o resumo salvo da conversa ({'resumo', 'ate_mensagem_id'}) ou None"""
+        with self.pool.conexao() as conn:
+            row = conn.execute(
+                'SELECT resumo, ate_mensagem_id FROM resumos_conversa WHERE usuario_id = ?',
+                (usuario_id,)
+            ).fetchone()
+
+        if row:
+            return {'resumo': row[0], 'ate_mensagem_id': row[1]}
+        return None
+
+    def carregar_mensagens_nao_resumidas(self, usuario_id, manter_recentes=10, limite=50):
+        """Mensagens ainda não resumidas, excluindo as `manter_recentes` mais novas"""
+        resumo = self.carregar_resumo(usuario_id)
+        apos_id = resumo['ate_mensagem_id'] if resumo else 0
+
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                '''
+                SELECT id, role, content FROM mensagens
+                WHERE usuario_id = ? AND id > ? AND id < COALESCE((
+                    SELECT MIN(id) FROM (
+                        SELECT id FROM mensagens WHERE usuario_id = ?
+                        ORDER BY id DESC LIMIT ?
+                    ) AS recentes
+                ), -1)
+                ORDER BY id LIMIT ?
+                ''',
+                (usuario_id, apos_id, usuario_id, manter_recentes, limite)
+            ).fetchall()
+
+        return [{'id': row[0], 'role': row[1], 'content': row[2]} for row in rows]
+
+    @invalida_cache
+    def salvar_resumo(self, usuario_id, resumo, ate_mensagem_id, arquivar=True, manter_visiveis=50):
+        """Grava o resumo e, opcionalmente, move as mensagens resumidas para o arquivo
+
+        As `manter_visiveis` mensagens mais novas ficam em `mensagens` mesmo
+        quando já resumidas, porque são as que o chat mostra; elas vão para o
+        arquivo em um resumo posterior, quando saírem dessa janela.
+        """
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                '''
+                INSERT INTO resumos_conversa (usuario_id, resumo, ate_mensagem_id, atualizado_em)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (usuario_id) DO UPDATE SET
+                    resumo = excluded.resumo,
+                    ate_mensagem_id = excluded.ate_mensagem_id,
+                    atualizado_em = excluded.atualizado_em
+                ''',
+                (usuario_id, resumo, ate_mensagem_id)
+            )
+
+            if not arquivar:
+                return
+
+            ate_arquivar = ate_mensagem_id
+            if manter_visiveis:
+                total, primeira_visivel = cursor.execute(
+                    '''
+                    SELECT COUNT(*), MIN(id) FROM (
+                        SELECT id FROM mensagens WHERE usuario_id = ?
+                        ORDER BY id DESC LIMIT ?
+                    ) AS visiveis
+                    ''',
+                    (usuario_id, manter_visiveis)
+                ).fetchone()
+                if total < manter_visiveis:
+                    return
+                ate_arquivar = min(ate_mensagem_id, primeira_visivel - 1)
+
+            cursor.execute(
+                '''
+                INSERT INTO mensagens_arquivadas (id, usuario_id, role, content, timestamp)
+                SELECT id, usuario_id, role, content, timestamp FROM mensagens
+                WHERE usuario_id = ? AND id <= ?
+                ON CONFLICT (id) DO NOTHING
+                ''',
+                (usuario_id, ate_arquivar)
+            )
+            cursor.execute(
+                'DELETE FROM mensagens WHERE usuario_id = ? AND id <= ?',
+                (usuario_id, ate_arquivar)
+            )
+
+    # Retenção e arquivamento do histórico (ver manutencao.py)
+    def listar_usuarios(self):
+        """Ids de todas as contas, em ordem"""
+        with self.pool.conexao() as conn:
+            return [row[0] for row in conn.execute('SELECT id FROM usuarios ORDER BY id').fetchall()]
+
+    def obter_retencao(self, usuario_id):
+        """Dias de retenção escolhidos pelo usuário, ou None (vale o padrão)"""
+        with self.pool.conexao() as conn:
+            row = conn.execute(
+                'SELECT dias FROM retencao_mensagens WHERE usuario_id = ?', (usuario_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def definir_retencao(self, usuario_id, dias):
+        """Grava a retenção do usuário em dias (None volta ao padrão)"""
+        with self.pool.transacao() as cursor:
+            if dias is None:
+                cursor.execute('DELETE FROM retencao_mensagens WHERE usuario_id = ?', (usuario_id,))
+            else:
+                cursor.execute(
+                    'INSERT INTO retencao_mensagens (usuario_id, dias) VALUES (?, ?) '
+                    'ON CONFLICT (usuario_id) DO UPDATE SET dias = excluded.dias',
+                    (usuario_id, dias)
+                )
+
+    def iterar_mensagens_antigas(self, usuario_id, antes_de, manter_recentes=50, lote=1000):
+        """Percorre, em ordem de id, as mensagens (do chat e já arquivadas no banco)
+        gravadas antes de `antes_de`, sem incluir as `manter_recentes` mais novas
+        das duas tabelas juntas (as arquivadas mantêm o id de origem; com
+        `manter_recentes=0` não há corte)"""
+        yield from self._iterar(
+            '''
+            WITH corte (id) AS (
+                SELECT COALESCE(MIN(id), 9223372036854775807) FROM (
+                    SELECT id FROM mensagens WHERE usuario_id = ?
+                    UNION ALL
+                    SELECT id FROM mensagens_arquivadas WHERE usuario_id = ?
+                    ORDER BY id DESC LIMIT ?
+                ) AS recentes
+            )
+            SELECT id, role, content, timestamp FROM mensagens
+            WHERE usuario_id = ? AND timestamp < ? AND id < (SELECT id FROM corte)
+            UNION ALL
+            SELECT id, role, content, timestamp FROM mensagens_arquivadas
+            WHERE usuario_id = ? AND timestamp < ? AND id < (SELECT id FROM corte)
+            ORDER BY 1
+            ''',
+            (usuario_id, usuario_id, manter_recentes, usuario_id, antes_de, usuario_id, antes_de),
+            lote,
+            lambda row: {'id': row[0], 'role': row[1], 'content': row[2], 'timestamp': row[3]}
+        )
+
+    @invalida_cache
+    def excluir_mensagens_antigas(self, usuario_id, antes_de, ate_id):
+        """Remove as mensagens anteriores a `antes_de` com id até `ate_id` (as já
+        copiadas por iterar_mensagens_antigas); retorna quantas foram removidas"""
+        removidas = 0
+        with self.pool.transacao() as cursor:
+            for tabela in ('mensagens', 'mensagens_arquivadas'):
+                cursor.execute(
+                    f'DELETE FROM {tabela} WHERE usuario_id = ? AND timestamp < ? AND id <= ?',
+                    (usuario_id, antes_de, ate_id)
+                )
+                removidas += cursor.rowcount
+        return removidas
+
+    # Planos diários pré-gerados (ver planejamento.py). As consultas recebem
+    # um lote de usuários e trazem os dados de todos de uma vez
+    def usuarios_ativos(self, usuario_ids, desde):
+        """Dos `usuario_ids`, os que conversaram ou criaram tarefas ou ideias desde `desde`"""
+        if not usuario_ids:
+            return []
+        candidatos = ", ".join("(CAST(? AS BIGINT))" for _ in usuario_ids)
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                f'''
+                WITH candidatos (id) AS (VALUES {candidatos})
+                SELECT c.id FROM candidatos c
+                WHERE EXISTS (SELECT 1 FROM mensagens m WHERE m.usuario_id = c.id AND m.timestamp >= ?)
+                   OR EXISTS (SELECT 1 FROM tarefas t WHERE t.usuario_id = c.id AND t.data_criacao >= ?)
+                   OR EXISTS (SELECT 1 FROM ideias i WHERE i.usuario_id = c.id AND i.data_criacao >= ?)
+                ORDER BY c.id
+                ''',
+                [*usuario_ids, desde, desde, desde]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def carregar_contexto_planejamento(self, usuario_ids, limite_tarefas=30, limite_ideias=15):
+        """Tarefas pendentes, ideias recentes e resumo da conversa de cada usuário
+
+        Retorna {usuario_id: {'tarefas', 'ideias', 'resumo'}}, com até
+        `limite_tarefas` tarefas e `limite_ideias` ideias (as mais novas) por usuário.
+        """
+        contextos = {usuario_id: {'tarefas': [], 'ideias': [], 'resumo': ""} for usuario_id in usuario_ids}
+        if not usuario_ids:
+            return contextos
+        marcadores = ", ".join("?" for _ in usuario_ids)
+
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                f'''
+                SELECT usuario_id, id, texto, prioridade, concluida, timestamp FROM (
+                    SELECT usuario_id, id, texto, prioridade, concluida, timestamp,
+                           ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY data_criacao DESC, id DESC) AS posicao
+                    FROM tarefas WHERE usuario_id IN ({marcadores}) AND NOT concluida
+                ) AS pendentes
+                WHERE posicao <= ? ORDER BY usuario_id, posicao
+                ''',
+                [*usuario_ids, limite_tarefas]
+            ).fetchall()
+            for row in rows:
+                contextos[row[0]]['tarefas'].append(self._tarefa_de_row(row[1:]))
+
+            rows = conn.execute(
+                f'''
+                SELECT usuario_id, id, texto, categoria, timestamp FROM (
+                    SELECT usuario_id, id, texto, categoria, timestamp,
+                           ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY data_criacao DESC, id DESC) AS posicao
+                    FROM ideias WHERE usuario_id IN ({marcadores})
+                ) AS recentes
+                WHERE posicao <= ? ORDER BY usuario_id, posicao
+                ''',
+                [*usuario_ids, limite_ideias]
+            ).fetchall()
+            for row in rows:
+                contextos[row[0]]['ideias'].append(self._ideia_de_row(row[1:]))
+
+            rows = conn.execute(
+                f'SELECT usuario_id, resumo FROM resumos_conversa WHERE usuario_id IN ({marcadores})',
+                list(usuario_ids)
+            ).fetchall()
+            for row in rows:
+                contextos[row[0]]['resumo'] = row[1]
+
+        return contextos
+
+    def planos_existentes(self, usuario_ids, dia):
+        """Dos `usuario_ids`, os que já têm plano para `dia` (AAAA-MM-DD)"""
+        if not usuario_ids:
+            return set()
+        marcadores = ", ".join("?" for _ in usuario_ids)
+        with self.pool.conexao() as conn:
+            rows = conn.execute(
+                f'SELECT usuario_id FROM planos_diarios WHERE dia = ? AND usuario_id IN ({marcadores})',
+                [dia, *usuario_ids]
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def salvar_planos(self, planos):
+        """Grava (ou substitui) planos (usuario_id, dia, modelo, plano), de um ou mais usuários, em uma transação"""
+        with self.pool.transacao() as cursor:
+            cursor.executemany(
+                'INSERT INTO planos_diarios (usuario_id, dia, modelo, plano) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (usuario_id, dia) DO UPDATE SET modelo = excluded.modelo, '
+                'plano = excluded.plano, gerado_em = CURRENT_TIMESTAMP',
+                planos
+            )
+
+    def obter_plano(self, usuario_id, dia):
+        """{'plano', 'modelo', 'gerado_em'} do usuário para `dia`, ou None"""
+        with self.pool.conexao() as conn:
+            row = conn.execute(
+                'SELECT plano, modelo, gerado_em FROM planos_diarios WHERE usuario_id = ? AND dia = ?',
+                (usuario_id, dia)
+            ).fetchone()
+        if row:
+            return {'plano': row[0], 'modelo': row[1], 'gerado_em': str(row[2])}
+        return None
+
+    def limpar_planos(self, antes_de):
+        """Remove os planos de dias anteriores a `antes_de`; retorna quantos foram removidos"""
+        with self.pool.transacao() as cursor:
+            cursor.execute('DELETE FROM planos_diarios WHERE dia < ?', (antes_de,))
+            return cursor.rowcount
+
+    # Compactação do arquivo
+    def compactar(self, vacuum_completo=False, limite_livres=0.25):
+        """Devolve ao disco as páginas livres e atualiza as estatísticas do planejador
+
+        Roda `PRAGMA incremental_vacuum` quando o banco já usa auto_vacuum
+        incremental; senão (ou com `vacuum_completo`, ou com mais de
+        `limite_livres` das páginas livres) faz um VACUUM completo, que também
+        passa o arquivo para auto_vacuum incremental. Retorna uma lista com um
+        relatório por arquivo: {'banco', 'operacao', 'bytes_antes',
+        'bytes_depois', 'bytes_recuperados'}.
+        """
+        with self.pool.conexao() as conn:
+            antes = self._bytes_ocupados(conn)
+            operacao = self._compactar(conn, vacuum_completo, limite_livres)
+            depois = self._bytes_ocupados(conn)
+        return [{
+            'banco': self.db_path,
+            'operacao': operacao,
+            'bytes_antes': antes,
+            'bytes_depois': depois,
+            'bytes_recuperados': antes - depois,
+        }]
+
+    def _compactar(self, conn, vacuum_completo, limite_livres):
+        return compactar_sqlite(conn, vacuum_completo, limite_livres)
+
+    def _bytes_ocupados(self, conn):
+        return bytes_sqlite(conn)
+
+    # Cache de respostas do assistente (ver assistente.CacheRespostas)
+    def obter_resposta_cache(self, chave, ttl):
+        """Retorna a resposta em cache ou None (a entrada expirada é removida)"""
+        agora = time.time()
+        with self.pool.transacao() as cursor:
+            row = cursor.execute(
+                'SELECT resposta, criado_em FROM cache_respostas WHERE chave = ?',
+                (chave,)
+            ).fetchone()
+
+            if row and agora - row[1] <= ttl:
+                cursor.execute(
+                    'UPDATE cache_respostas SET acessado_em = ?, acessos = acessos + 1 WHERE chave = ?',
+                    (agora, chave)
+                )
+                return row[0]
+
+            if row:
+                cursor.execute('DELETE FROM cache_respostas WHERE chave = ?', (chave,))
+        return None
+
+    def salvar_resposta_cache(self, chave, modelo, resposta, max_itens):
+        """Armazena a resposta e descarta as entradas menos usadas recentemente"""
+        agora = time.time()
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'INSERT INTO cache_respostas (chave, modelo, resposta, criado_em, acessado_em) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (chave) DO UPDATE SET modelo = excluded.modelo, resposta = excluded.resposta, '
+                'criado_em = excluded.criado_em, acessado_em = excluded.acessado_em',
+                (chave, modelo, resposta, agora, agora)
+            )
+            cursor.execute(
+                'DELETE FROM cache_respostas WHERE acessado_em < ('
+                'SELECT acessado_em FROM cache_respostas ORDER BY acessado_em DESC LIMIT 1 OFFSET ?)',
+                (max_itens - 1,)
+            )
+
+    def limpar_respostas_expiradas(self, ttl):
+        """Remove as entradas com TTL vencido; retorna quantas foram removidas"""
+        with self.pool.transacao() as cursor:
+            cursor.execute(
+                'DELETE FROM cache_respostas WHERE criado_em < ?',
+                (time.time() - ttl,)
+            )
+            return cursor.rowcount
+
+
+# Gravação em segundo plano (write-behind) das mensagens do chat
+ESCRITA_MENSAGENS = os.getenv("FOCUSFLOW_ESCRITA_MENSAGENS", "lote")  # "lote" ou "sincrona"
+
+_PARAR = object()
+
+
+class EscritorMensagens:
+    """Grava mensagens do chat em uma thread própria, agrupando-as em transações
+
+    As mensagens vão para uma fila e são inseridas com executemany em lotes de
+    até `lote` itens, esperando no máximo `intervalo` segundos para completar um
+    lote. Com a fila cheia, quem grava espera (backpressure). No encerramento do
+    processo a fila é esvaziada. Com `sincrona=True` cada mensagem é gravada na
+    hora, como antes.
+    """
+
+    def __init__(self, db, lote=100, intervalo=0.05, max_fila=10000, tentativas=3, sincrona=False):
+        self.db = db
+        self.lote = lote
+        self.intervalo = intervalo
+        self.tentativas = tentativas
+        self.sincrona = sincrona
+        self.gravadas = 0
+        self.lotes = 0
+        self.falhas = 0
+        self.ultimo_erro = None
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._fechado = False
+        self._thread = None
+        if not sincrona:
+            self._thread = threading.Thread(target=self._executar, name="escritor-mensagens", daemon=True)
+            self._thread.start()
+            atexit.register(self.fechar)
+
+    def salvar_mensagem(self, usuario_id, role, content):
+        """Enfileira a mensagem (ou grava direto no modo síncrono, após o fechamento
+        ou se a thread de gravação não estiver rodando)"""
+        if self.sincrona or self._fechado or not self._thread.is_alive():
+            self.db.salvar_mensagem(usuario_id, role, content)
+            return
+        self._fila.put((usuario_id, role, content))
+
+    def _executar(self):
+        while True:
+            item = self._fila.get()
+            lote = [item]
+            limite = time.monotonic() + self.intervalo
+            while item is not _PARAR and len(lote) < self.lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(item)
+
+            mensagens = [m for m in lote if m is not _PARAR]
+            try:
+                if mensagens:
+                    self._gravar(mensagens)
+            except Exception:
+                # A thread não pode morrer: as próximas mensagens ficariam na fila para sempre
+                self.falhas += len(mensagens)
+                logger.exception("Erro inesperado ao gravar %d mensagens do chat", len(mensagens))
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+            if item is _PARAR:
+                return
+
+    def _gravar(self, mensagens):
+        for tentativa in range(self.tentativas):
+            try:
+                self.db.salvar_mensagens(mensagens)
+                self.gravadas += len(mensagens)
+                self.lotes += 1
+                return
+            except Exception as e:
+                self.ultimo_erro = e
+                if tentativa + 1 < self.tentativas:
+                    time.sleep(0.05 * 2 ** tentativa)
+        self.falhas += len(mensagens)
+        logger.error(
+            "Lote de %d mensagens do chat descartado após %d tentativas: %r",
+            len(mensagens), self.tentativas, self.ultimo_erro
+        )
+
+    def flush(self):
+        """Bloqueia até que todas as mensagens enfileiradas tenham sido gravadas"""
+        if self._thread is not None and self._thread.is_alive():
+            self._fila.join()
+
+    def fechar(self, timeout=10):
+        """Grava o que estiver pendente e encerra a thread"""
+        if self._fechado or self._thread is None:
+            return
+        self._fechado = True
+        self._fila.put(_PARAR)
+        self._thread.join(timeout)
+
+    def estatisticas(self):
+        return {
+            'pendentes': self._fila.qsize(),
+            'gravadas': self.gravadas,
+            'lotes': self.lotes,
+            'falhas': self.falhas,
+        }
+
+
+_escritores = {}
+
+
+def obter_escritor(db, **opcoes):
+    """Retorna o escritor de mensagens do processo para o banco do `db`"""
+    with _pools_lock:
+        escritor = _escritores.get(db)
+        if escritor is None:
+            opcoes.setdefault("sincrona", ESCRITA_MENSAGENS == "sincrona")
+            escritor = EscritorMensagens(db, **opcoes)
+            _escritores[db] = escritor
+            registro.registrar_coletor("escritor_mensagens", escritor.estatisticas)
+        return escritor
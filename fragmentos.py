@@ -0,0 +1,159 @@
+import os
+import threading
+
+from database import DatabaseManager, PRAGMAS_PADRAO, obter_pool
+from repositorio import Repositorio
+
+# Armazenamento fragmentado: um catálogo com as contas (e o cache de respostas)
+# e FRAGMENTOS arquivos SQLite com os dados, cada usuário no fragmento
+# `usuario_id % FRAGMENTOS`. Cada arquivo tem seu próprio lock de escrita do
+# WAL, então escritas de usuários em fragmentos diferentes não se bloqueiam.
+# Mudar FRAGMENTOS depois de haver dados exige redistribuir os usuários.
+DIRETORIO_FRAGMENTOS = os.getenv("FOCUSFLOW_DIRETORIO_FRAGMENTOS", "focusflow-dados")
+FRAGMENTOS = int(os.getenv("FOCUSFLOW_FRAGMENTOS", "16"))
+
+# Operações cujo primeiro argumento é o id do usuário (vão para o fragmento dele)
+OPERACOES_POR_USUARIO = (
+    'salvar_tarefa', 'salvar_tarefas', 'carregar_tarefas', 'iterar_tarefas',
+    'carregar_tarefas_pagina', 'atualizar_tarefa', 'atualizar_tarefas',
+    'excluir_tarefa', 'excluir_tarefas', 'limpar_tarefas',
+    'salvar_ideia', 'salvar_ideias', 'carregar_ideias', 'iterar_ideias',
+    'carregar_ideias_pagina', 'excluir_ideia',
+    'salvar_mensagem', 'carregar_mensagens',
+    'recuperar_relevantes', 'buscar',
+    'carregar_resumo', 'carregar_mensagens_nao_resumidas', 'salvar_resumo',
+    'obter_retencao', 'definir_retencao', 'iterar_mensagens_antigas', 'excluir_mensagens_antigas',
+    'obter_plano',
+)
+
+# Operações atendidas pelo catálogo
+OPERACOES_CATALOGO = (
+    'criar_usuario', 'verificar_login', 'listar_usuarios',
+    'obter_resposta_cache', 'salvar_resposta_cache', 'limpar_respostas_expiradas',
+)
+
+
+def _no_fragmento(nome):
+    def operacao(self, usuario_id, *args, **kwargs):
+        return getattr(self.fragmento(usuario_id), nome)(usuario_id, *args, **kwargs)
+    operacao.__name__ = nome
+    operacao.__doc__ = getattr(DatabaseManager, nome).__doc__
+    return operacao
+
+
+def _no_catalogo(nome):
+    def operacao(self, *args, **kwargs):
+        return getattr(self.catalogo, nome)(*args, **kwargs)
+    operacao.__name__ = nome
+    operacao.__doc__ = getattr(DatabaseManager, nome).__doc__
+    return operacao
+
+
+class RepositorioFragmentado(Repositorio):
+    """Um arquivo SQLite por grupo de usuários, além do catálogo de contas
+
+    Cada fragmento é um DatabaseManager completo (com pool, cache de leitura e
+    migrações próprios). As chaves estrangeiras para `usuarios` ficam
+    desligadas nos fragmentos, já que as contas vivem no catálogo.
+    """
+
+    ErroBanco = DatabaseManager.ErroBanco
+    ErroIntegridade = DatabaseManager.ErroIntegridade
+
+    def __init__(self, diretorio=DIRETORIO_FRAGMENTOS, fragmentos=FRAGMENTOS, tamanho_pool=4):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.catalogo = DatabaseManager(os.path.join(diretorio, "catalogo.db"))
+        self.tamanho_pool = tamanho_pool
+        self._fragmentos = [None] * fragmentos
+        self._lock = threading.Lock()
+
+    @property
+    def quantidade(self):
+        return len(self._fragmentos)
+
+    def caminho_fragmento(self, indice):
+        return os.path.join(self.diretorio, f"fragmento-{indice:03d}.db")
+
+    def fragmento(self, usuario_id):
+        """DatabaseManager do fragmento do usuário (aberto e migrado no primeiro uso)"""
+        indice = usuario_id % len(self._fragmentos)
+        db = self._fragmentos[indice]
+        if db is None:
+            with self._lock:
+                db = self._fragmentos[indice]
+                if db is None:
+                    caminho = self.caminho_fragmento(indice)
+                    pool = obter_pool(
+                        caminho, tamanho=self.tamanho_pool,
+                        pragmas=dict(PRAGMAS_PADRAO, foreign_keys="OFF")
+                    )
+                    db = self._fragmentos[indice] = DatabaseManager(caminho, pool=pool)
+        return db
+
+    def versao_schema(self):
+        return self.catalogo.versao_schema()
+
+    def migrar(self, ate=None):
+        """Migra o catálogo e os fragmentos já abertos; retorna as versões aplicadas no catálogo"""
+        aplicadas = self.catalogo.migrar(ate)
+        for db in self._fragmentos:
+            if db is not None:
+                db.migrar(ate)
+        return aplicadas
+
+    def _por_fragmento(self, registros, usuario=lambda registro: registro):
+        """Agrupa os registros (ou ids) por fragmento: [(DatabaseManager, registros), ...]"""
+        grupos = {}
+        for registro in registros:
+            grupos.setdefault(usuario(registro) % len(self._fragmentos), []).append(registro)
+        return [(self.fragmento(indice), grupo) for indice, grupo in sorted(grupos.items())]
+
+    def salvar_mensagens(self, mensagens):
+        """Agrupa as mensagens por fragmento e grava cada grupo em uma transação"""
+        for db, grupo in self._por_fragmento(mensagens, lambda mensagem: mensagem[0]):
+            db.salvar_mensagens(grupo)
+
+    def usuarios_ativos(self, usuario_ids, desde):
+        ativos = []
+        for db, grupo in self._por_fragmento(usuario_ids):
+            ativos.extend(db.usuarios_ativos(grupo, desde))
+        return sorted(ativos)
+
+    def carregar_contexto_planejamento(self, usuario_ids, limite_tarefas=30, limite_ideias=15):
+        contextos = {}
+        for db, grupo in self._por_fragmento(usuario_ids):
+            contextos.update(db.carregar_contexto_planejamento(grupo, limite_tarefas, limite_ideias))
+        return contextos
+
+    def planos_existentes(self, usuario_ids, dia):
+        existentes = set()
+        for db, grupo in self._por_fragmento(usuario_ids):
+            existentes |= db.planos_existentes(grupo, dia)
+        return existentes
+
+    def salvar_planos(self, planos):
+        for db, grupo in self._por_fragmento(planos, lambda plano: plano[0]):
+            db.salvar_planos(grupo)
+
+    def limpar_planos(self, antes_de):
+        """Remove os planos antigos em cada fragmento já criado em disco"""
+        removidos = 0
+        for indice in range(len(self._fragmentos)):
+            if os.path.exists(self.caminho_fragmento(indice)):
+                removidos += self.fragmento(indice).limpar_planos(antes_de)
+        return removidos
+
+    def compactar(self, vacuum_completo=False, limite_livres=0.25):
+        """Compacta o catálogo e cada fragmento já criado em disco"""
+        relatorios = self.catalogo.compactar(vacuum_completo, limite_livres)
+        for indice in range(len(self._fragmentos)):
+            if os.path.exists(self.caminho_fragmento(indice)):
+                relatorios.extend(self.fragmento(indice).compactar(vacuum_completo, limite_livres))
+        return relatorios
+
+
+for _nome in OPERACOES_POR_USUARIO:
+    setattr(RepositorioFragmentado, _nome, _no_fragmento(_nome))
+for _nome in OPERACOES_CATALOGO:
+    setattr(RepositorioFragmentado, _nome, _no_catalogo(_nome))
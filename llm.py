@@ -0,0 +1,306 @@
+import os
+import time
+import random
+import threading
+
+from metricas import registro, cronometrar, medido
+
+MODELO_PADRAO = "gemini-2.0-flash"
+
+# Configuração (variáveis de ambiente)
+LLM_BACKEND = os.getenv("FOCUSFLOW_LLM_BACKEND", "gemini")            # "gemini" ou "stub"
+LLM_TIMEOUT = float(os.getenv("FOCUSFLOW_LLM_TIMEOUT", "30"))         # segundos por requisição
+LLM_TENTATIVAS = int(os.getenv("FOCUSFLOW_LLM_TENTATIVAS", "3"))
+LLM_CONCORRENCIA = int(os.getenv("FOCUSFLOW_LLM_CONCORRENCIA", "8"))  # chamadas simultâneas no processo
+
+
+class LLMIndisponivel(Exception):
+    """O backend de IA está sobrecarregado, com o circuito aberto ou falhou em todas as tentativas"""
+
+
+class RespostaBloqueada(Exception):
+    """O modelo respondeu sem texto (ex.: bloqueada pelos filtros de segurança);
+    não adianta tentar de novo e não indica falha do serviço"""
+
+
+# Backends
+class BackendLLM:
+    """Interface dos backends: `gerar` devolve o texto completo e `gerar_stream`
+    devolve um iterador de pedaços de texto"""
+
+    modelo = None
+
+    def preparar(self):
+        """Carrega dependências pesadas antes da primeira chamada (opcional)"""
+
+    def gerar(self, prompt, timeout=None):
+        raise NotImplementedError
+
+    def gerar_stream(self, prompt, timeout=None):
+        raise NotImplementedError
+
+
+class GeminiBackend(BackendLLM):
+    """Google Gemini; o SDK é importado e configurado só no primeiro uso e o
+    objeto do modelo é reaproveitado entre requisições"""
+
+    def __init__(self, modelo=MODELO_PADRAO, api_key=None):
+        self.modelo = modelo
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _obter_modelo(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                if self.api_key:
+                    genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.modelo)
+            return self._model
+
+    def preparar(self):
+        self._obter_modelo()
+
+    def gerar(self, prompt, timeout=None):
+        resposta = self._obter_modelo().generate_content(
+            prompt, request_options={"timeout": timeout} if timeout else None
+        )
+        try:
+            return resposta.text
+        except ValueError as e:
+            raise RespostaBloqueada(f"A IA não devolveu texto para esta pergunta: {e}") from e
+
+    def gerar_stream(self, prompt, timeout=None):
+        resposta = self._obter_modelo().generate_content(
+            prompt, stream=True,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        for chunk in resposta:
+            try:
+                texto = chunk.text
+            except ValueError:
+                continue
+            if texto:
+                yield texto
+
+
+class StubBackend(BackendLLM):
+    """Backend local e determinístico, para testes e benchmarks de carga
+
+    Responde com um texto derivado do prompt, simulando `latencia` segundos até
+    o primeiro pedaço e `latencia_chunk` entre pedaços; `falhas` permite
+    simular erros nas primeiras chamadas.
+    """
+
+    def __init__(self, modelo="stub", latencia=0.0, latencia_chunk=0.0, palavras=40, falhas=0):
+        self.modelo = modelo
+        self.latencia = latencia
+        self.latencia_chunk = latencia_chunk
+        self.palavras = palavras
+        self.falhas = falhas
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def _talvez_falhar(self):
+        with self._lock:
+            self.chamadas += 1
+            if self.falhas > 0:
+                self.falhas -= 1
+                raise ConnectionError("Falha simulada do backend stub")
+
+    def _texto(self, prompt):
+        base = " ".join(prompt.split()[-8:]) or "ok"
+        palavras = (f"Resposta simulada para: {base}. " * self.palavras).split()[:self.palavras]
+        return " ".join(palavras)
+
+    def gerar(self, prompt, timeout=None):
+        self._talvez_falhar()
+        time.sleep(self.latencia)
+        return self._texto(prompt)
+
+    def gerar_stream(self, prompt, timeout=None):
+        self._talvez_falhar()
+        time.sleep(self.latencia)
+        for palavra in self._texto(prompt).split():
+            yield palavra + " "
+            if self.latencia_chunk:
+                time.sleep(self.latencia_chunk)
+
+
+# Proteções em volta do backend
+class CircuitBreaker:
+    """Abre após `limite_falhas` falhas consecutivas e recusa chamadas por
+    `tempo_aberto` segundos; depois deixa passar uma chamada de teste"""
+
+    def __init__(self, limite_falhas=5, tempo_aberto=30.0):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self.falhas < self.limite_falhas:
+                return "fechado"
+            return "aberto" if time.monotonic() < self.aberto_ate else "meio-aberto"
+
+    def permitir(self):
+        with self._lock:
+            if self.falhas < self.limite_falhas:
+                return True
+            if time.monotonic() >= self.aberto_ate:
+                # Meio-aberto: libera uma chamada e reabre até ela terminar
+                self.aberto_ate = time.monotonic() + self.tempo_aberto
+                return True
+            return False
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+
+    def falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.falhas >= self.limite_falhas:
+                self.aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+class ClienteLLM:
+    """Chama o backend com timeout, novas tentativas com backoff exponencial,
+    limite global de concorrência e circuit breaker"""
+
+    def __init__(self, backend, timeout=LLM_TIMEOUT, tentativas=LLM_TENTATIVAS,
+                 concorrencia=LLM_CONCORRENCIA, espera_base=0.5, circuito=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.circuito = circuito or CircuitBreaker()
+        self._semaforo = threading.BoundedSemaphore(concorrencia)
+
+    @property
+    def modelo(self):
+        return self.backend.modelo
+
+    def _espera(self, tentativa):
+        return self.espera_base * 2 ** tentativa * (0.5 + random.random())
+
+    def _ocupar(self):
+        """Ocupa uma vaga de concorrência e passa pelo circuit breaker
+
+        A vaga vem antes: no estado meio-aberto `permitir()` consome a única
+        chamada de teste, que precisa de fato chegar ao backend.
+        """
+        if not self._semaforo.acquire(timeout=self.timeout):
+            raise LLMIndisponivel("Muitas requisições simultâneas ao serviço de IA")
+        if not self.circuito.permitir():
+            self._semaforo.release()
+            raise LLMIndisponivel("Serviço de IA temporariamente indisponível")
+
+    def _tentar(self, chamada):
+        """Executa a chamada com novas tentativas; esgotadas, conta a falha no circuito
+
+        RespostaBloqueada chega direto a quem chamou, sem novas tentativas, e
+        conta como sucesso no circuito: o serviço respondeu.
+        """
+        ultimo_erro = None
+        for tentativa in range(self.tentativas):
+            try:
+                return chamada()
+            except RespostaBloqueada:
+                self.circuito.sucesso()
+                raise
+            except Exception as e:
+                ultimo_erro = e
+                if tentativa + 1 < self.tentativas:
+                    time.sleep(self._espera(tentativa))
+        self.circuito.falha()
+        raise LLMIndisponivel(f"Falha ao consultar a IA: {ultimo_erro}") from ultimo_erro
+
+    def _executar(self, chamada):
+        self._ocupar()
+        try:
+            resultado = self._tentar(chamada)
+            self.circuito.sucesso()
+            return resultado
+        finally:
+            self._semaforo.release()
+
+    def preparar(self):
+        """Importa o SDK e cria o modelo do backend, se ainda não foi feito
+
+        Fica fora das novas tentativas: um ImportError (SDK não instalado)
+        chega direto a quem chamou.
+        """
+        with cronometrar("llm_preparar"):
+            self.backend.preparar()
+
+    @medido("llm_gerar")
+    def gerar(self, prompt):
+        """Texto completo da resposta"""
+        return self._executar(lambda: self.backend.gerar(prompt, timeout=self.timeout))
+
+    def gerar_stream(self, prompt):
+        """Iterador de pedaços da resposta, devolvido sem esperar pelo modelo
+
+        A vaga de concorrência fica ocupada até o streaming terminar ou o
+        iterador ser fechado. As novas tentativas só valem até o primeiro
+        pedaço chegar; um erro depois disso interrompe o streaming e conta
+        como falha no circuit breaker.
+        """
+        def iniciar():
+            iterador = iter(self.backend.gerar_stream(prompt, timeout=self.timeout))
+            try:
+                primeiro = next(iterador)
+            except StopIteration:
+                primeiro = None
+            return primeiro, iterador
+
+        def pedacos():
+            with cronometrar("llm_gerar_stream"):
+                self._ocupar()
+                try:
+                    with cronometrar("llm_primeiro_pedaco"):
+                        primeiro, iterador = self._tentar(iniciar)
+                    if primeiro is not None:
+                        yield primeiro
+                        try:
+                            yield from iterador
+                        except Exception:
+                            self.circuito.falha()
+                            raise
+                    self.circuito.sucesso()
+                finally:
+                    self._semaforo.release()
+
+        return pedacos()
+
+
+def criar_backend(nome=LLM_BACKEND, **opcoes):
+    """Instancia o backend pelo nome ("gemini" ou "stub")"""
+    if nome == "stub":
+        return StubBackend(**opcoes)
+    if nome == "gemini":
+        return GeminiBackend(**opcoes)
+    raise ValueError(f"Backend de IA desconhecido: {nome}")
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def obter_cliente_llm(nome=LLM_BACKEND, **opcoes):
+    """Retorna o cliente do processo para o backend (o modelo é reaproveitado entre reruns)"""
+    with _clientes_lock:
+        cliente = _clientes.get(nome)
+        if cliente is None:
+            cliente = ClienteLLM(criar_backend(nome, **opcoes))
+            _clientes[nome] = cliente
+            registro.registrar_coletor(f"llm_{nome}", lambda: {
+                'circuito_aberto': int(cliente.circuito.estado == "aberto"),
+                'falhas_consecutivas': cliente.circuito.falhas,
+            })
+        return cliente
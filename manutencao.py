@@ -0,0 +1,205 @@
+import os
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from metricas import registro, cronometrar
+
+logger = logging.getLogger(__name__)
+
+# Retenção, arquivamento e compactação do histórico do chat. O app só lê as
+# mensagens mais recentes, então as anteriores ao prazo de retenção (o do
+# usuário, ou RETENCAO_DIAS) saem do banco para arquivos JSONL comprimidos,
+# um por usuário e mês: DIRETORIO_ARQUIVO/<usuario_id>/<AAAA-MM>.jsonl.gz.
+# As mensagens só são removidas do banco depois que o arquivo foi gravado.
+RETENCAO_DIAS = int(os.getenv("FOCUSFLOW_RETENCAO_DIAS", "90"))
+DIRETORIO_ARQUIVO = os.getenv("FOCUSFLOW_DIRETORIO_ARQUIVO", "focusflow-arquivo")
+MANTER_RECENTES = 50          # nunca arquiva as que o chat ainda mostra (LIMITE_MENSAGENS_SESSAO)
+
+# Execução periódica dentro do app (em segundos; 0 desliga). Ligue em um só
+# processo ou rode `python manutencao.py` pelo cron.
+INTERVALO_MANUTENCAO = float(os.getenv("FOCUSFLOW_INTERVALO_MANUTENCAO", "0"))
+
+
+def caminho_arquivo(diretorio, usuario_id, mes):
+    return os.path.join(diretorio, str(usuario_id), f"{mes}.jsonl.gz")
+
+
+def ler_arquivo(caminho):
+    """Gera as mensagens de um arquivo mensal (para consulta ou restauração)"""
+    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            yield json.loads(linha)
+
+
+def arquivar_usuario(db, usuario_id, agora=None, diretorio=DIRETORIO_ARQUIVO,
+                     retencao_dias=RETENCAO_DIAS, manter_recentes=MANTER_RECENTES):
+    """Move para os arquivos mensais as mensagens do usuário fora do prazo de retenção
+
+    Cada execução acrescenta um novo membro gzip ao arquivo do mês. Se o
+    processo cair entre a gravação e a remoção, as mesmas mensagens são
+    gravadas de novo na próxima vez: quem lê deve desconsiderar ids repetidos.
+    Retorna {'arquivadas', 'removidas', 'arquivos'}.
+    """
+    dias = db.obter_retencao(usuario_id)
+    if dias is None:
+        dias = retencao_dias
+    agora = agora or datetime.now(timezone.utc)
+    antes_de = (agora - timedelta(days=dias)).strftime("%Y-%m-%d %H:%M:%S")
+
+    abertos = {}
+    arquivadas = 0
+    ate_id = None
+    try:
+        for mensagem in db.iterar_mensagens_antigas(usuario_id, antes_de, manter_recentes):
+            mensagem['timestamp'] = str(mensagem['timestamp'])
+            mes = mensagem['timestamp'][:7]
+            arquivo = abertos.get(mes)
+            if arquivo is None:
+                caminho = caminho_arquivo(diretorio, usuario_id, mes)
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                arquivo = abertos[mes] = gzip.open(caminho, "at", encoding="utf-8")
+            arquivo.write(json.dumps(mensagem, ensure_ascii=False) + "\n")
+            arquivadas += 1
+            ate_id = mensagem['id']
+    finally:
+        for arquivo in abertos.values():
+            arquivo.close()
+
+    if ate_id is None:
+        return {'arquivadas': 0, 'removidas': 0, 'arquivos': []}
+
+    caminhos = [caminho_arquivo(diretorio, usuario_id, mes) for mes in abertos]
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            os.fsync(arquivo.fileno())
+
+    removidas = db.excluir_mensagens_antigas(usuario_id, antes_de, ate_id)
+    return {'arquivadas': arquivadas, 'removidas': removidas, 'arquivos': caminhos}
+
+
+def executar_manutencao(db, diretorio=DIRETORIO_ARQUIVO, retencao_dias=RETENCAO_DIAS,
+                        manter_recentes=MANTER_RECENTES, compactar=True, vacuum_completo=False):
+    """Arquiva o histórico de todos os usuários e compacta o banco
+
+    Retorna o relatório: usuários processados, mensagens arquivadas e
+    removidas, arquivos tocados, a compactação de cada banco e o total de
+    bytes recuperados.
+    """
+    inicio = time.perf_counter()
+    relatorio = {
+        'usuarios': 0, 'mensagens_arquivadas': 0, 'mensagens_removidas': 0,
+        'arquivos': 0, 'compactacao': [], 'bytes_recuperados': 0,
+    }
+
+    agora = datetime.now(timezone.utc)
+    with cronometrar("manutencao_arquivamento"):
+        for usuario_id in db.listar_usuarios():
+            resultado = arquivar_usuario(db, usuario_id, agora, diretorio, retencao_dias, manter_recentes)
+            relatorio['usuarios'] += 1
+            relatorio['mensagens_arquivadas'] += resultado['arquivadas']
+            relatorio['mensagens_removidas'] += resultado['removidas']
+            relatorio['arquivos'] += len(resultado['arquivos'])
+
+    if compactar:
+        with cronometrar("manutencao_compactacao"):
+            relatorio['compactacao'] = db.compactar(vacuum_completo)
+        relatorio['bytes_recuperados'] = sum(r['bytes_recuperados'] for r in relatorio['compactacao'])
+
+    relatorio['segundos'] = round(time.perf_counter() - inicio, 3)
+    registro.incrementar("manutencao_mensagens_arquivadas", relatorio['mensagens_arquivadas'])
+    registro.incrementar("manutencao_bytes_recuperados", max(relatorio['bytes_recuperados'], 0))
+    return relatorio
+
+
+class ManutencaoPeriodica:
+    """Roda executar_manutencao a cada `intervalo` segundos em uma thread própria"""
+
+    def __init__(self, db, intervalo=INTERVALO_MANUTENCAO, **opcoes):
+        self.db = db
+        self.intervalo = intervalo
+        self.opcoes = opcoes
+        self.execucoes = 0
+        self.falhas = 0
+        self.ultimo_relatorio = None
+        self.ultimo_erro = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="manutencao", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.ultimo_relatorio = executar_manutencao(self.db, **self.opcoes)
+                self.execucoes += 1
+            except Exception as e:
+                # Qualquer erro fica para a próxima execução: a thread não pode morrer
+                self.ultimo_erro = e
+                self.falhas += 1
+                logger.exception("Falha na manutenção periódica do histórico")
+
+    def parar(self, timeout=10):
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def estatisticas(self):
+        ultimo = self.ultimo_relatorio or {}
+        return {
+            'execucoes': self.execucoes,
+            'falhas': self.falhas,
+            'ultimas_arquivadas': ultimo.get('mensagens_arquivadas', 0),
+            'ultimos_bytes_recuperados': ultimo.get('bytes_recuperados', 0),
+        }
+
+
+_manutencoes = {}
+_manutencoes_lock = threading.Lock()
+
+
+def iniciar_manutencao_periodica(db, intervalo=INTERVALO_MANUTENCAO, **opcoes):
+    """Inicia (uma vez por processo e banco) a manutenção periódica"""
+    with _manutencoes_lock:
+        manutencao = _manutencoes.get(db)
+        if manutencao is None:
+            manutencao = ManutencaoPeriodica(db, intervalo, **opcoes)
+            _manutencoes[db] = manutencao
+            registro.registrar_coletor("manutencao", manutencao.estatisticas)
+        return manutencao
+
+
+def main():
+    from repositorio import criar_repositorio
+
+    parser = argparse.ArgumentParser(description="Arquiva o histórico antigo do chat e compacta o banco")
+    parser.add_argument("--armazenamento", help="padrão: FOCUSFLOW_ARMAZENAMENTO")
+    parser.add_argument("--diretorio", default=DIRETORIO_ARQUIVO, help="onde gravar os arquivos mensais")
+    parser.add_argument("--retencao-dias", type=int, default=RETENCAO_DIAS,
+                        help="prazo para quem não escolheu o seu")
+    parser.add_argument("--sem-compactar", action="store_true", help="só arquiva, sem VACUUM/ANALYZE")
+    parser.add_argument("--vacuum", action="store_true", help="força o VACUUM completo")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    db = criar_repositorio(args.armazenamento) if args.armazenamento else criar_repositorio()
+    relatorio = executar_manutencao(
+        db, diretorio=args.diretorio, retencao_dias=args.retencao_dias,
+        compactar=not args.sem_compactar, vacuum_completo=args.vacuum
+    )
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{relatorio['usuarios']} usuários, {relatorio['mensagens_arquivadas']} mensagens arquivadas "
+          f"em {relatorio['arquivos']} arquivos, {relatorio['mensagens_removidas']} removidas do banco")
+    for r in relatorio['compactacao']:
+        print(f"{r['banco']}: {r['operacao']}, {r['bytes_antes']} -> {r['bytes_depois']} bytes "
+              f"({r['bytes_recuperados']} recuperados)")
+    print(f"Total recuperado: {relatorio['bytes_recuperados']} bytes em {relatorio['segundos']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Amostras mantidas por métrica para o cálculo dos percentis
+AMOSTRAS_POR_METRICA = 1024
+QUANTIS = (0.5, 0.9, 0.99)
+
+
+class Histograma:
+    """Contagem, soma e as últimas amostras de uma medida (tempo em segundos, tokens...)"""
+
+    def __init__(self, max_amostras=AMOSTRAS_POR_METRICA):
+        self.contagem = 0
+        self.soma = 0.0
+        self.amostras = deque(maxlen=max_amostras)
+
+    def observar(self, valor):
+        self.contagem += 1
+        self.soma += valor
+        self.amostras.append(valor)
+
+    def percentis(self, quantis=QUANTIS):
+        ordenadas = sorted(self.amostras)
+        if not ordenadas:
+            return {q: 0.0 for q in quantis}
+        return {q: ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] for q in quantis}
+
+
+class RegistroMetricas:
+    """Registro de métricas do processo: histogramas, contadores e coletores
+    (funções chamadas na exportação que devolvem valores instantâneos)"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._contadores = {}
+        self._coletores = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nome, valor):
+        with self._lock:
+            histograma = self._histogramas.get(nome)
+            if histograma is None:
+                histograma = self._histogramas[nome] = Histograma()
+            histograma.observar(valor)
+
+    def incrementar(self, nome, valor=1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + valor
+
+    def registrar_coletor(self, nome, funcao):
+        """`funcao()` deve devolver um dict {métrica: valor numérico}"""
+        with self._lock:
+            self._coletores[nome] = funcao
+
+    def instantaneo(self):
+        """Cópia consistente de todas as métricas"""
+        with self._lock:
+            histogramas = {
+                nome: {
+                    'contagem': h.contagem,
+                    'soma': h.soma,
+                    'percentis': h.percentis(),
+                }
+                for nome, h in self._histogramas.items()
+            }
+            contadores = dict(self._contadores)
+            coletores = dict(self._coletores)
+
+        valores = {}
+        for prefixo, funcao in coletores.items():
+            try:
+                for nome, valor in funcao().items():
+                    if isinstance(valor, (int, float)):
+                        valores[f"{prefixo}_{nome}"] = valor
+            except Exception:
+                continue
+
+        return {'histogramas': histogramas, 'contadores': contadores, 'valores': valores}
+
+    def limpar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+
+registro = RegistroMetricas()
+
+
+# Instrumentação
+_rerun = threading.local()
+
+
+@contextmanager
+def cronometrar(nome):
+    """Mede a duração do bloco em `<nome>_segundos`; erros contam em `<nome>_erros_total`"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        # Exceções de controle (ex.: rerun do Streamlit) não são erros
+        if isinstance(e, Exception):
+            registro.incrementar(f"{nome}_erros_total")
+        raise
+    finally:
+        registro.observar(f"{nome}_segundos", time.perf_counter() - inicio)
+
+
+def medido(nome):
+    """Decorador equivalente a `cronometrar(nome)` em volta da função"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with cronometrar(nome):
+                return funcao(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def instrumentar_classe(prefixo):
+    """Decorador de classe: mede todos os métodos públicos como `<prefixo>_<método>`
+
+    Nos métodos geradores a medida cobre a iteração inteira (até o fim ou o
+    fechamento do gerador), não só a criação do gerador.
+    """
+    def decorador(cls):
+        for nome, atributo in list(vars(cls).items()):
+            if nome.startswith("_") or not callable(atributo) or isinstance(atributo, (staticmethod, classmethod, type)):
+                continue
+            setattr(cls, nome, _instrumentar_metodo(atributo, f"{prefixo}_{nome}"))
+        return cls
+    return decorador
+
+
+def _instrumentar_metodo(metodo, nome):
+    if inspect.isgeneratorfunction(metodo):
+        @functools.wraps(metodo)
+        def gerador(*args, **kwargs):
+            with cronometrar(nome):
+                yield from metodo(*args, **kwargs)
+        return gerador
+
+    @functools.wraps(metodo)
+    def wrapper(*args, **kwargs):
+        with cronometrar(nome):
+            return metodo(*args, **kwargs)
+    return wrapper
+
+
+def contar_consulta():
+    """Conta um acesso ao banco (conexão emprestada do pool) no rerun em andamento
+    nesta thread, se houver; leituras servidas pelo cache não passam por aqui"""
+    if getattr(_rerun, "inicio", None) is not None:
+        _rerun.consultas += 1
+
+
+def iniciar_rerun():
+    """Marca o início de uma execução do script na thread atual"""
+    _rerun.inicio = time.perf_counter()
+    _rerun.consultas = 0
+
+
+def finalizar_rerun(rotulo="app"):
+    """Registra duração e número de operações de banco da execução atual
+
+    Execuções interrompidas por st.rerun() não chegam aqui e não são registradas.
+    """
+    inicio = getattr(_rerun, "inicio", None)
+    if inicio is None:
+        return
+    registro.observar(f"rerun_{rotulo}_segundos", time.perf_counter() - inicio)
+    registro.observar(f"rerun_{rotulo}_consultas_db", _rerun.consultas)
+    registro.incrementar(f"rerun_{rotulo}_total")
+    _rerun.inicio = None
+
+
+# Exportação
+def _nome_prometheus(nome):
+    return "focusflow_" + "".join(c if c.isalnum() or c == "_" else "_" for c in nome)
+
+
+def exportar_prometheus():
+    """Métricas no formato texto de exposição do Prometheus"""
+    dados = registro.instantaneo()
+    linhas = []
+    for nome, h in sorted(dados['histogramas'].items()):
+        metrica = _nome_prometheus(nome)
+        linhas.append(f"# TYPE {metrica} summary")
+        for quantil, valor in h['percentis'].items():
+            linhas.append(f'{metrica}{{quantile="{quantil}"}} {valor:.6g}')
+        linhas.append(f"{metrica}_sum {h['soma']:.6g}")
+        linhas.append(f"{metrica}_count {h['contagem']}")
+    for nome, valor in sorted(dados['contadores'].items()):
+        metrica = _nome_prometheus(nome)
+        linhas.append(f"# TYPE {metrica} counter")
+        linhas.append(f"{metrica} {valor}")
+    for nome, valor in sorted(dados['valores'].items()):
+        metrica = _nome_prometheus(nome)
+        linhas.append(f"# TYPE {metrica} gauge")
+        linhas.append(f"{metrica} {valor:.6g}")
+    return "\n".join(linhas) + "\n"
+
+
+def exportar_jsonl(caminho):
+    """Acrescenta um instantâneo das métricas como uma linha JSON no arquivo"""
+    dados = registro.instantaneo()
+    for h in dados['histogramas'].values():
+        h['percentis'] = {str(q): v for q, v in h['percentis'].items()}
+    dados['momento'] = time.time()
+    with open(caminho, "a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(dados, ensure_ascii=False) + "\n")
+
+
+def resumo():
+    """Linhas {métrica, contagem, p50, p90, p99} para exibir no painel"""
+    linhas = []
+    for nome, h in sorted(registro.instantaneo()['histogramas'].items()):
+        escala, unidade = (1000, "ms") if nome.endswith("_segundos") else (1, "")
+        rotulo = nome[:-len("_segundos")] if nome.endswith("_segundos") else nome
+        linha = {'métrica': rotulo, 'contagem': h['contagem']}
+        for quantil, valor in h['percentis'].items():
+            linha[f"p{int(quantil * 100)}{' ' + unidade if unidade else ''}"] = round(valor * escala, 2)
+        linhas.append(linha)
+    return linhas
+
+
+def _criar_servidor_prometheus(porta, endereco):
+    # http.server é importado só aqui: custa dezenas de ms na partida do app
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class HandlerPrometheus(BaseHTTPRequestHandler):
+        def do_GET(self):
+            corpo = exportar_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((endereco, porta), HandlerPrometheus)
+
+
+_exportadores = {}
+_exportadores_lock = threading.Lock()
+
+
+def iniciar_servidor_prometheus(porta, endereco="127.0.0.1"):
+    """Sobe (uma única vez por processo) um endpoint HTTP com as métricas"""
+    with _exportadores_lock:
+        if "prometheus" not in _exportadores:
+            servidor = _criar_servidor_prometheus(porta, endereco)
+            threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+            _exportadores["prometheus"] = servidor
+        return _exportadores["prometheus"]
+
+
+def iniciar_exportacao_jsonl(caminho, intervalo=60.0):
+    """Grava um instantâneo no arquivo JSONL a cada `intervalo` segundos (uma vez por processo)"""
+    with _exportadores_lock:
+        if "jsonl" not in _exportadores:
+            def executar():
+                while True:
+                    time.sleep(intervalo)
+                    try:
+                        exportar_jsonl(caminho)
+                    except OSError:
+                        continue
+            thread = threading.Thread(target=executar, name="metricas-jsonl", daemon=True)
+            thread.start()
+            _exportadores["jsonl"] = thread
+        return _exportadores["jsonl"]
+
+
+def configurar_pela_env():
+    """Liga os exportadores configurados em FOCUSFLOW_METRICAS_PORTA / FOCUSFLOW_METRICAS_JSONL"""
+    porta = os.getenv("FOCUSFLOW_METRICAS_PORTA")
+    if porta:
+        try:
+            iniciar_servidor_prometheus(int(porta))
+        except OSError:
+            pass
+    caminho = os.getenv("FOCUSFLOW_METRICAS_JSONL")
+    if caminho:
+        iniciar_exportacao_jsonl(caminho, float(os.getenv("FOCUSFLOW_METRICAS_INTERVALO", "60")))
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+from metricas import registro, cronometrar
+from llm import LLMIndisponivel, RespostaBloqueada
+from assistente import ConstrutorContexto
+
+# Planos do dia gerados em lote, fora do horário de pico (ex.: pelo cron de
+# madrugada): para cada usuário ativo, o contexto vem do banco junto com o de
+# todo o lote e as chamadas ao modelo rodam em um pool limitado de threads.
+# O botão "📅 Planejar dia" serve o plano salvo, sem esperar pela IA.
+PERGUNTA_PLANEJAR_DIA = "Me ajude a planejar meu dia de forma produtiva"
+DIAS_ATIVIDADE = int(os.getenv("FOCUSFLOW_DIAS_ATIVIDADE", "14"))        # ativo: usou o app nesse prazo
+CONCORRENCIA_PLANOS = int(os.getenv("FOCUSFLOW_CONCORRENCIA_PLANOS", "4"))
+LOTE_PLANOS = 200              # usuários por consulta de contexto
+ORCAMENTO_TOKENS_PLANO = int(os.getenv("FOCUSFLOW_ORCAMENTO_TOKENS", "2000"))
+DIAS_GUARDAR_PLANOS = 7
+
+
+def montar_prompt(construtor, contexto, dia):
+    """Prompt do plano com o mesmo formato das perguntas feitas no chat"""
+    return construtor.montar(
+        PERGUNTA_PLANEJAR_DIA,
+        tarefas=contexto['tarefas'],
+        ideias=contexto['ideias'],
+        hoje=dia.strftime('%d/%m/%Y'),
+        resumo=contexto['resumo']
+    )['prompt']
+
+
+def gerar_planos(db, cliente, dia=None, usuario_ids=None, concorrencia=CONCORRENCIA_PLANOS,
+                 lote=LOTE_PLANOS, dias_atividade=DIAS_ATIVIDADE, refazer=False):
+    """Gera e grava o plano de `dia` de cada usuário ativo
+
+    Por padrão considera todas as contas e pula quem já tem plano para o dia,
+    então uma execução interrompida pode simplesmente ser repetida. As
+    chamadas ao modelo usam `cliente` (um ClienteLLM), que já aplica novas
+    tentativas, circuit breaker e o limite de concorrência do processo;
+    `concorrencia` limita quantos planos são gerados ao mesmo tempo. Retorna
+    {'usuarios', 'ativos', 'gerados', 'pulados', 'falhas', 'erros', 'segundos'}.
+    """
+    inicio = time.perf_counter()
+    dia = dia or date.today()
+    desde = (datetime.now(timezone.utc) - timedelta(days=dias_atividade)).strftime("%Y-%m-%d %H:%M:%S")
+    if usuario_ids is None:
+        usuario_ids = db.listar_usuarios()
+
+    relatorio = {'usuarios': len(usuario_ids), 'ativos': 0, 'gerados': 0, 'pulados': 0, 'falhas': 0, 'erros': []}
+    construtor = ConstrutorContexto(orcamento_tokens=ORCAMENTO_TOKENS_PLANO)
+
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="plano") as executor:
+        for inicio_lote in range(0, len(usuario_ids), lote):
+            with cronometrar("planos_contexto_lote"):
+                ativos = db.usuarios_ativos(usuario_ids[inicio_lote:inicio_lote + lote], desde)
+                relatorio['ativos'] += len(ativos)
+                if not refazer:
+                    existentes = db.planos_existentes(ativos, dia.isoformat())
+                    relatorio['pulados'] += len(existentes)
+                    ativos = [usuario_id for usuario_id in ativos if usuario_id not in existentes]
+                contextos = db.carregar_contexto_planejamento(ativos)
+
+            futuros = {
+                executor.submit(cliente.gerar, montar_prompt(construtor, contextos[usuario_id], dia)): usuario_id
+                for usuario_id in ativos
+            }
+            planos = []
+            for futuro in as_completed(futuros):
+                usuario_id = futuros[futuro]
+                try:
+                    planos.append((usuario_id, dia.isoformat(), cliente.modelo, futuro.result()))
+                except (LLMIndisponivel, RespostaBloqueada) as e:
+                    relatorio['falhas'] += 1
+                    if len(relatorio['erros']) < 20:
+                        relatorio['erros'].append((usuario_id, str(e)))
+
+            # Grava o lote inteiro de uma vez (e o que já saiu fica salvo se o job cair)
+            if planos:
+                db.salvar_planos(planos)
+                relatorio['gerados'] += len(planos)
+
+    db.limpar_planos((dia - timedelta(days=DIAS_GUARDAR_PLANOS)).isoformat())
+    relatorio['segundos'] = round(time.perf_counter() - inicio, 3)
+    registro.incrementar("planos_gerados", relatorio['gerados'])
+    registro.incrementar("planos_falhas", relatorio['falhas'])
+    return relatorio
+
+
+def main():
+    from repositorio import criar_repositorio
+    from llm import LLM_BACKEND, obter_cliente_llm
+
+    parser = argparse.ArgumentParser(description="Gera em lote os planos do dia dos usuários ativos")
+    parser.add_argument("--armazenamento", help="padrão: FOCUSFLOW_ARMAZENAMENTO")
+    parser.add_argument("--backend", default=LLM_BACKEND, choices=["gemini", "stub"])
+    parser.add_argument("--dia", type=date.fromisoformat, help="AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PLANOS)
+    parser.add_argument("--dias-atividade", type=int, default=DIAS_ATIVIDADE)
+    parser.add_argument("--refazer", action="store_true", help="gera de novo mesmo quem já tem plano")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    db = criar_repositorio(args.armazenamento) if args.armazenamento else criar_repositorio()
+    if args.backend == "gemini":
+        cliente = obter_cliente_llm("gemini", api_key=os.getenv("API_KEY"))
+    else:
+        cliente = obter_cliente_llm("stub")
+
+    relatorio = gerar_planos(
+        db, cliente, dia=args.dia, concorrencia=args.concorrencia,
+        dias_atividade=args.dias_atividade, refazer=args.refazer
+    )
+    if args.json:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{relatorio['ativos']} de {relatorio['usuarios']} usuários ativos: {relatorio['gerados']} planos "
+          f"gerados, {relatorio['pulados']} já existiam, {relatorio['falhas']} falhas "
+          f"em {relatorio['segundos']} s")
+    for usuario_id, erro in relatorio['erros']:
+        print(f"  usuário {usuario_id}: {erro}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,27 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-import sqlite3
-import hashlib
+import io
 from datetime import datetime, date
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    st.error("""
-    📦 Biblioteca necessária não encontrada!
-    
-    Para instalar, execute no terminal:
-    ```bash
-    pip install google-generativeai
-    ```
-    """)
-    st.stop()
+from metricas import (
+    registro, cronometrar, iniciar_rerun, finalizar_rerun,
+    configurar_pela_env, resumo as resumo_metricas
+)
+
+iniciar_rerun()
+# O SDK de IA não é importado aqui: o backend o carrega na primeira pergunta
+with cronometrar("inicio_importacoes"):
+    from database import obter_escritor
+    from repositorio import criar_repositorio
+    from transferencia import importar, exportar, formato_do_arquivo
+    from manutencao import RETENCAO_DIAS, MANTER_RECENTES, INTERVALO_MANUTENCAO, iniciar_manutencao_periodica
+    from planejamento import PERGUNTA_PLANEJAR_DIA
+    from senhas import LoginIndisponivel
+    from llm import LLM_BACKEND, LLMIndisponivel, RespostaBloqueada, obter_cliente_llm
+    from assistente import (
+        ConstrutorContexto, ResumidorConversa, RespostaStream,
+        chave_cache, obter_cache_respostas, resumo_extrativo
+    )
 
 # Configuração da página
 st.set_page_config(
@@ -67,252 +72,60 @@ st.markdown("""
 
 # Configuração da API
 api_key = os.getenv("API_KEY")
-genai.configure(api_key=st.secrets["API_KEY"])
+ORCAMENTO_TOKENS_IA = int(os.getenv("FOCUSFLOW_ORCAMENTO_TOKENS", "2000"))
+LIMITE_MENSAGENS_SESSAO = 50
+ITENS_CONTEXTO_IA = 15
 
-# Sistema de Banco de Dados
-class DatabaseManager:
-    def __init__(self):
-        self.init_db()
-    
-    def init_db(self):
-        """Inicializa o banco de dados e cria tabelas se não existirem"""
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        # Tabela de usuários
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela de tarefas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tarefas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario_id INTEGER NOT NULL,
-                texto TEXT NOT NULL,
-                prioridade TEXT NOT NULL,
-                concluida BOOLEAN DEFAULT FALSE,
-                timestamp TEXT NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Tabela de ideias
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ideias (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario_id INTEGER NOT NULL,
-                texto TEXT NOT NULL,
-                categoria TEXT DEFAULT 'Geral',
-                timestamp TEXT NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Tabela de mensagens do chat
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mensagens (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def hash_password(self, password):
-        """Gera hash da senha"""
-        return hashlib.sha256(password.encode()).hexdigest()
-    
-    def criar_usuario(self, username, email, password):
-        """Cria um novo usuário"""
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        try:
-            password_hash = self.hash_password(password)
-            cursor.execute(
-                'INSERT INTO usuarios (username, email, password_hash) VALUES (?, ?, ?)',
-                (username, email, password_hash)
-            )
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
-    
-    def verificar_login(self, username, password):
-        """Verifica credenciais de login"""
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        password_hash = self.hash_password(password)
-        cursor.execute(
-            'SELECT id, username FROM usuarios WHERE username = ? AND password_hash = ?',
-            (username, password_hash)
-        )
-        
-        usuario = cursor.fetchone()
-        conn.close()
-        
-        if usuario:
-            return {'id': usuario[0], 'username': usuario[1]}
-        return None
-    
-    # Operações para Tarefas
-    def salvar_tarefa(self, usuario_id, tarefa):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'INSERT INTO tarefas (usuario_id, texto, prioridade, concluida, timestamp) VALUES (?, ?, ?, ?, ?)',
-            (usuario_id, tarefa['texto'], tarefa['prioridade'], tarefa['concluida'], tarefa['timestamp'])
-        )
-        
-        conn.commit()
-        conn.close()
-    
-    def carregar_tarefas(self, usuario_id):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT texto, prioridade, concluida, timestamp FROM tarefas WHERE usuario_id = ? ORDER BY data_criacao DESC',
-            (usuario_id,)
-        )
-        
-        tarefas = []
-        for row in cursor.fetchall():
-            tarefas.append({
-                'texto': row[0],
-                'prioridade': row[1],
-                'concluida': bool(row[2]),
-                'timestamp': row[3]
-            })
-        
-        conn.close()
-        return tarefas
-    
-    def atualizar_tarefa(self, usuario_id, index, campo, valor):
-        tarefas = self.carregar_tarefas(usuario_id)
-        if 0 <= index < len(tarefas):
-            # Para simplificar, recriamos a lista
-            self.limpar_tarefas(usuario_id)
-            tarefas[index][campo] = valor
-            for tarefa in tarefas:
-                self.salvar_tarefa(usuario_id, tarefa)
-    
-    def excluir_tarefa(self, usuario_id, index):
-        tarefas = self.carregar_tarefas(usuario_id)
-        if 0 <= index < len(tarefas):
-            self.limpar_tarefas(usuario_id)
-            tarefas.pop(index)
-            for tarefa in tarefas:
-                self.salvar_tarefa(usuario_id, tarefa)
-    
-    def limpar_tarefas(self, usuario_id):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM tarefas WHERE usuario_id = ?', (usuario_id,))
-        conn.commit()
-        conn.close()
-    
-    # Operações para Ideias
-    def salvar_ideia(self, usuario_id, ideia):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'INSERT INTO ideias (usuario_id, texto, categoria, timestamp) VALUES (?, ?, ?, ?)',
-            (usuario_id, ideia['texto'], ideia['categoria'], ideia['timestamp'])
-        )
-        
-        conn.commit()
-        conn.close()
-    
-    def carregar_ideias(self, usuario_id):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT texto, categoria, timestamp FROM ideias WHERE usuario_id = ? ORDER BY data_criacao DESC',
-            (usuario_id,)
-        )
-        
-        ideias = []
-        for row in cursor.fetchall():
-            ideias.append({
-                'texto': row[0],
-                'categoria': row[1],
-                'timestamp': row[2]
-            })
-        
-        conn.close()
-        return ideias
-    
-    def excluir_ideia(self, usuario_id, index):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT id FROM ideias WHERE usuario_id = ? ORDER BY data_criacao DESC LIMIT 1 OFFSET ?',
-            (usuario_id, index)
-        )
-        
-        resultado = cursor.fetchone()
-        if resultado:
-            cursor.execute('DELETE FROM ideias WHERE id = ?', (resultado[0],))
-            conn.commit()
-        
-        conn.close()
-    
-    # Operações para Mensagens
-    def salvar_mensagem(self, usuario_id, role, content):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'INSERT INTO mensagens (usuario_id, role, content) VALUES (?, ?, ?)',
-            (usuario_id, role, content)
-        )
-        
-        conn.commit()
-        conn.close()
-    
-    def carregar_mensagens(self, usuario_id, limite=50):
-        conn = sqlite3.connect('focusflow.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT role, content FROM mensagens WHERE usuario_id = ? ORDER BY timestamp DESC LIMIT ?',
-            (usuario_id, limite)
-        )
-        
-        mensagens = []
-        for row in cursor.fetchall():
-            mensagens.append({
-                'role': row[0],
-                'content': row[1]
-            })
-        
-        conn.close()
-        return mensagens[::-1]  # Reverter para ordem cronológica
+# Recursos do processo: criados uma única vez e compartilhados entre reruns e sessões
+@st.cache_resource
+def iniciar_banco():
+    """Armazenamento configurado em FOCUSFLOW_ARMAZENAMENTO, com as migrações aplicadas"""
+    with cronometrar("inicio_banco"):
+        repositorio = criar_repositorio()
+    # Arquivamento do histórico antigo (ver manutencao.py), se ligado neste processo
+    if INTERVALO_MANUTENCAO > 0:
+        iniciar_manutencao_periodica(repositorio, INTERVALO_MANUTENCAO)
+    return repositorio
+
+@st.cache_resource
+def iniciar_ia():
+    """Cliente de IA configurado (o SDK só é importado na primeira chamada ao modelo)"""
+    with cronometrar("inicio_ia"):
+        if LLM_BACKEND == "gemini":
+            return obter_cliente_llm("gemini", modelo="gemini-2.0-flash", api_key=st.secrets["API_KEY"])
+        return obter_cliente_llm(LLM_BACKEND)
+
+@st.cache_resource
+def iniciar_resumidor(_db):
+    """Resumidor de conversas (mantém entre reruns os resumos em andamento)"""
+    return ResumidorConversa(_db, resumir=resumir_com_ia, manter_visiveis=LIMITE_MENSAGENS_SESSAO)
+
+def resumir_com_ia(resumo_anterior, mensagens):
+    """Atualiza o resumo da conversa com o modelo (usa o resumo local se a IA falhar)"""
+    historico = "\n".join(f"{m['role']}: {m['content']}" for m in mensagens)
+    prompt = f"""
+    Resumo atual da conversa: {resumo_anterior or '(vazio)'}
+
+    Novas mensagens:
+    {historico}
+
+    Atualize o resumo incorporando as novas mensagens, em no máximo 150 palavras,
+    preservando decisões, compromissos e preferências do usuário.
+    """
+    try:
+        return iniciar_ia().gerar(prompt)
+    except Exception:
+        return resumo_extrativo(resumo_anterior, mensagens)
 
 # Inicializar banco de dados
-db = DatabaseManager()
+db = iniciar_banco()
+
+# Métricas: exportadores opcionais e usuários com acesso ao painel
+configurar_pela_env()
+# O acesso é dado por id (FOCUSFLOW_ADMIN_IDS), definido fora do app; os nomes
+# em FOCUSFLOW_ADMINS ficam reservados e não podem ser cadastrados pela tela
+ADMIN_IDS = {int(i) for i in os.getenv("FOCUSFLOW_ADMIN_IDS", "").split(",") if i.strip()}
+NOMES_RESERVADOS = {nome.strip().lower() for nome in os.getenv("FOCUSFLOW_ADMINS", "").split(",") if nome.strip()}
 
 # Sistema de Autenticação
 def mostrar_tela_login():
@@ -330,14 +143,18 @@ def mostrar_tela_login():
             
             if login_submitted:
                 if username and password:
-                    usuario = db.verificar_login(username, password)
-                    if usuario:
-                        st.session_state.usuario = usuario
-                        st.session_state.logado = True
-                        carregar_dados_usuario(usuario['id'])
-                        st.rerun()
+                    try:
+                        usuario = db.verificar_login(username, password)
+                    except LoginIndisponivel:
+                        st.error("Muitos acessos no momento. Tente novamente em instantes.")
                     else:
-                        st.error("Usuário ou senha incorretos!")
+                        if usuario:
+                            st.session_state.usuario = usuario
+                            st.session_state.logado = True
+                            carregar_dados_usuario(usuario['id'])
+                            st.rerun()
+                        else:
+                            st.error("Usuário ou senha incorretos!")
                 else:
                     st.warning("Preencha todos os campos!")
     
@@ -351,11 +168,18 @@ def mostrar_tela_login():
             
             if cadastro_submitted:
                 if new_username and new_email and new_password:
-                    if new_password == confirm_password:
-                        if db.criar_usuario(new_username, new_email, new_password):
-                            st.success("Conta criada com sucesso! Faça login.")
+                    if new_username.strip().lower() in NOMES_RESERVADOS:
+                        st.error("Usuário ou email já existem!")
+                    elif new_password == confirm_password:
+                        try:
+                            criado = db.criar_usuario(new_username, new_email, new_password)
+                        except LoginIndisponivel:
+                            st.error("Muitos acessos no momento. Tente novamente em instantes.")
                         else:
-                            st.error("Usuário ou email já existem!")
+                            if criado:
+                                st.success("Conta criada com sucesso! Faça login.")
+                            else:
+                                st.error("Usuário ou email já existem!")
                     else:
                         st.error("Senhas não coincidem!")
                 else:
@@ -363,42 +187,188 @@ def mostrar_tela_login():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+# Carregamento sob demanda: só a seção aberta é executada (ver o seletor de
+# seções), e o histórico do chat é buscado na primeira vez que ela precisa
+# dele e descartado (invalidado) quando há escrita. Tarefas e ideias não
+# passam por aqui: cada seção lê só a página visível (ver invalidar_pagina)
+CARREGADORES = {
+    "mensagens": lambda usuario_id: db.carregar_mensagens(usuario_id, LIMITE_MENSAGENS_SESSAO),
+}
+
+def obter_dados(nome):
+    """Retorna o conjunto de dados `nome` do usuário, carregando-o se necessário"""
+    if st.session_state.get(nome) is None:
+        st.session_state[nome] = CARREGADORES[nome](st.session_state.usuario['id'])
+    return st.session_state[nome]
+
+def invalidar_dados(*nomes):
+    """Descarta os dados em sessão; serão recarregados no próximo uso"""
+    for nome in nomes or CARREGADORES:
+        st.session_state[nome] = None
+
 def carregar_dados_usuario(usuario_id):
-    """Carrega todos os dados do usuário do banco de dados"""
-    st.session_state.tarefas = db.carregar_tarefas(usuario_id)
-    st.session_state.ideias = db.carregar_ideias(usuario_id)
-    st.session_state.mensagens = db.carregar_mensagens(usuario_id)
+    """Prepara a sessão de um usuário recém-logado (os dados são carregados sob demanda)"""
+    invalidar_dados()
+    limpar_estado_usuario()
+
+def limpar_estado_usuario():
+    """Descarta o que a sessão guarda da conta anterior (páginas, preferências)"""
+    for chave in [k for k in st.session_state if k.startswith("pagina_")]:
+        del st.session_state[chave]
+    st.session_state.pop("retencao", None)
 
 def salvar_tarefa_usuario(tarefa):
-    """Salva tarefa no banco de dados"""
-    db.salvar_tarefa(st.session_state.usuario['id'], tarefa)
+    """Salva tarefa no banco de dados e registra o id gerado"""
+    tarefa['id'] = db.salvar_tarefa(st.session_state.usuario['id'], tarefa)
+    invalidar_pagina("tarefas")
 
 def salvar_ideia_usuario(ideia):
-    """Salva ideia no banco de dados"""
-    db.salvar_ideia(st.session_state.usuario['id'], ideia)
+    """Salva ideia no banco de dados e registra o id gerado"""
+    ideia['id'] = db.salvar_ideia(st.session_state.usuario['id'], ideia)
+    invalidar_pagina("ideias")
 
 def salvar_mensagem_usuario(role, content):
-    """Salva mensagem no banco de dados"""
-    db.salvar_mensagem(st.session_state.usuario['id'], role, content)
+    """Enfileira a mensagem para gravação em lote e a adiciona ao histórico em sessão, se já carregado"""
+    obter_escritor(db).salvar_mensagem(st.session_state.usuario['id'], role, content)
+    if st.session_state.get("mensagens") is not None:
+        st.session_state.mensagens.append({"role": role, "content": content})
+        # Mantém a sessão com tamanho constante
+        del st.session_state.mensagens[:-LIMITE_MENSAGENS_SESSAO]
+
+# Paginação das listas
+TAMANHO_PAGINA = 20
+
+def carregar_pagina(chave, carregar, **filtros):
+    """Página visível da lista `chave`; fica em sessão (com a pilha de cursores)
+    e só é buscada de novo ao mudar filtros ou página, ou após `invalidar_pagina`"""
+    estado_key = f"pagina_{chave}"
+    estado = st.session_state.get(estado_key)
+    if estado is None or estado["filtros"] != filtros:
+        estado = {"cursores": [None], "filtros": filtros, "itens": None, "proximo": None}
+        st.session_state[estado_key] = estado
+
+    if estado["itens"] is None:
+        estado["itens"], estado["proximo"] = carregar(
+            st.session_state.usuario['id'],
+            limite=TAMANHO_PAGINA,
+            cursor=estado["cursores"][-1],
+            **filtros
+        )
+    return estado["itens"], estado["proximo"]
+
+def invalidar_pagina(chave):
+    """Faz a página da lista `chave` ser recarregada no próximo uso"""
+    estado = st.session_state.get(f"pagina_{chave}")
+    if estado is not None:
+        estado["itens"] = None
+
+def remover_da_pagina(chave, item):
+    """Tira o item da página em sessão sem recarregá-la"""
+    estado = st.session_state.get(f"pagina_{chave}")
+    if estado is not None and estado["itens"] is not None:
+        estado["itens"][:] = [i for i in estado["itens"] if i is not item]
+
+def mudar_pagina(chave, proximo=None):
+    """Avança para o cursor `proximo` ou, sem ele, volta uma página"""
+    estado = st.session_state[f"pagina_{chave}"]
+    if proximo is None:
+        estado["cursores"].pop()
+    else:
+        estado["cursores"].append(proximo)
+    estado["itens"] = None
+
+def mostrar_navegacao(chave, proximo):
+    """Mostra os botões de página anterior/próxima da lista `chave`"""
+    estado = st.session_state[f"pagina_{chave}"]
+    if len(estado["cursores"]) == 1 and proximo is None:
+        return
+
+    col1, col2, col3 = st.columns([2, 3, 2])
+    with col1:
+        if len(estado["cursores"]) > 1:
+            st.button("⬅️ Anterior", key=f"anterior_{chave}", on_click=mudar_pagina, args=(chave,))
+    with col2:
+        st.caption(f"Página {len(estado['cursores'])}")
+    with col3:
+        if proximo is not None:
+            st.button("Próxima ➡️", key=f"proxima_{chave}", on_click=mudar_pagina, args=(chave, proximo))
+
+# Importação e exportação de listas (CSV/JSONL)
+def mostrar_transferencia(tipo):
+    """Importa itens de um arquivo e gera o arquivo de exportação da lista `tipo`"""
+    with st.expander("📦 Importar / exportar"):
+        arquivo = st.file_uploader("Importar de CSV ou JSONL", type=["csv", "jsonl", "ndjson"], key=f"arquivo_{tipo}")
+        if arquivo is not None and st.button("📥 Importar", key=f"importar_{tipo}"):
+            try:
+                relatorio = importar(db, st.session_state.usuario['id'], tipo, arquivo, formato_do_arquivo(arquivo.name))
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"Não foi possível ler o arquivo: {e}")
+            else:
+                invalidar_pagina(tipo)
+                st.success(f"{relatorio['importados']} itens importados.")
+                if relatorio['rejeitados']:
+                    st.warning(f"{relatorio['rejeitados']} linhas ignoradas.")
+                    for linha, motivo in relatorio['erros'][:5]:
+                        st.caption(f"Linha {linha}: {motivo}")
+
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            formato = st.selectbox("Formato", ["csv", "jsonl"], key=f"formato_exportacao_{tipo}")
+        with col2:
+            if st.button("📤 Gerar arquivo", key=f"exportar_{tipo}"):
+                # O st.download_button do Streamlit 1.38 só aceita o conteúdo já
+                # pronto, que fica no armazenamento de mídia do servidor enquanto
+                # o botão está na tela. Por isso o arquivo é gerado só neste
+                # rerun, direto do cursor do banco, e não é guardado na sessão:
+                # na próxima interação o botão some e o conteúdo é descartado.
+                conteudo = io.BytesIO()
+                destino = io.TextIOWrapper(conteudo, encoding="utf-8", newline="")
+                exportar(db, st.session_state.usuario['id'], tipo, destino, formato)
+                destino.flush()
+                destino.detach()
+                st.download_button("⬇️ Baixar", conteudo, file_name=f"{tipo}.{formato}", key=f"baixar_{tipo}")
+
+# Prazo de guarda do histórico do chat no app
+def mostrar_retencao():
+    """Deixa o usuário escolher por quantos dias as conversas ficam no app"""
+    with st.expander("🗄️ Histórico do chat"):
+        usuario_id = st.session_state.usuario['id']
+        if "retencao" not in st.session_state:
+            st.session_state.retencao = db.obter_retencao(usuario_id)
+        dias = st.number_input(
+            "Manter conversas por (dias):", min_value=1, max_value=3650,
+            value=st.session_state.retencao or RETENCAO_DIAS
+        )
+        st.caption(f"Mensagens mais antigas vão para o arquivo; as {MANTER_RECENTES} últimas sempre ficam.")
+        if st.button("Salvar prazo"):
+            db.definir_retencao(usuario_id, int(dias))
+            st.session_state.retencao = int(dias)
+            st.success("Prazo atualizado!")
 
 # Inicialização do estado da sessão
 if "logado" not in st.session_state:
     st.session_state.logado = False
 if "usuario" not in st.session_state:
     st.session_state.usuario = None
-if "mensagens" not in st.session_state:
-    st.session_state.mensagens = []
-if "tarefas" not in st.session_state:
-    st.session_state.tarefas = []
-if "ideias" not in st.session_state:
-    st.session_state.ideias = []
+for nome in CARREGADORES:
+    if nome not in st.session_state:
+        st.session_state[nome] = None
+if "metricas_ia" not in st.session_state:
+    st.session_state.metricas_ia = []
 
 # Verificar autenticação
 if not st.session_state.logado:
     mostrar_tela_login()
+    finalizar_rerun("login")
     st.stop()
 
 # APLICAÇÃO PRINCIPAL (após login)
+# Assistente: a tela de login não depende de nada disto
+cliente_llm = iniciar_ia()
+MODELO_IA = cliente_llm.modelo
+construtor_contexto = ConstrutorContexto(orcamento_tokens=ORCAMENTO_TOKENS_IA)
+resumidor = iniciar_resumidor(db)
+
 # Header
 st.markdown('<div class="header">', unsafe_allow_html=True)
 col1, col2, col3 = st.columns([3, 1, 1])
@@ -410,102 +380,179 @@ with col3:
     if st.button("🚪 Sair"):
         st.session_state.logado = False
         st.session_state.usuario = None
+        limpar_estado_usuario()
         st.rerun()
 st.markdown("</div>", unsafe_allow_html=True)
 
-# Layout com abas
-tab1, tab2, tab3 = st.tabs(["🗓️ Tarefas", "💡 Ideias", "🤖 Assistente IA"])
+# Busca em tarefas, ideias e conversas
+ICONES_BUSCA = {"tarefa": "🗓️", "ideia": "💡", "mensagem": "💬"}
+termo_busca = st.text_input("🔎 Buscar", placeholder="Buscar em tarefas, ideias e conversas...")
+if termo_busca:
+    if st.session_state.get("busca_termo") != termo_busca:
+        st.session_state.busca_termo = termo_busca
+        st.session_state.pagina_busca = 0
 
-with tab1:
-    st.subheader("📋 Minhas Tarefas")
-    
-    # Formulário para adicionar tarefa
-    with st.form("nova_tarefa", clear_on_submit=True):
-        col1, col2 = st.columns([3, 1])
+    resultados, ha_mais = db.buscar(
+        st.session_state.usuario['id'],
+        termo_busca,
+        limite=TAMANHO_PAGINA,
+        pagina=st.session_state.pagina_busca
+    )
+    with st.expander(f"Resultados para “{termo_busca}”", expanded=True):
+        if resultados:
+            for resultado in resultados:
+                st.markdown(f"{ICONES_BUSCA[resultado['tipo']]} {resultado['trecho']}")
+        else:
+            st.info("Nenhum resultado encontrado.")
+
+        col1, col2, col3 = st.columns([2, 3, 2])
         with col1:
-            nova_tarefa = st.text_input("Nova tarefa:", placeholder="Ex: Reunião com equipe às 10h")
-        with col2:
-            prioridade = st.selectbox("Prioridade:", ["🟢 Baixa", "🟡 Média", "🔴 Alta"])
-        
-        submitted = st.form_submit_button("Adicionar Tarefa")
-        
-        if submitted and nova_tarefa:
-            tarefa_data = {
-                "texto": nova_tarefa,
-                "prioridade": prioridade,
-                "concluida": False,
-                "timestamp": datetime.now().strftime("%H:%M")
-            }
-            salvar_tarefa_usuario(tarefa_data)
-            st.session_state.tarefas.append(tarefa_data)
-            st.rerun()
-    
-    # Lista de tarefas
-    if st.session_state.tarefas:
-        for i, tarefa in enumerate(st.session_state.tarefas):
-            st.markdown(f'<div class="task-card">', unsafe_allow_html=True)
-            col1, col2, col3 = st.columns([6, 2, 2])
-            with col1:
-                if tarefa["concluida"]:
-                    st.markdown(f"~~{tarefa['texto']}~~")
-                else:
-                    st.write(f"{tarefa['texto']}")
-            with col2:
-                st.write(tarefa["prioridade"])
-            with col3:
-                if not tarefa["concluida"]:
-                    if st.button("✅", key=f"concluir_{i}"):
-                        db.atualizar_tarefa(st.session_state.usuario['id'], i, "concluida", True)
-                        st.session_state.tarefas[i]["concluida"] = True
-                        st.rerun()
-                if st.button("🗑️", key=f"excluir_{i}"):
-                    db.excluir_tarefa(st.session_state.usuario['id'], i)
-                    st.session_state.tarefas.pop(i)
-                    st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.info("🎉 Nenhuma tarefa pendente! Adicione uma nova tarefa acima.")
+            if st.session_state.pagina_busca > 0 and st.button("⬅️ Anterior", key="anterior_busca"):
+                st.session_state.pagina_busca -= 1
+                st.rerun()
+        with col3:
+            if ha_mais and st.button("Próxima ➡️", key="proxima_busca"):
+                st.session_state.pagina_busca += 1
+                st.rerun()
 
-with tab2:
-    st.subheader("💭 Minhas Ideias")
-    
-    # Formulário para adicionar ideia
-    with st.form("nova_ideia", clear_on_submit=True):
-        nova_ideia = st.text_area("Nova ideia:", placeholder="Ex: Ideia para novo projeto...", height=100)
-        submitted = st.form_submit_button("Salvar Ideia")
-        
-        if submitted and nova_ideia:
-            ideia_data = {
-                "texto": nova_ideia,
-                "timestamp": datetime.now().strftime("%H:%M"),
-                "categoria": "Geral"
-            }
-            salvar_ideia_usuario(ideia_data)
-            st.session_state.ideias.append(ideia_data)
-            st.rerun()
-    
-    # Lista de ideias
-    if st.session_state.ideias:
-        for i, ideia in enumerate(st.session_state.ideias):
-            st.markdown(f'<div class="idea-card">', unsafe_allow_html=True)
-            col1, col2 = st.columns([8, 2])
+# Listas e chat em fragmentos: uma interação dentro de uma seção reexecuta só
+# aquela seção, e cada cartão é um fragmento próprio, com widgets chaveados pelo
+# id do item. As ações alteram o item na página guardada em sessão, então um
+# clique redesenha só o cartão afetado, sem consultar a lista de novo.
+def concluir_tarefa(tarefa):
+    db.atualizar_tarefa(st.session_state.usuario['id'], tarefa['id'], "concluida", True)
+    tarefa['concluida'] = True
+
+def excluir_tarefa_usuario(tarefa):
+    db.excluir_tarefa(st.session_state.usuario['id'], tarefa['id'])
+    tarefa['excluida'] = True
+    remover_da_pagina("tarefas", tarefa)
+
+def excluir_ideia_usuario(ideia):
+    db.excluir_ideia(st.session_state.usuario['id'], ideia['id'])
+    ideia['excluida'] = True
+    remover_da_pagina("ideias", ideia)
+
+def perguntar(pergunta):
+    st.session_state.pergunta_pendente = pergunta
+
+def planejar_dia():
+    """Serve o plano do dia gerado em lote (planejamento.py); sem ele, pergunta à IA"""
+    usuario_id = st.session_state.usuario['id']
+    plano = db.obter_plano(usuario_id, date.today().isoformat())
+    if plano is None:
+        perguntar(PERGUNTA_PLANEJAR_DIA)
+        return
+    obter_dados("mensagens")
+    salvar_mensagem_usuario("user", PERGUNTA_PLANEJAR_DIA)
+    salvar_mensagem_usuario("assistant", plano['plano'])
+    registro.incrementar("planos_servidos")
+    resumidor.atualizar_em_segundo_plano(usuario_id)
+
+@st.fragment
+def mostrar_cartao_tarefa(tarefa):
+    if tarefa.get('excluida'):
+        return
+    st.markdown(f'<div class="task-card">', unsafe_allow_html=True)
+    col1, col2, col3 = st.columns([6, 2, 2])
+    with col1:
+        if tarefa["concluida"]:
+            st.markdown(f"~~{tarefa['texto']}~~")
+        else:
+            st.write(f"{tarefa['texto']}")
+    with col2:
+        st.write(tarefa["prioridade"])
+    with col3:
+        if not tarefa["concluida"]:
+            st.button("✅", key=f"concluir_{tarefa['id']}", on_click=concluir_tarefa, args=(tarefa,))
+        st.button("🗑️", key=f"excluir_{tarefa['id']}", on_click=excluir_tarefa_usuario, args=(tarefa,))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+def mostrar_cartao_ideia(ideia):
+    if ideia.get('excluida'):
+        return
+    st.markdown(f'<div class="idea-card">', unsafe_allow_html=True)
+    col1, col2 = st.columns([8, 2])
+    with col1:
+        st.write(ideia["texto"])
+        st.caption(f"⏰ {ideia['timestamp']}")
+    with col2:
+        st.button("🗑️", key=f"excluir_ideia_{ideia['id']}", on_click=excluir_ideia_usuario, args=(ideia,))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+def mostrar_aba_tarefas():
+    with cronometrar("fragmento_tarefas"):
+        # Formulário para adicionar tarefa
+        with st.form("nova_tarefa", clear_on_submit=True):
+            col1, col2 = st.columns([3, 1])
             with col1:
-                st.write(ideia["texto"])
-                st.caption(f"⏰ {ideia['timestamp']}")
+                nova_tarefa = st.text_input("Nova tarefa:", placeholder="Ex: Reunião com equipe às 10h")
             with col2:
-                if st.button("🗑️", key=f"excluir_ideia_{i}"):
-                    db.excluir_ideia(st.session_state.usuario['id'], i)
-                    st.session_state.ideias.pop(i)
-                    st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
-    else:
-        st.info("💡 Nenhuma ideia salva ainda. Registre suas ideias criativas!")
+                prioridade = st.selectbox("Prioridade:", ["🟢 Baixa", "🟡 Média", "🔴 Alta"])
+            
+            submitted = st.form_submit_button("Adicionar Tarefa")
+            
+            if submitted and nova_tarefa:
+                tarefa_data = {
+                    "texto": nova_tarefa,
+                    "prioridade": prioridade,
+                    "concluida": False,
+                    "timestamp": datetime.now().strftime("%H:%M")
+                }
+                salvar_tarefa_usuario(tarefa_data)
+        
+        # Filtros (aplicados na consulta SQL)
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            apenas_pendentes = st.checkbox("Somente pendentes")
+        with col2:
+            filtro_prioridade = st.selectbox("Filtrar prioridade:", ["Todas", "🟢 Baixa", "🟡 Média", "🔴 Alta"])
 
-with tab3:
-    st.subheader("🤖 Assistente de Organização IA")
-    
+        # Lista de tarefas (apenas a página visível)
+        pagina_tarefas, proximo_tarefas = carregar_pagina(
+            "tarefas",
+            db.carregar_tarefas_pagina,
+            apenas_pendentes=apenas_pendentes,
+            prioridade=None if filtro_prioridade == "Todas" else filtro_prioridade
+        )
+        if pagina_tarefas:
+            for tarefa in pagina_tarefas:
+                mostrar_cartao_tarefa(tarefa)
+            mostrar_navegacao("tarefas", proximo_tarefas)
+        else:
+            st.info("🎉 Nenhuma tarefa pendente! Adicione uma nova tarefa acima.")
+
+@st.fragment
+def mostrar_aba_ideias():
+    with cronometrar("fragmento_ideias"):
+        # Formulário para adicionar ideia
+        with st.form("nova_ideia", clear_on_submit=True):
+            nova_ideia = st.text_area("Nova ideia:", placeholder="Ex: Ideia para novo projeto...", height=100)
+            submitted = st.form_submit_button("Salvar Ideia")
+            
+            if submitted and nova_ideia:
+                ideia_data = {
+                    "texto": nova_ideia,
+                    "timestamp": datetime.now().strftime("%H:%M"),
+                    "categoria": "Geral"
+                }
+                salvar_ideia_usuario(ideia_data)
+        
+        # Lista de ideias (apenas a página visível)
+        pagina_ideias, proximo_ideias = carregar_pagina("ideias", db.carregar_ideias_pagina)
+        if pagina_ideias:
+            for ideia in pagina_ideias:
+                mostrar_cartao_ideia(ideia)
+            mostrar_navegacao("ideias", proximo_ideias)
+        else:
+            st.info("💡 Nenhuma ideia salva ainda. Registre suas ideias criativas!")
+
+@st.fragment
+def mostrar_assistente():
     # Mostrar histórico do chat
-    for msg in st.session_state.mensagens:
+    for msg in obter_dados("mensagens"):
         if msg["role"] == "user":
             st.chat_message("user").write(msg["content"])
         else:
@@ -518,70 +565,141 @@ with tab3:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📅 Planejar dia"):
-            user_msg = "Me ajude a planejar meu dia de forma produtiva"
-            st.session_state.mensagens.append({"role": "user", "content": user_msg})
-            salvar_mensagem_usuario("user", user_msg)
-            st.rerun()
+        st.button("📅 Planejar dia", on_click=planejar_dia)
     
     with col2:
-        if st.button("💡 Brainstorm"):
-            user_msg = "Me ajude a fazer um brainstorm de ideias criativas"
-            st.session_state.mensagens.append({"role": "user", "content": user_msg})
-            salvar_mensagem_usuario("user", user_msg)
-            st.rerun()
+        st.button("💡 Brainstorm", on_click=perguntar, args=("Me ajude a fazer um brainstorm de ideias criativas",))
     
     with col3:
-        if st.button("📊 Prioridades"):
-            user_msg = "Me ajude a definir minhas prioridades"
-            st.session_state.mensagens.append({"role": "user", "content": user_msg})
-            salvar_mensagem_usuario("user", user_msg)
-            st.rerun()
+        st.button("📊 Prioridades", on_click=perguntar, args=("Me ajude a definir minhas prioridades",))
     
     # Input do usuário
     user_input = st.chat_input("Pergunte ao assistente sobre organização, produtividade...")
+    if not user_input:
+        user_input = st.session_state.pop("pergunta_pendente", None)
     
     if user_input:
         # Adicionar mensagem do usuário
         st.chat_message("user").write(user_input)
-        st.session_state.mensagens.append({"role": "user", "content": user_input})
         salvar_mensagem_usuario("user", user_input)
         
-        # Criar contexto com informações das tarefas e ideias
-        contexto = f"""
-        Hoje é {date.today().strftime('%d/%m/%Y')}.
-        
-        Tarefas do usuário: {[t['texto'] for t in st.session_state.tarefas if not t['concluida']]}
-        Ideias do usuário: {[i['texto'] for i in st.session_state.ideias]}
-        
-        Histórico da conversa: {st.session_state.mensagens[-5:]}
-        
-        Usuário pergunta: {user_input}
-        
-        Você é um assistente especializado em organização, produtividade e gestão de tarefas. 
-        Responda de forma útil e motivacional, focando em ajudar com organização pessoal.
-        """
-        
-        # Gerar resposta
-        with st.spinner("🤔 Pensando na melhor forma de ajudar..."):
+        # Criar contexto só com as tarefas e ideias mais relevantes à pergunta
+        # (índice vetorial local), dentro do orçamento de tokens
+        relevantes = db.recuperar_relevantes(st.session_state.usuario['id'], user_input, k=ITENS_CONTEXTO_IA)
+        hoje = date.today().strftime('%d/%m/%Y')
+        resumo = resumidor.resumo(st.session_state.usuario['id'])
+        montagem = construtor_contexto.montar(
+            user_input,
+            tarefas=relevantes['tarefas'],
+            ideias=relevantes['ideias'],
+            mensagens=obter_dados("mensagens")[:-1],
+            hoje=hoje,
+            resumo=resumo
+        )
+        contexto = montagem['prompt']
+
+        cache = obter_cache_respostas(db)
+        chave = chave_cache(
+            st.session_state.usuario['id'], user_input, MODELO_IA,
+            tarefas=montagem['tarefas'], ideias=montagem['ideias'], hoje=hoje, resumo=resumo
+        )
+
+        def registrar_resposta(resposta_ia, metricas):
+            """Persiste a resposta (completa ou parcial) uma única vez"""
+            salvar_mensagem_usuario("assistant", resposta_ia)
+            metricas['tokens_prompt'] = montagem['tokens']
+            st.session_state.metricas_ia.append(metricas)
+            registro.observar("llm_tokens_prompt", montagem['tokens'])
+            if metricas.get('tempo_primeiro_token') is not None:
+                registro.observar("llm_tempo_primeiro_token_segundos", metricas['tempo_primeiro_token'])
+
+            # O histórico antigo vira resumo em segundo plano
+            resumidor.atualizar_em_segundo_plano(st.session_state.usuario['id'])
+
+        resposta_cache = cache.obter(chave)
+        if resposta_cache is not None:
+            st.markdown(f'<div class="assistant-message">', unsafe_allow_html=True)
+            st.write(resposta_cache)
+            st.markdown('</div>', unsafe_allow_html=True)
+            st.caption("⚡ Resposta recuperada do cache")
+            registrar_resposta(resposta_cache, {'cache': True})
+        else:
+            def finalizar_stream(stream):
+                registrar_resposta(stream.texto, stream.metricas())
+                if not stream.cancelado:
+                    cache.salvar(chave, MODELO_IA, stream.texto)
+
+            # Qualquer clique interrompe a execução atual e, com ela, o streaming
+            st.button("⏹️ Parar resposta", key="parar_resposta")
+
+            # Gerar resposta em streaming
             try:
-                model = genai.GenerativeModel("gemini-2.0-flash")
-                resposta = model.generate_content(contexto)
-                resposta_ia = resposta.text
-                
-                # Adicionar resposta ao histórico
+                # Na primeira pergunta do processo importa o SDK e cria o modelo
+                cliente_llm.preparar()
+                stream = RespostaStream(
+                    cliente_llm.gerar_stream(contexto),
+                    ao_finalizar=finalizar_stream
+                )
+
                 st.markdown(f'<div class="assistant-message">', unsafe_allow_html=True)
-                st.write(resposta_ia)
+                try:
+                    st.write_stream(stream)
+                finally:
+                    if not stream.finalizado:
+                        stream.cancelar()
+                        stream.fechar()
                 st.markdown('</div>', unsafe_allow_html=True)
-                st.session_state.mensagens.append({
-                    "role": "assistant", 
-                    "content": resposta_ia
-                })
-                salvar_mensagem_usuario("assistant", resposta_ia)
-                
+
+                metricas = stream.metricas()
+                if metricas['tempo_primeiro_token'] is not None:
+                    st.caption(
+                        f"⚡ Primeiro token em {metricas['tempo_primeiro_token']:.2f}s · "
+                        f"resposta completa em {metricas['tempo_total']:.2f}s"
+                    )
+
+            except ImportError:
+                st.error("""
+                📦 Biblioteca necessária não encontrada!
+
+                Para instalar, execute no terminal:
+                ```bash
+                pip install google-generativeai
+                ```
+                """)
+            except LLMIndisponivel as e:
+                st.warning(f"⏳ {e}. Tente novamente em instantes.")
+            except RespostaBloqueada:
+                st.warning("🚫 A IA não respondeu a esta pergunta. Tente reformulá-la.")
             except Exception as e:
                 st.error(f"Erro ao conectar com a IA: {e}")
 
+# Seções: só a escolhida é executada (st.tabs executa o corpo de todas as abas
+# a cada rerun), então os dados de cada uma são lidos apenas quando ela é aberta
+secao = st.radio(
+    "Seção", ["🗓️ Tarefas", "💡 Ideias", "🤖 Assistente IA"],
+    horizontal=True, label_visibility="collapsed", key="secao"
+)
+
+if secao == "🗓️ Tarefas":
+    st.subheader("📋 Minhas Tarefas")
+    mostrar_aba_tarefas()
+    mostrar_transferencia("tarefas")
+elif secao == "💡 Ideias":
+    st.subheader("💭 Minhas Ideias")
+    mostrar_aba_ideias()
+    mostrar_transferencia("ideias")
+else:
+    st.subheader("🤖 Assistente de Organização IA")
+    mostrar_assistente()
+    mostrar_retencao()
+
+# Painel de desempenho (apenas administradores)
+if st.session_state.usuario['id'] in ADMIN_IDS:
+    with st.expander("📊 Métricas de desempenho"):
+        st.table(resumo_metricas())
+        st.json(registro.instantaneo()['valores'])
+
 # Footer
 st.markdown("---")
 st.caption(f"✨ FocusFlow - Organizador pessoal de {st.session_state.usuario['username']}")
+finalizar_rerun()
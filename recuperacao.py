@@ -0,0 +1,76 @@
+import re
+import math
+import zlib
+import heapq
+import unicodedata
+from array import array
+
+# Vetores esparsos por "feature hashing": cada palavra (e seu prefixo, que
+# aproxima o radical em português) vira uma posição em um espaço de DIMENSAO
+# posições. Não há vocabulário para manter, então a indexação é incremental.
+DIMENSAO = 2 ** 16
+TAMANHO_PREFIXO = 5
+
+PALAVRAS_VAZIAS = {
+    "que", "com", "para", "por", "uma", "uns", "umas", "dos", "das", "nos", "nas",
+    "meu", "minha", "meus", "minhas", "seu", "sua", "seus", "suas", "como", "mais",
+    "muito", "isso", "esse", "essa", "este", "esta", "ser", "ter", "fazer", "ajude",
+    "quero", "preciso", "sobre", "qual", "quais", "quando", "onde", "tem", "sao",
+    "foi", "pelo", "pela", "entre", "ate", "sem", "the", "and", "for",
+}
+
+
+def tokenizar(texto):
+    """Palavras sem acentos, em minúsculas, com 3+ letras e sem palavras vazias"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return [p for p in re.findall(r"\w+", texto) if len(p) >= 3 and p not in PALAVRAS_VAZIAS]
+
+
+def _posicao(feature):
+    return zlib.crc32(feature.encode()) % DIMENSAO
+
+
+def vetorizar(texto):
+    """Vetor esparso normalizado {posição: peso} do texto"""
+    contagens = {}
+    for palavra in tokenizar(texto):
+        features = {palavra}
+        if len(palavra) > TAMANHO_PREFIXO:
+            features.add(palavra[:TAMANHO_PREFIXO] + "~")
+        for feature in features:
+            posicao = _posicao(feature)
+            contagens[posicao] = contagens.get(posicao, 0) + 1
+
+    vetor = {posicao: 1 + math.log(n) for posicao, n in contagens.items()}
+    norma = math.sqrt(sum(p * p for p in vetor.values()))
+    if not norma:
+        return {}
+    return {posicao: peso / norma for posicao, peso in vetor.items()}
+
+
+def serializar(vetor):
+    """Empacota o vetor em bytes: posições (uint16) seguidas dos pesos (float32)"""
+    posicoes = sorted(vetor)
+    return array("H", posicoes).tobytes() + array("f", (vetor[p] for p in posicoes)).tobytes()
+
+
+def similaridade(consulta, dados):
+    """Cosseno entre o vetor da consulta e um vetor serializado (ambos normalizados)"""
+    if not consulta or not dados:
+        return 0.0
+    n = len(dados) // 6
+    posicoes = array("H")
+    posicoes.frombytes(dados[:n * 2])
+    pesos = array("f")
+    pesos.frombytes(dados[n * 2:])
+    return sum(consulta.get(p, 0.0) * w for p, w in zip(posicoes, pesos))
+
+
+def mais_similares(consulta, candidatos, k, minimo=0.05):
+    """Os k candidatos (chave, vetor serializado) mais similares à consulta, com pontuação >= minimo"""
+    vetor = vetorizar(consulta) if isinstance(consulta, str) else consulta
+    if not vetor:
+        return []
+    pontuados = ((similaridade(vetor, dados), chave) for chave, dados in candidatos)
+    return [(chave, nota) for nota, chave in heapq.nlargest(k, pontuados, key=lambda x: x[0]) if nota >= minimo]
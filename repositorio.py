@@ -0,0 +1,184 @@
+import os
+
+# Armazenamento usado pelo app (variável FOCUSFLOW_ARMAZENAMENTO):
+#   "sqlite"             um arquivo SQLite (padrão, DatabaseManager)
+#   "sqlite_fragmentado" um arquivo SQLite por grupo de usuários (fragmentos.py)
+#   "postgres"           PostgreSQL compartilhado por várias réplicas (servidor_sql.py)
+#   "servidor_sqlite"    a implementação cliente/servidor sobre SQLite, para testes locais
+ARMAZENAMENTO = os.getenv("FOCUSFLOW_ARMAZENAMENTO", "sqlite")
+
+
+class Repositorio:
+    """Interface das implementações de armazenamento
+
+    Todas as operações de dados recebem o id do usuário como primeiro
+    argumento (o que permite fragmentar por usuário); registros são dicts.
+    """
+
+    # Exceções do driver: erro genérico e violação de unicidade
+    ErroBanco = Exception
+    ErroIntegridade = Exception
+
+    # Schema
+    def versao_schema(self):
+        raise NotImplementedError
+
+    def migrar(self, ate=None):
+        raise NotImplementedError
+
+    # Usuários
+    def criar_usuario(self, username, email, password):
+        """True se criou, False se o usuário ou email já existem"""
+        raise NotImplementedError
+
+    def verificar_login(self, username, password):
+        """{'id', 'username'} ou None"""
+        raise NotImplementedError
+
+    # Tarefas
+    def salvar_tarefa(self, usuario_id, tarefa):
+        raise NotImplementedError
+
+    def salvar_tarefas(self, usuario_id, tarefas):
+        raise NotImplementedError
+
+    def carregar_tarefas(self, usuario_id):
+        raise NotImplementedError
+
+    def iterar_tarefas(self, usuario_id, lote=1000):
+        raise NotImplementedError
+
+    def carregar_tarefas_pagina(self, usuario_id, limite=20, cursor=None, apenas_pendentes=False, prioridade=None):
+        raise NotImplementedError
+
+    def atualizar_tarefa(self, usuario_id, tarefa_id, campo, valor):
+        raise NotImplementedError
+
+    def atualizar_tarefas(self, usuario_id, campo, alteracoes):
+        raise NotImplementedError
+
+    def excluir_tarefa(self, usuario_id, tarefa_id):
+        raise NotImplementedError
+
+    def excluir_tarefas(self, usuario_id, tarefa_ids):
+        raise NotImplementedError
+
+    def limpar_tarefas(self, usuario_id):
+        raise NotImplementedError
+
+    # Ideias
+    def salvar_ideia(self, usuario_id, ideia):
+        raise NotImplementedError
+
+    def salvar_ideias(self, usuario_id, ideias):
+        raise NotImplementedError
+
+    def carregar_ideias(self, usuario_id):
+        raise NotImplementedError
+
+    def iterar_ideias(self, usuario_id, lote=1000):
+        raise NotImplementedError
+
+    def carregar_ideias_pagina(self, usuario_id, limite=20, cursor=None, categoria=None):
+        raise NotImplementedError
+
+    def excluir_ideia(self, usuario_id, ideia_id):
+        raise NotImplementedError
+
+    # Mensagens
+    def salvar_mensagem(self, usuario_id, role, content):
+        raise NotImplementedError
+
+    def salvar_mensagens(self, mensagens):
+        """Lista de (usuario_id, role, content), possivelmente de vários usuários"""
+        raise NotImplementedError
+
+    def carregar_mensagens(self, usuario_id, limite=50):
+        raise NotImplementedError
+
+    # Recuperação e busca
+    def recuperar_relevantes(self, usuario_id, consulta, k=15, max_candidatos=2000):
+        raise NotImplementedError
+
+    def buscar(self, usuario_id, termo, tipos=None, limite=20, pagina=0):
+        raise NotImplementedError
+
+    # Resumo da conversa
+    def carregar_resumo(self, usuario_id):
+        raise NotImplementedError
+
+    def carregar_mensagens_nao_resumidas(self, usuario_id, manter_recentes=10, limite=50):
+        raise NotImplementedError
+
+    def salvar_resumo(self, usuario_id, resumo, ate_mensagem_id, arquivar=True, manter_visiveis=50):
+        raise NotImplementedError
+
+    # Retenção e arquivamento do histórico (ver manutencao.py)
+    def listar_usuarios(self):
+        raise NotImplementedError
+
+    def obter_retencao(self, usuario_id):
+        """Dias de retenção do usuário, ou None (vale o padrão)"""
+        raise NotImplementedError
+
+    def definir_retencao(self, usuario_id, dias):
+        raise NotImplementedError
+
+    def iterar_mensagens_antigas(self, usuario_id, antes_de, manter_recentes=50, lote=1000):
+        raise NotImplementedError
+
+    def excluir_mensagens_antigas(self, usuario_id, antes_de, ate_id):
+        raise NotImplementedError
+
+    # Planos diários pré-gerados (ver planejamento.py)
+    def usuarios_ativos(self, usuario_ids, desde):
+        raise NotImplementedError
+
+    def carregar_contexto_planejamento(self, usuario_ids, limite_tarefas=30, limite_ideias=15):
+        """{usuario_id: {'tarefas', 'ideias', 'resumo'}} para um lote de usuários"""
+        raise NotImplementedError
+
+    def planos_existentes(self, usuario_ids, dia):
+        raise NotImplementedError
+
+    def salvar_planos(self, planos):
+        """Lista de (usuario_id, dia, modelo, plano), possivelmente de vários usuários"""
+        raise NotImplementedError
+
+    def obter_plano(self, usuario_id, dia):
+        raise NotImplementedError
+
+    def limpar_planos(self, antes_de):
+        raise NotImplementedError
+
+    def compactar(self, vacuum_completo=False, limite_livres=0.25):
+        """Lista de relatórios por banco: {'banco', 'operacao', 'bytes_antes', 'bytes_depois', 'bytes_recuperados'}"""
+        raise NotImplementedError
+
+    # Cache de respostas do assistente (não é por usuário)
+    def obter_resposta_cache(self, chave, ttl):
+        """Resposta guardada há no máximo `ttl` segundos, ou None"""
+        raise NotImplementedError
+
+    def salvar_resposta_cache(self, chave, modelo, resposta, max_itens):
+        raise NotImplementedError
+
+    def limpar_respostas_expiradas(self, ttl):
+        raise NotImplementedError
+
+
+def criar_repositorio(nome=ARMAZENAMENTO, **opcoes):
+    """Instancia o armazenamento pelo nome (ver ARMAZENAMENTO)"""
+    if nome == "sqlite":
+        from database import DatabaseManager
+        return DatabaseManager(**opcoes)
+    if nome == "sqlite_fragmentado":
+        from fragmentos import RepositorioFragmentado
+        return RepositorioFragmentado(**opcoes)
+    if nome == "postgres":
+        from servidor_sql import RepositorioServidor
+        return RepositorioServidor(dialeto="postgres", **opcoes)
+    if nome == "servidor_sqlite":
+        from servidor_sql import RepositorioServidor
+        return RepositorioServidor(dialeto="sqlite", **opcoes)
+    raise ValueError(f"Armazenamento desconhecido: {nome}")
@@ -0,0 +1,186 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+# Parâmetros de custo do scrypt (ajuste com `python -m benchmarks.senha`)
+SCRYPT_N = int(os.getenv("FOCUSFLOW_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("FOCUSFLOW_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("FOCUSFLOW_SCRYPT_P", "1"))
+
+# Alternativa quando o hashlib não oferece scrypt (OpenSSL antigo)
+PBKDF2_ITERACOES = int(os.getenv("FOCUSFLOW_PBKDF2_ITERACOES", "600000"))
+
+TAMANHO_SALT = 16
+TAMANHO_HASH = 32
+
+# Verificações simultâneas e fila máxima do pool de hashing
+MAX_WORKERS_HASH = int(os.getenv("FOCUSFLOW_WORKERS_HASH", "4"))
+MAX_PENDENTES_HASH = int(os.getenv("FOCUSFLOW_PENDENTES_HASH", "32"))
+
+
+class LoginIndisponivel(Exception):
+    """O pool de verificação de senhas está saturado ou demorou demais"""
+
+
+def _b64(dados):
+    return base64.b64encode(dados).decode().rstrip("=")
+
+
+def _de_b64(texto):
+    return base64.b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def scrypt_disponivel():
+    return hasattr(hashlib, "scrypt")
+
+
+def gerar_hash(senha, n=None, r=None, p=None):
+    """Gera o hash salgado da senha no formato `scrypt$n$r$p$salt$hash`"""
+    salt = os.urandom(TAMANHO_SALT)
+    if not scrypt_disponivel():
+        return _gerar_pbkdf2(senha, salt, PBKDF2_ITERACOES)
+
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    derivado = hashlib.scrypt(
+        senha.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=TAMANHO_HASH
+    )
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(derivado)}"
+
+
+def _gerar_pbkdf2(senha, salt, iteracoes):
+    derivado = hashlib.pbkdf2_hmac("sha256", senha.encode(), salt, iteracoes, TAMANHO_HASH)
+    return f"pbkdf2_sha256${iteracoes}${_b64(salt)}${_b64(derivado)}"
+
+
+def hash_legado(senha):
+    """Hash antigo (SHA-256 sem salt), mantido só para migrar contas existentes"""
+    return hashlib.sha256(senha.encode()).hexdigest()
+
+
+def verificar_hash(senha, hash_salvo):
+    """Confere a senha contra qualquer formato suportado (scrypt, PBKDF2 ou legado)"""
+    partes = hash_salvo.split("$")
+    try:
+        if partes[0] == "scrypt" and len(partes) == 6:
+            n, r, p = (int(v) for v in partes[1:4])
+            esperado = _de_b64(partes[5])
+            calculado = hashlib.scrypt(
+                senha.encode(), salt=_de_b64(partes[4]), n=n, r=r, p=p,
+                maxmem=256 * n * r + 1024 * 1024, dklen=len(esperado)
+            )
+        elif partes[0] == "pbkdf2_sha256" and len(partes) == 4:
+            esperado = _de_b64(partes[3])
+            calculado = hashlib.pbkdf2_hmac(
+                "sha256", senha.encode(), _de_b64(partes[2]), int(partes[1]), len(esperado)
+            )
+        elif len(hash_salvo) == 64:
+            esperado = hash_salvo.encode()
+            calculado = hash_legado(senha).encode()
+        else:
+            return False
+    except (ValueError, TypeError):
+        return False
+
+    return hmac.compare_digest(calculado, esperado)
+
+
+def precisa_rehash(hash_salvo):
+    """True se o hash for legado ou usar parâmetros abaixo dos configurados"""
+    partes = hash_salvo.split("$")
+    if partes[0] == "scrypt" and len(partes) == 6:
+        n, r, p = (int(v) for v in partes[1:4])
+        return (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    if partes[0] == "pbkdf2_sha256" and len(partes) == 4:
+        return scrypt_disponivel() or int(partes[1]) < PBKDF2_ITERACOES
+    return True
+
+
+# Hash de referência usado quando o usuário não existe, para que o tempo de
+# resposta não revele quais nomes de usuário estão cadastrados
+_hash_ficticio = None
+_hash_ficticio_lock = threading.Lock()
+
+
+def _obter_hash_ficticio():
+    global _hash_ficticio
+    with _hash_ficticio_lock:
+        if _hash_ficticio is None:
+            _hash_ficticio = gerar_hash(_b64(os.urandom(16)))
+        return _hash_ficticio
+
+
+class VerificadorSenhas:
+    """Executa verificações de senha em um pool limitado de threads
+
+    O hashing (scrypt/PBKDF2) libera o GIL, então as verificações rodam em
+    paralelo sem travar as threads de script do Streamlit; acima de
+    `max_pendentes` pedidos simultâneos o login é recusado com LoginIndisponivel.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS_HASH, max_pendentes=MAX_PENDENTES_HASH, espera_vaga=0.05):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hash-senha")
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self.espera_vaga = espera_vaga
+
+    def _verificar(self, senha, hash_salvo):
+        """Retorna (válida, novo_hash ou None)"""
+        if hash_salvo is None:
+            verificar_hash(senha, _obter_hash_ficticio())
+            return False, None
+
+        if not verificar_hash(senha, hash_salvo):
+            return False, None
+        if precisa_rehash(hash_salvo):
+            return True, gerar_hash(senha)
+        return True, None
+
+    def _executar(self, funcao, args, timeout, lotado, demorado):
+        # A vaga só é liberada quando o hash termina (ou é cancelado antes de
+        # começar), então `max_pendentes` limita também o trabalho abandonado
+        # por quem desistiu de esperar. Sem vaga livre, recusa na hora.
+        if not self._vagas.acquire(timeout=self.espera_vaga):
+            raise LoginIndisponivel(lotado)
+
+        try:
+            futuro = self._executor.submit(funcao, *args)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+
+        try:
+            return futuro.result(timeout=timeout)
+        except FuturesTimeoutError:
+            futuro.cancel()
+            raise LoginIndisponivel(demorado)
+
+    def verificar(self, senha, hash_salvo, timeout=10):
+        """Verifica no pool e espera o resultado; retorna (válida, novo_hash ou None)"""
+        return self._executar(
+            self._verificar, (senha, hash_salvo), timeout,
+            "Muitos logins simultâneos", "Verificação de senha demorou demais"
+        )
+
+    def gerar(self, senha, timeout=10):
+        """Gera o hash de uma nova senha no pool"""
+        return self._executar(
+            gerar_hash, (senha,), timeout,
+            "Muitos cadastros simultâneos", "Geração do hash demorou demais"
+        )
+
+
+_verificador = None
+_verificador_lock = threading.Lock()
+
+
+def obter_verificador():
+    """Retorna o verificador de senhas compartilhado pelo processo"""
+    global _verificador
+    with _verificador_lock:
+        if _verificador is None:
+            _verificador = VerificadorSenhas()
+        return _verificador
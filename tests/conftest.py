@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager, ConnectionPool
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco SQLite novo, com pool próprio e sem cache de leitura"""
+    pool = ConnectionPool(str(tmp_path / "teste.db"), tamanho=4)
+    yield DatabaseManager(pool.db_path, pool=pool, usar_cache=False)
+    pool.fechar()
+
+
+@pytest.fixture
+def usuario_id(db):
+    db.criar_usuario("ana", "ana@exemplo.com", "senha123")
+    return db.verificar_login("ana", "senha123")['id']
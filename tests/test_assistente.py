@@ -0,0 +1,56 @@
+from assistente import ConstrutorContexto, CacheRespostas, chave_cache
+
+MODELO = "gemini-2.0-flash"
+
+
+def perguntar(db, construtor, cache, usuario_id, pergunta, tarefas, mensagens, resumo=""):
+    """Repete o fluxo do chat: monta o prompt, consulta o cache e, num miss, grava a resposta"""
+    montagem = construtor.montar(pergunta, tarefas=tarefas, mensagens=mensagens, hoje="01/01/2025", resumo=resumo)
+    chave = chave_cache(usuario_id, pergunta, MODELO, tarefas=montagem['tarefas'],
+                        ideias=montagem['ideias'], hoje="01/01/2025", resumo=resumo)
+    resposta = cache.obter(chave)
+    if resposta is None:
+        resposta = f"resposta {len(mensagens)}"
+        cache.salvar(chave, MODELO, resposta)
+    mensagens += [{'role': "user", 'content': pergunta}, {'role': "assistant", 'content': resposta}]
+    return resposta
+
+
+def test_mesma_pergunta_seguida_usa_o_cache(db, usuario_id):
+    construtor = ConstrutorContexto()
+    cache = CacheRespostas(db)
+    tarefas = [{'id': 1, 'texto': "Enviar relatório", 'prioridade': "🔴 Alta", 'concluida': False}]
+    mensagens = [{'role': "user", 'content': "oi"}, {'role': "assistant", 'content': "olá"}]
+
+    primeira = perguntar(db, construtor, cache, usuario_id, "Me ajude a definir minhas prioridades", tarefas, mensagens)
+    segunda = perguntar(db, construtor, cache, usuario_id, "  me ajude a definir minhas PRIORIDADES ", tarefas, mensagens)
+
+    assert segunda == primeira
+    assert cache.estatisticas()['hits'] == 1
+
+
+def test_chave_muda_com_tarefas_resumo_e_usuario():
+    tarefa = {'id': 1, 'texto': "Enviar relatório", 'prioridade': "🔴 Alta", 'concluida': False}
+    base = chave_cache(1, "prioridades", MODELO, tarefas=[tarefa])
+
+    assert chave_cache(1, "prioridades", MODELO, tarefas=[dict(tarefa, concluida=True)]) != base
+    assert chave_cache(1, "prioridades", MODELO, tarefas=[tarefa], resumo="falamos do relatório") != base
+    assert chave_cache(2, "prioridades", MODELO, tarefas=[tarefa]) != base
+
+
+def test_prompt_cortado_respeita_o_orcamento():
+    construtor = ConstrutorContexto(orcamento_tokens=300, divisao=(0.5, 0.5, 0))
+    tarefas = [
+        {'id': i, 'texto': f"Tarefa número {i} com uma descrição razoavelmente longa", 'prioridade': "🟡 Média",
+         'concluida': False}
+        for i in range(200)
+    ]
+    ideias = [{'id': i, 'texto': f"Ideia {i} para um projeto novo de organização"} for i in range(200)]
+
+    mensagens = [{'role': "user", 'content': "bom dia"}]
+
+    montagem = construtor.montar("o que faço primeiro?", tarefas=tarefas, ideias=ideias, mensagens=mensagens,
+                                 hoje="01/01/2025", resumo="Conversamos sobre o relatório")
+
+    assert "itens não listados" in montagem['prompt']
+    assert montagem['tokens'] <= construtor.orcamento_tokens
@@ -0,0 +1,68 @@
+from database import EscritorMensagens
+
+
+def conteudos(db, usuario_id):
+    with db.pool.conexao() as conn:
+        return [row[0] for row in conn.execute(
+            'SELECT content FROM mensagens WHERE usuario_id = ? ORDER BY id', (usuario_id,)
+        )]
+
+
+def test_mensagens_sao_gravadas_em_lotes(db, usuario_id):
+    escritor = EscritorMensagens(db, lote=100, intervalo=0.5)
+    try:
+        for i in range(250):
+            escritor.salvar_mensagem(usuario_id, "user", f"m{i}")
+        escritor.flush()
+
+        assert conteudos(db, usuario_id) == [f"m{i}" for i in range(250)]
+        estatisticas = escritor.estatisticas()
+        assert estatisticas['gravadas'] == 250
+        assert estatisticas['lotes'] <= 3
+        assert estatisticas['pendentes'] == 0
+    finally:
+        escritor.fechar()
+
+
+def test_lote_incompleto_e_gravado_apos_o_intervalo(db, usuario_id):
+    escritor = EscritorMensagens(db, lote=100, intervalo=0.01)
+    try:
+        escritor.salvar_mensagem(usuario_id, "user", "sozinha")
+        escritor.flush()
+        assert conteudos(db, usuario_id) == ["sozinha"]
+    finally:
+        escritor.fechar()
+
+
+def test_fechar_grava_o_pendente_e_depois_grava_direto(db, usuario_id):
+    escritor = EscritorMensagens(db, lote=100, intervalo=5)
+    escritor.salvar_mensagem(usuario_id, "user", "pendente")
+    escritor.fechar()
+    assert conteudos(db, usuario_id) == ["pendente"]
+
+    escritor.salvar_mensagem(usuario_id, "assistant", "depois")
+    assert conteudos(db, usuario_id) == ["pendente", "depois"]
+
+
+def test_modo_sincrono_grava_na_hora(db, usuario_id):
+    escritor = EscritorMensagens(db, sincrona=True)
+    escritor.salvar_mensagem(usuario_id, "user", "oi")
+    assert conteudos(db, usuario_id) == ["oi"]
+
+
+def test_lote_com_erro_e_descartado_e_a_thread_continua(db, usuario_id, monkeypatch):
+    escritor = EscritorMensagens(db, intervalo=0.01, tentativas=2)
+    try:
+        salvar = db.salvar_mensagens
+        monkeypatch.setattr(db, "salvar_mensagens", lambda mensagens: (_ for _ in ()).throw(ValueError("falha")))
+        escritor.salvar_mensagem(usuario_id, "user", "perdida")
+        escritor.flush()
+        monkeypatch.setattr(db, "salvar_mensagens", salvar)
+
+        escritor.salvar_mensagem(usuario_id, "user", "gravada")
+        escritor.flush()
+
+        assert conteudos(db, usuario_id) == ["gravada"]
+        assert escritor.estatisticas()['falhas'] == 1
+    finally:
+        escritor.fechar()
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+import llm
+from llm import BackendLLM, CircuitBreaker, ClienteLLM, LLMIndisponivel, RespostaBloqueada, StubBackend
+
+
+class BackendBloqueado(BackendLLM):
+    """Responde sempre sem texto, como uma resposta barrada pelos filtros de segurança"""
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def gerar(self, prompt, timeout=None):
+        self.chamadas += 1
+        raise RespostaBloqueada("bloqueada")
+
+
+def test_circuito_fechado_aberto_meio_aberto_fechado():
+    circuito = CircuitBreaker(limite_falhas=2, tempo_aberto=0.05)
+    assert circuito.estado == "fechado" and circuito.permitir()
+
+    circuito.falha()
+    assert circuito.estado == "fechado"
+    circuito.falha()
+    assert circuito.estado == "aberto"
+    assert not circuito.permitir()
+
+    time.sleep(0.06)
+    assert circuito.estado == "meio-aberto"
+    assert circuito.permitir()          # a chamada de teste
+    assert not circuito.permitir()      # só uma por vez
+
+    circuito.sucesso()
+    assert circuito.estado == "fechado"
+
+
+def test_chamada_de_teste_que_falha_reabre_o_circuito():
+    circuito = CircuitBreaker(limite_falhas=1, tempo_aberto=0.05)
+    circuito.falha()
+    time.sleep(0.06)
+    assert circuito.permitir()
+
+    circuito.falha()
+    assert circuito.estado == "aberto"
+
+
+def test_novas_tentativas_com_backoff_exponencial(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(llm.time, "sleep", lambda segundos: segundos and esperas.append(segundos))
+    monkeypatch.setattr(llm.random, "random", lambda: 0.5)
+
+    backend = StubBackend(falhas=2)
+    cliente = ClienteLLM(backend, tentativas=3, espera_base=0.1)
+
+    assert cliente.gerar("planejar o dia")
+    assert backend.chamadas == 3
+    assert esperas == [pytest.approx(0.1), pytest.approx(0.2)]
+    assert cliente.circuito.falhas == 0
+
+
+def test_tentativas_esgotadas_contam_uma_falha_no_circuito(monkeypatch):
+    monkeypatch.setattr(llm.time, "sleep", lambda segundos: None)
+    backend = StubBackend(falhas=10)
+    cliente = ClienteLLM(backend, tentativas=3, circuito=CircuitBreaker(limite_falhas=2))
+
+    with pytest.raises(LLMIndisponivel):
+        cliente.gerar("x")
+    assert backend.chamadas == 3
+    assert cliente.circuito.falhas == 1
+
+
+def test_resposta_bloqueada_nao_e_repetida_nem_abre_o_circuito():
+    backend = BackendBloqueado()
+    cliente = ClienteLLM(backend, tentativas=3, circuito=CircuitBreaker(limite_falhas=1))
+
+    with pytest.raises(RespostaBloqueada):
+        cliente.gerar("x")
+    assert backend.chamadas == 1
+    assert cliente.circuito.estado == "fechado"
+
+
+def test_sem_vaga_no_semaforo_recusa_apos_o_timeout():
+    cliente = ClienteLLM(StubBackend(palavras=1), concorrencia=1, timeout=0.05)
+    stream = cliente.gerar_stream("x")
+    assert next(stream)                 # o streaming ocupa a vaga até terminar
+
+    inicio = time.perf_counter()
+    with pytest.raises(LLMIndisponivel, match="simultâneas"):
+        cliente.gerar("x")
+    assert time.perf_counter() - inicio < 0.25
+
+    stream.close()
+    assert cliente.gerar("x")
+
+
+def test_timeout_do_semaforo_nao_gasta_a_chamada_de_teste():
+    circuito = CircuitBreaker(limite_falhas=1, tempo_aberto=0.05)
+    backend = StubBackend(palavras=1)
+    cliente = ClienteLLM(backend, concorrencia=1, timeout=0.05, circuito=circuito)
+    circuito.falha()
+    time.sleep(0.06)
+
+    cliente._semaforo.acquire()
+    with pytest.raises(LLMIndisponivel, match="simultâneas"):
+        cliente.gerar("x")
+    cliente._semaforo.release()
+    assert circuito.estado == "meio-aberto"
+    assert backend.chamadas == 0
+
+    assert cliente.gerar("x")
+    assert backend.chamadas == 1
+    assert circuito.estado == "fechado"
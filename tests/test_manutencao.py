@@ -0,0 +1,99 @@
+import os
+import glob
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from manutencao import ManutencaoPeriodica, arquivar_usuario, ler_arquivo
+
+
+def esperar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_manutencao_periodica_sobrevive_a_erro_inesperado(db, usuario_id, tmp_path, monkeypatch):
+    original = db.listar_usuarios
+    chamadas = []
+
+    def listar_usuarios():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise ValueError("linha inválida")
+        return original()
+
+    monkeypatch.setattr(db, "listar_usuarios", listar_usuarios)
+    manutencao = ManutencaoPeriodica(db, intervalo=0.01, diretorio=str(tmp_path), compactar=False)
+    try:
+        assert esperar(lambda: manutencao.execucoes >= 1)
+    finally:
+        manutencao.parar()
+
+    assert manutencao.falhas == 1
+    assert isinstance(manutencao.ultimo_erro, ValueError)
+
+
+def daqui_a(dias):
+    return datetime.now(timezone.utc) + timedelta(days=dias)
+
+
+def arquivadas(diretorio, usuario_id):
+    mensagens = []
+    for caminho in sorted(glob.glob(os.path.join(diretorio, str(usuario_id), "*.jsonl.gz"))):
+        mensagens.extend(ler_arquivo(caminho))
+    return mensagens
+
+
+def test_arquiva_e_depois_remove_as_antigas(db, usuario_id, tmp_path):
+    db.salvar_mensagens([(usuario_id, "user", f"m{i}") for i in range(30)])
+    diretorio = str(tmp_path / "arquivo")
+
+    resultado = arquivar_usuario(db, usuario_id, daqui_a(10), diretorio, retencao_dias=1, manter_recentes=5)
+
+    assert resultado['arquivadas'] == resultado['removidas'] == 25
+    assert [m['content'] for m in arquivadas(diretorio, usuario_id)] == [f"m{i}" for i in range(25)]
+    assert [m['content'] for m in db.carregar_mensagens(usuario_id, 100)] == [f"m{i}" for i in range(25, 30)]
+
+
+def test_mensagens_no_prazo_ficam_no_banco(db, usuario_id, tmp_path):
+    db.salvar_mensagens([(usuario_id, "user", f"m{i}") for i in range(30)])
+
+    resultado = arquivar_usuario(db, usuario_id, daqui_a(0), str(tmp_path), retencao_dias=1, manter_recentes=5)
+
+    assert resultado == {'arquivadas': 0, 'removidas': 0, 'arquivos': []}
+    assert len(db.carregar_mensagens(usuario_id, 100)) == 30
+
+
+def test_prazo_do_usuario_tem_precedencia(db, usuario_id, tmp_path):
+    db.salvar_mensagens([(usuario_id, "user", f"m{i}") for i in range(10)])
+    db.definir_retencao(usuario_id, 30)
+
+    resultado = arquivar_usuario(db, usuario_id, daqui_a(10), str(tmp_path), retencao_dias=1, manter_recentes=0)
+
+    assert resultado['arquivadas'] == 0
+
+
+def test_resumidas_tambem_vao_para_o_arquivo_sem_tocar_nas_recentes(db, usuario_id, tmp_path):
+    db.salvar_mensagens([(usuario_id, "user", f"m{i}") for i in range(100)])
+    db.salvar_resumo(usuario_id, "resumo", 10 ** 9, manter_visiveis=30)    # 70 em mensagens_arquivadas
+    diretorio = str(tmp_path / "arquivo")
+
+    resultado = arquivar_usuario(db, usuario_id, daqui_a(10), diretorio, retencao_dias=1, manter_recentes=50)
+
+    assert resultado['removidas'] == 50
+    assert [m['content'] for m in arquivadas(diretorio, usuario_id)] == [f"m{i}" for i in range(50)]
+    assert len(list(db.iterar_mensagens_antigas(usuario_id, "9999-01-01", 0))) == 50
+
+
+def test_falha_ao_gravar_o_arquivo_nao_remove_nada(db, usuario_id, tmp_path):
+    db.salvar_mensagens([(usuario_id, "user", f"m{i}") for i in range(10)])
+    ocupado = tmp_path / "ocupado"
+    ocupado.write_text("não é um diretório")
+
+    with pytest.raises(OSError):
+        arquivar_usuario(db, usuario_id, daqui_a(10), str(ocupado), retencao_dias=1, manter_recentes=0)
+
+    assert len(db.carregar_mensagens(usuario_id, 100)) == 10
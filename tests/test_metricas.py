@@ -0,0 +1,45 @@
+import time
+
+from metricas import registro, instrumentar_classe
+
+
+@instrumentar_classe("teste")
+class Fonte:
+    def itens(self, n):
+        for i in range(n):
+            time.sleep(0.01)
+            yield i
+
+    def falhar(self):
+        yield 1
+        raise RuntimeError("falhou")
+
+
+def test_metodo_gerador_mede_a_iteracao_inteira():
+    registro.limpar()
+    assert list(Fonte().itens(5)) == [0, 1, 2, 3, 4]
+
+    histograma = registro.instantaneo()['histogramas']['teste_itens_segundos']
+    assert histograma['contagem'] == 1
+    assert histograma['soma'] >= 0.05
+
+
+def test_gerador_abandonado_nao_conta_como_erro():
+    registro.limpar()
+    itens = Fonte().itens(5)
+    next(itens)
+    itens.close()
+
+    dados = registro.instantaneo()
+    assert dados['histogramas']['teste_itens_segundos']['contagem'] == 1
+    assert 'teste_itens_erros_total' not in dados['contadores']
+
+
+def test_erro_durante_a_iteracao_conta_como_erro():
+    registro.limpar()
+    try:
+        list(Fonte().falhar())
+    except RuntimeError:
+        pass
+
+    assert registro.instantaneo()['contadores']['teste_falhar_erros_total'] == 1
@@ -0,0 +1,85 @@
+import sqlite3
+
+from database import DatabaseManager, ConnectionPool, MIGRACOES
+
+ULTIMA = MIGRACOES[-1][0]
+
+
+class SemMigrar(DatabaseManager):
+    """Abre o banco sem aplicar as migrações, para aplicá-las aos poucos no teste"""
+
+    def init_db(self):
+        pass
+
+
+def indices(db):
+    with db.pool.conexao() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_banco_novo_fica_na_ultima_versao(db):
+    assert db.versao_schema() == ULTIMA
+    assert [versao for versao, _, _ in MIGRACOES] == list(range(1, ULTIMA + 1))
+    assert {'idx_tarefas_usuario_data', 'idx_ideias_usuario_data', 'idx_mensagens_usuario_timestamp'} <= indices(db)
+
+
+def test_migrar_de_novo_nao_aplica_nada(db):
+    assert db.migrar() == []
+    assert db.versao_schema() == ULTIMA
+
+
+def test_migracoes_aplicadas_aos_poucos_em_ordem(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "aos_poucos.db"))
+    db = SemMigrar(pool.db_path, pool=pool, usar_cache=False)
+    try:
+        assert db.versao_schema() == 0
+        assert db.migrar(ate=2) == [1, 2]
+        assert db.versao_schema() == 2
+        assert db.migrar() == list(range(3, ULTIMA + 1))
+    finally:
+        pool.fechar()
+
+
+def test_banco_legado_e_migrado_sem_perder_dados(tmp_path):
+    # Esquema da versão sem controle de migrações, já com dados
+    caminho = str(tmp_path / "legado.db")
+    conn = sqlite3.connect(caminho)
+    conn.executescript('''
+        CREATE TABLE usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, usuario_id INTEGER NOT NULL, texto TEXT NOT NULL,
+            prioridade TEXT NOT NULL, concluida BOOLEAN DEFAULT FALSE, timestamp TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE ideias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, usuario_id INTEGER NOT NULL, texto TEXT NOT NULL,
+            categoria TEXT DEFAULT 'Geral', timestamp TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE mensagens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, usuario_id INTEGER NOT NULL, role TEXT NOT NULL,
+            content TEXT NOT NULL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO usuarios (username, email, password_hash) VALUES ('ana', 'ana@exemplo.com', 'x');
+        INSERT INTO tarefas (usuario_id, texto, prioridade, timestamp) VALUES (1, 'Enviar relatório', '🔴 Alta', '09:00');
+        INSERT INTO ideias (usuario_id, texto, timestamp) VALUES (1, 'Curso de orçamento', '09:00');
+        INSERT INTO mensagens (usuario_id, role, content) VALUES (1, 'user', 'bom dia');
+    ''')
+    conn.close()
+
+    pool = ConnectionPool(caminho)
+    try:
+        db = DatabaseManager(caminho, pool=pool, usar_cache=False)
+        assert db.versao_schema() == ULTIMA
+        assert [t['texto'] for t in db.carregar_tarefas(1)] == ["Enviar relatório"]
+        assert [i['texto'] for i in db.carregar_ideias(1)] == ["Curso de orçamento"]
+        assert [m['content'] for m in db.carregar_mensagens(1)] == ["bom dia"]
+        # Os índices criados pelas migrações cobrem também os dados antigos
+        assert db.buscar(1, "relatório")
+        assert db.recuperar_relevantes(1, "relatório")['tarefas']
+    finally:
+        pool.fechar()
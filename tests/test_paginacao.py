@@ -0,0 +1,76 @@
+def nova_tarefa(i, prioridade="🟡 Média", concluida=False):
+    return {'texto': f"tarefa {i}", 'prioridade': prioridade, 'concluida': concluida, 'timestamp': "09:00"}
+
+
+def todas_as_paginas(carregar, limite, **filtros):
+    paginas = []
+    cursor = None
+    while True:
+        itens, cursor = carregar(limite=limite, cursor=cursor, **filtros)
+        paginas.append([item['id'] for item in itens])
+        if cursor is None:
+            return paginas
+
+
+def test_pagina_exata_nao_tem_proxima(db, usuario_id):
+    db.salvar_tarefas(usuario_id, [nova_tarefa(i) for i in range(20)])
+    tarefas, proximo = db.carregar_tarefas_pagina(usuario_id, limite=20)
+    assert len(tarefas) == 20
+    assert proximo is None
+
+
+def test_item_alem_do_limite_vai_para_a_segunda_pagina(db, usuario_id):
+    db.salvar_tarefas(usuario_id, [nova_tarefa(i) for i in range(21)])
+    paginas = todas_as_paginas(lambda **kw: db.carregar_tarefas_pagina(usuario_id, **kw), 20)
+    assert [len(p) for p in paginas] == [20, 1]
+
+
+def test_usuario_sem_itens(db, usuario_id):
+    assert db.carregar_tarefas_pagina(usuario_id, limite=20) == ([], None)
+    assert db.carregar_ideias_pagina(usuario_id, limite=20) == ([], None)
+
+
+def test_paginas_cobrem_todos_os_itens_sem_repetir(db, usuario_id):
+    # Inseridos no mesmo segundo: o desempate é pelo id
+    ids = [db.salvar_tarefa(usuario_id, nova_tarefa(i)) for i in range(47)]
+    paginas = todas_as_paginas(lambda **kw: db.carregar_tarefas_pagina(usuario_id, **kw), 10)
+
+    assert [len(p) for p in paginas] == [10, 10, 10, 10, 7]
+    assert [i for p in paginas for i in p] == sorted(ids, reverse=True)
+
+
+def test_insercao_durante_a_navegacao_nao_desloca_as_paginas(db, usuario_id):
+    ids = [db.salvar_tarefa(usuario_id, nova_tarefa(i)) for i in range(30)]
+    primeira, cursor = db.carregar_tarefas_pagina(usuario_id, limite=10)
+    nova = db.salvar_tarefa(usuario_id, nova_tarefa("nova"))
+    segunda, _ = db.carregar_tarefas_pagina(usuario_id, limite=10, cursor=cursor)
+
+    assert [t['id'] for t in segunda] == sorted(ids, reverse=True)[10:20]
+    assert nova not in [t['id'] for t in primeira + segunda]
+
+
+def test_filtros_valem_em_todas_as_paginas(db, usuario_id):
+    for i in range(60):
+        prioridade = "🔴 Alta" if i % 3 == 0 else "🟢 Baixa"
+        db.salvar_tarefa(usuario_id, nova_tarefa(i, prioridade, concluida=i % 2 == 0))
+
+    paginas = todas_as_paginas(
+        lambda **kw: db.carregar_tarefas_pagina(usuario_id, **kw), 3,
+        apenas_pendentes=True, prioridade="🔴 Alta"
+    )
+    tarefas = {t['id']: t for t in db.carregar_tarefas(usuario_id)}
+    vistas = [i for p in paginas for i in p]
+
+    assert len(vistas) == 10
+    assert all(tarefas[i]['prioridade'] == "🔴 Alta" and not tarefas[i]['concluida'] for i in vistas)
+
+
+def test_pagina_nao_mostra_itens_de_outro_usuario(db, usuario_id):
+    db.criar_usuario("bia", "bia@exemplo.com", "senha123")
+    outro = db.verificar_login("bia", "senha123")['id']
+    db.salvar_ideia(outro, {'texto': "ideia da bia", 'categoria': "Geral", 'timestamp': "09:00"})
+    minha = db.salvar_ideia(usuario_id, {'texto': "ideia da ana", 'categoria': "Geral", 'timestamp': "09:00"})
+
+    ideias, proximo = db.carregar_ideias_pagina(usuario_id, limite=1)
+    assert [i['id'] for i in ideias] == [minha]
+    assert proximo is None
@@ -0,0 +1,49 @@
+import pytest
+
+from recuperacao import vetorizar, serializar, similaridade, mais_similares
+
+
+def nova_tarefa(texto, concluida=False):
+    return {'texto': texto, 'prioridade': "🟡 Média", 'concluida': concluida, 'timestamp': "09:00"}
+
+
+def nova_ideia(texto):
+    return {'texto': texto, 'categoria': "Geral", 'timestamp': "09:00"}
+
+
+def test_similaridade_do_vetor_serializado():
+    vetor = vetorizar("relatório de vendas do trimestre")
+    assert similaridade(vetor, serializar(vetor)) == pytest.approx(1.0, abs=1e-5)
+    assert similaridade(vetorizar("academia e exercício"), serializar(vetor)) == 0.0
+
+
+def test_mais_similares_ordena_e_corta_pelo_minimo():
+    candidatos = [
+        (1, serializar(vetorizar("comprar pão"))),
+        (2, serializar(vetorizar("enviar relatório de vendas"))),
+        (3, serializar(vetorizar("revisar relatório"))),
+    ]
+    assert [chave for chave, _ in mais_similares("relatório de vendas", candidatos, k=5)] == [2, 3]
+
+
+def test_recupera_os_itens_relevantes(db, usuario_id):
+    db.salvar_tarefas(usuario_id, [nova_tarefa(f"tarefa genérica {i}") for i in range(30)])
+    alvo = db.salvar_tarefa(usuario_id, nova_tarefa("enviar relatório de vendas"))
+    db.salvar_tarefa(usuario_id, nova_tarefa("relatório de vendas antigo", concluida=True))
+    ideia = db.salvar_ideia(usuario_id, nova_ideia("apresentação das vendas"))
+
+    relevantes = db.recuperar_relevantes(usuario_id, "como está o relatório de vendas?", k=3)
+
+    assert relevantes['tarefas'][0]['id'] == alvo
+    assert all(not t['concluida'] for t in relevantes['tarefas'])
+    assert relevantes['ideias'][0]['id'] == ideia
+
+
+def test_so_os_candidatos_mais_recentes_sao_comparados(db, usuario_id):
+    antiga = db.salvar_ideia(usuario_id, nova_ideia("viagem para a praia"))
+    for i in range(5):
+        db.salvar_ideia(usuario_id, nova_ideia(f"projeto número {i}"))
+
+    assert db.recuperar_relevantes(usuario_id, "praia", k=1)['ideias'][0]['id'] == antiga
+    # Fora da janela de candidatos, a ideia antiga dá lugar à mais recente
+    assert db.recuperar_relevantes(usuario_id, "praia", k=1, max_candidatos=5)['ideias'][0]['id'] != antiga
@@ -0,0 +1,48 @@
+from senhas import gerar_hash, hash_legado, precisa_rehash, verificar_hash
+
+
+def hash_salvo(db, username):
+    with db.pool.conexao() as conn:
+        return conn.execute('SELECT password_hash FROM usuarios WHERE username = ?', (username,)).fetchone()[0]
+
+
+def criar_com_hash(db, username, password_hash):
+    with db.pool.transacao() as cursor:
+        cursor.execute(
+            'INSERT INTO usuarios (username, email, password_hash) VALUES (?, ?, ?)',
+            (username, f"{username}@exemplo.com", password_hash)
+        )
+
+
+def test_hash_legado_e_trocado_no_login(db):
+    criar_com_hash(db, "antigo", hash_legado("segredo"))
+
+    assert db.verificar_login("antigo", "segredo")['username'] == "antigo"
+
+    novo = hash_salvo(db, "antigo")
+    assert novo != hash_legado("segredo")
+    assert not precisa_rehash(novo)
+    assert verificar_hash("segredo", novo)
+    # O novo hash continua valendo no login seguinte, sem outra troca
+    assert db.verificar_login("antigo", "segredo")
+    assert hash_salvo(db, "antigo") == novo
+
+
+def test_senha_errada_nao_troca_o_hash_legado(db):
+    criar_com_hash(db, "antigo", hash_legado("segredo"))
+
+    assert db.verificar_login("antigo", "errada") is None
+    assert hash_salvo(db, "antigo") == hash_legado("segredo")
+
+
+def test_hash_com_parametros_fracos_e_refeito(db):
+    fraco = gerar_hash("segredo", n=2 ** 10, r=8, p=1)
+    criar_com_hash(db, "fraco", fraco)
+    assert precisa_rehash(fraco)
+
+    assert db.verificar_login("fraco", "segredo")
+    assert not precisa_rehash(hash_salvo(db, "fraco"))
+
+
+def test_usuario_inexistente(db):
+    assert db.verificar_login("ninguem", "segredo") is None
@@ -0,0 +1,193 @@
+import io
+import csv
+import json
+import unicodedata
+from datetime import datetime
+
+# Importação e exportação em fluxo de tarefas e ideias (CSV ou JSONL).
+# Os arquivos são lidos e escritos linha a linha, e a importação grava em
+# transações de LOTE_IMPORTACAO itens, então a memória usada não cresce com
+# o tamanho da conta.
+LOTE_IMPORTACAO = 1000
+TAMANHO_MAX_TEXTO = 2000
+MAX_ERROS_RELATADOS = 100
+
+FORMATOS = ("csv", "jsonl")
+COLUNAS = {
+    'tarefas': ['id', 'texto', 'prioridade', 'concluida', 'timestamp'],
+    'ideias': ['id', 'texto', 'categoria', 'timestamp'],
+}
+
+PRIORIDADES = {"baixa": "🟢 Baixa", "media": "🟡 Média", "alta": "🔴 Alta"}
+PRIORIDADE_PADRAO = "🟡 Média"
+CATEGORIA_PADRAO = "Geral"
+VERDADEIROS = {"1", "true", "sim", "s", "yes", "y", "x", "concluida"}
+FALSOS = {"", "0", "false", "nao", "n", "no", "pendente"}
+
+
+class RegistroInvalido(ValueError):
+    """Linha do arquivo que não pode ser importada"""
+
+
+def _sem_acentos(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def formato_do_arquivo(nome):
+    """Formato pelo nome do arquivo (.csv, .jsonl ou .ndjson)"""
+    extensao = nome.rsplit(".", 1)[-1].lower()
+    if extensao == "csv":
+        return "csv"
+    if extensao in ("jsonl", "ndjson"):
+        return "jsonl"
+    raise ValueError(f"Formato não suportado: .{extensao} (use CSV ou JSONL)")
+
+
+def _texto(registro):
+    texto = str(registro.get('texto') or "").strip()
+    if not texto:
+        raise RegistroInvalido("campo 'texto' vazio")
+    if len(texto) > TAMANHO_MAX_TEXTO:
+        raise RegistroInvalido(f"'texto' com mais de {TAMANHO_MAX_TEXTO} caracteres")
+    return texto
+
+
+def _timestamp(registro):
+    valor = str(registro.get('timestamp') or "").strip()
+    return valor[:16] if valor else datetime.now().strftime("%H:%M")
+
+
+def validar_tarefa(registro):
+    """Normaliza um registro lido do arquivo no dict aceito por salvar_tarefas"""
+    prioridade = str(registro.get('prioridade') or "").strip()
+    if prioridade:
+        # Aceita "Alta", "alta" ou "🔴 Alta"
+        chave = _sem_acentos(prioridade).split()[-1]
+        if chave not in PRIORIDADES:
+            raise RegistroInvalido(f"prioridade desconhecida: {prioridade}")
+        prioridade = PRIORIDADES[chave]
+    else:
+        prioridade = PRIORIDADE_PADRAO
+
+    concluida = registro.get('concluida')
+    if not isinstance(concluida, bool):
+        valor = _sem_acentos(str(concluida if concluida is not None else "")).strip()
+        if valor in VERDADEIROS:
+            concluida = True
+        elif valor in FALSOS:
+            concluida = False
+        else:
+            raise RegistroInvalido(f"valor inválido para 'concluida': {concluida}")
+
+    return {
+        'texto': _texto(registro),
+        'prioridade': prioridade,
+        'concluida': concluida,
+        'timestamp': _timestamp(registro),
+    }
+
+
+def validar_ideia(registro):
+    """Normaliza um registro lido do arquivo no dict aceito por salvar_ideias"""
+    categoria = str(registro.get('categoria') or "").strip()[:50] or CATEGORIA_PADRAO
+    return {
+        'texto': _texto(registro),
+        'categoria': categoria,
+        'timestamp': _timestamp(registro),
+    }
+
+
+def ler_registros(arquivo, formato):
+    """Gera (número da linha, registro ou exceção) a partir de um arquivo de texto"""
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+    elif formato == "jsonl":
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError as e:
+                yield numero, RegistroInvalido(f"JSON inválido: {e}")
+                continue
+            if not isinstance(registro, dict):
+                registro = RegistroInvalido("a linha não é um objeto JSON")
+            yield numero, registro
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
+
+
+def abrir_texto(arquivo):
+    """Aceita arquivo binário (ex.: upload do Streamlit) ou de texto"""
+    if isinstance(arquivo, io.TextIOBase):
+        return arquivo
+    return io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+
+
+def importar(db, usuario_id, tipo, arquivo, formato, lote=LOTE_IMPORTACAO):
+    """Importa tarefas ou ideias de um arquivo CSV/JSONL, em transações de `lote` itens
+
+    Linhas inválidas são ignoradas e relatadas; retorna
+    {'importados', 'rejeitados', 'erros': [(linha, motivo), ...]}.
+    """
+    if tipo == 'tarefas':
+        validar, salvar = validar_tarefa, db.salvar_tarefas
+    elif tipo == 'ideias':
+        validar, salvar = validar_ideia, db.salvar_ideias
+    else:
+        raise ValueError(f"Tipo desconhecido: {tipo}")
+
+    relatorio = {'importados': 0, 'rejeitados': 0, 'erros': []}
+    pendentes = []
+
+    for numero, registro in ler_registros(abrir_texto(arquivo), formato):
+        try:
+            if isinstance(registro, Exception):
+                raise registro
+            pendentes.append(validar(registro))
+        except RegistroInvalido as e:
+            relatorio['rejeitados'] += 1
+            if len(relatorio['erros']) < MAX_ERROS_RELATADOS:
+                relatorio['erros'].append((numero, str(e)))
+            continue
+
+        if len(pendentes) >= lote:
+            salvar(usuario_id, pendentes)
+            relatorio['importados'] += len(pendentes)
+            pendentes = []
+
+    if pendentes:
+        salvar(usuario_id, pendentes)
+        relatorio['importados'] += len(pendentes)
+
+    return relatorio
+
+
+def exportar(db, usuario_id, tipo, destino, formato):
+    """Escreve as tarefas ou ideias do usuário em `destino` (arquivo de texto),
+    uma linha por item, direto do cursor do banco; retorna o número de itens"""
+    if tipo == 'tarefas':
+        itens = db.iterar_tarefas(usuario_id)
+    elif tipo == 'ideias':
+        itens = db.iterar_ideias(usuario_id)
+    else:
+        raise ValueError(f"Tipo desconhecido: {tipo}")
+
+    total = 0
+    if formato == "csv":
+        escritor = csv.DictWriter(destino, fieldnames=COLUNAS[tipo])
+        escritor.writeheader()
+        for item in itens:
+            escritor.writerow(item)
+            total += 1
+    elif formato == "jsonl":
+        for item in itens:
+            destino.write(json.dumps(item, ensure_ascii=False) + "\n")
+            total += 1
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
+
+    return total